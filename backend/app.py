@@ -1,11 +1,14 @@
 
 # app.py
-from flask import Flask, jsonify, send_from_directory, abort, request, current_app, make_response
+from flask import Flask, jsonify, abort, request, current_app, make_response
 from config import Config
 from extensions import db, migrate, jwt
+from job_queue import extraction_queue
+from chat_history import chat_history
+from conversation_memory import conversation_memory
+from context_assembler import context_assembler
 from flask_cors import CORS
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import safe_join
 import os
 
 # Blueprints
@@ -45,22 +48,45 @@ def create_app():
     app.register_blueprint(summary_bp, url_prefix="/api")
     app.register_blueprint(revision_bp, url_prefix="/api")  # ✅ ADD THIS LINE
 
+    # Background extraction workers (handlers are registered by routes.materials)
+    extraction_queue.init_app(app)
+
+    # QA chat history (backend per CHAT_HISTORY_BACKEND)
+    chat_history.init_app(app)
+    conversation_memory.init_app(app)  # summarizer registered by routes.qa
+    context_assembler.init_app(app)
+
     # Uploads setup
     UPLOAD_ROOT = os.path.join(os.path.dirname(__file__), "uploads")
     os.makedirs(UPLOAD_ROOT, exist_ok=True)
 
+    # Range / ETag / conditional GET support lives in file_serving
     @app.route("/uploads/<student_id>/<filename>")
     def serve_uploaded_file(student_id, filename):
-        directory = os.path.join(UPLOAD_ROOT, student_id)
-        try:
-            target = safe_join(directory, filename)
-        except Exception:
+        import blob_store
+        import file_serving
+        from models import CourseMaterial
+
+        mat = CourseMaterial.query.filter_by(student_id=student_id, file_name=filename).first()
+        target = blob_store.student_file_path(student_id, filename)
+
+        if target:
+            return file_serving.send_upload(
+                target,
+                etag=mat.content_hash if mat and mat.content_hash else None,
+                download_name=(mat.original_file_name if mat else None) or filename
+            )
+
+        # Content-addressed uploads: filename is the blob's sha256
+        if not mat or not mat.content_hash or not blob_store.blob_exists(mat.content_hash):
             abort(404)
 
-        if not target or not os.path.isfile(target):
-            abort(404)
-
-        return send_from_directory(directory, filename, as_attachment=True)
+        return file_serving.send_upload(
+            blob_store.blob_path(mat.content_hash),
+            etag=mat.content_hash,
+            download_name=mat.original_file_name or filename,
+            immutable=True
+        )
 
     # Root
     @app.route("/")
@@ -102,6 +128,12 @@ def create_app():
         routes.sort(key=lambda x: x["path"])
         return jsonify(routes), 200
 
+    # Debug: optional libraries and what their first import cost (see lazy_imports)
+    @app.route("/api/debug/imports", methods=["GET"])
+    def debug_imports():
+        import lazy_imports
+        return jsonify(lazy_imports.import_report()), 200
+
     # Global OPTIONS handler
     @app.before_request
     def handle_options():
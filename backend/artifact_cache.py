@@ -0,0 +1,100 @@
+# artifact_cache.py
+"""
+Global cache of AI-derived artifacts shared across students.
+
+Summaries, subject labels and quiz question banks depend only on the material
+text (their prompts must not include per-material fields such as the title), so they are keyed by a hash of the normalized text plus artifact type,
+language and prompt version. Per-student rows (MaterialSummary, Quiz) are
+still created from the cached payload so access control stays unchanged.
+
+Bump the entry in PROMPT_VERSIONS whenever a prompt changes; old entries are
+then simply never looked up again.
+"""
+import re
+import hashlib
+import unicodedata
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import SharedArtifact
+
+PROMPT_VERSIONS = {
+    "summary": "v2",  # v1 embedded the first material's title and subject
+    "subject": "v1",
+    "quiz_bank": "v1",
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalized_text_hash(text):
+    """sha256 of the text after Unicode/whitespace/case normalization"""
+    normalized = unicodedata.normalize("NFKC", text or "")
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def material_content_key(material):
+    """Content key for a material, computed and saved on first use for older rows"""
+    if material.text_hash:
+        return material.text_hash
+    if not material.content:
+        return None
+    material.text_hash = normalized_text_hash(material.raw_content)
+    db.session.commit()
+    return material.text_hash
+
+
+def get_artifact(content_key, artifact_type, language=""):
+    """Cached payload or None"""
+    if not content_key:
+        return None
+
+    artifact = SharedArtifact.query.filter_by(
+        content_key=content_key,
+        artifact_type=artifact_type,
+        language=language or "",
+        prompt_version=PROMPT_VERSIONS[artifact_type]
+    ).first()
+
+    if artifact is None:
+        return None
+
+    SharedArtifact.query.filter_by(id=artifact.id).update({
+        "hit_count": SharedArtifact.hit_count + 1,
+        "last_used_at": datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return artifact.payload
+
+
+def put_artifact(content_key, artifact_type, payload, language=""):
+    """Store (or replace) a payload; a concurrent insert of the same key is not an error"""
+    if not content_key:
+        return
+
+    version = PROMPT_VERSIONS[artifact_type]
+    artifact = SharedArtifact.query.filter_by(
+        content_key=content_key,
+        artifact_type=artifact_type,
+        language=language or "",
+        prompt_version=version
+    ).first()
+
+    try:
+        if artifact is None:
+            db.session.add(SharedArtifact(
+                content_key=content_key,
+                artifact_type=artifact_type,
+                language=language or "",
+                prompt_version=version,
+                payload=payload
+            ))
+        else:
+            artifact.payload = payload
+            artifact.last_used_at = datetime.utcnow()
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
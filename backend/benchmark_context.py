@@ -0,0 +1,145 @@
+# benchmark_context.py
+"""
+Context assembly latency for ask-question: the previous sequential steps
+(material retrieval, then a Wikipedia fetch per question, then chat history)
+against routes.qa.build_context, which gathers the same sources
+concurrently under CONTEXT_DEADLINE_MS (see context_assembler).
+
+Runs against a throwaway sqlite database, a generated material and the
+Wikipedia fixture server from benchmark_enrichment.py; no network needed.
+
+    python benchmark_context.py [--questions 300] [--delay-ms 150] [--slow-ms 3000]
+                                [--tail-pct 5] [--tail-ms 3000] [--deadline-ms 1500] [--size-mb 10]
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from flask import Flask
+
+import lazy_imports
+import passage_index
+import semantic_index
+from extensions import db
+from models import User, CourseMaterial
+from chat_history import chat_history
+from conversation_memory import conversation_memory
+from context_assembler import context_assembler
+from routes import api
+import routes.qa as qa
+from routes.qa import build_context, material_context, get_chat_history, get_wikipedia_content
+from benchmark_enrichment import start_fixture_server, previous_lookup, TOPICS, TEMPLATES, SLOW
+from benchmark_retrieval import generate_material
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def sequential_previous(url):
+    def run(material, question, student_id):
+        material_context(material, question)
+        previous_lookup(url, question)
+        get_chat_history(student_id, material.id)
+    return run
+
+
+def sequential_cached(material, question, student_id):
+    material_context(material, question)
+    get_wikipedia_content(question)
+    get_chat_history(student_id, material.id)
+
+
+def concurrent(material, question, student_id):
+    return build_context(material, question, student_id, material.id)[3]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--delay-ms", type=int, default=150, help="Wikipedia fixture latency per response")
+    parser.add_argument("--slow-ms", type=int, default=3000, help="latency of the SLOW titles")
+    parser.add_argument("--tail-pct", type=float, default=5, help="share of Wikipedia responses that take tail-ms")
+    parser.add_argument("--tail-ms", type=int, default=3000)
+    parser.add_argument("--deadline-ms", type=int, default=1500)
+    parser.add_argument("--size-mb", type=float, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    passage_index.INDEX_ROOT = os.path.join(tmp, "indexes")
+    semantic_index.SEMANTIC_ROOT = os.path.join(tmp, "semantic")
+    server, url = start_fixture_server(0, args.delay_ms, args.slow_ms, args.tail_pct, args.tail_ms)
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        WIKIPEDIA_API_URL=url,
+        CONTEXT_DEADLINE_MS=args.deadline_ms,
+    )
+    db.init_app(app)
+    chat_history.init_app(app)
+    conversation_memory.init_app(app)
+    context_assembler.init_app(app)
+    app.register_blueprint(api, url_prefix="/api")
+
+    rng = random.Random(5)
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    questions = [rng.choice(TEMPLATES).format(rng.choices(TOPICS, weights)[0]) for _ in range(args.questions)]
+
+    with app.test_request_context():
+        db.create_all()
+        user = User(full_name="Bench", email="bench@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        text = generate_material(args.size_mb)
+        mat = CourseMaterial(student_id=user.id, title="Benchmark notes", subject="Biology",
+                             file_name="notes.txt", file_type="txt", processing_status="completed")
+        mat.content = text
+        db.session.add(mat)
+        db.session.commit()
+        index = passage_index.update_index(mat.id, text)
+        mat.extraction_stats = {
+            "passage_index": {"content_key": index.meta["content_key"]},
+            "semantic_index": semantic_index.update_material(user.id, mat.id, text),
+        }
+        db.session.commit()
+        for i in range(12):
+            chat_history.append(user.id, mat.id, f"Earlier question {i}", "Earlier answer. " * 20)
+
+        print(f"Material {len(text) / 1048576:.1f} MB; Wikipedia fixture {args.delay_ms}ms per response, "
+              f"{args.slow_ms}ms for {', '.join(sorted(SLOW))}, {args.tail_pct}% at {args.tail_ms}ms; "
+              f"deadline {args.deadline_ms}ms\n")
+        print(f"{'':<38}{'questions':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+
+        per_source = {}
+        runs = (
+            ("sequential, fetch per question", sequential_previous(url)),
+            ("sequential, cached Wikipedia", sequential_cached),
+            ("concurrent, one deadline", concurrent),
+        )
+        for label, fn in runs:
+            qa.wikipedia = lazy_imports.LazyObject(qa._wikipedia_enricher)  # every run starts with a cold cache
+            timings = []
+            for q in questions:
+                started = time.perf_counter()
+                result = fn(mat, q, user.id)
+                timings.append((time.perf_counter() - started) * 1000)
+                if fn is concurrent:
+                    for name, t in result.items():
+                        per_source.setdefault(name, []).append(t)
+            print(f"{label:<38}{len(timings):>10}{percentile(timings, 50):>10.1f}"
+                  f"{percentile(timings, 95):>10.1f}{max(timings):>10.1f}")
+
+        print("\nConcurrent run, per source")
+        print(f"{'source':<18}{'p50 ms':>10}{'p95 ms':>10}{'dropped':>10}{'errors':>10}")
+        for name, entries in per_source.items():
+            ms = [e["ms"] for e in entries]
+            dropped = sum(e.get("status") == "dropped" for e in entries)
+            errors = sum(e.get("status") == "error" for e in entries)
+            print(f"{name:<18}{percentile(ms, 50):>10.1f}{percentile(ms, 95):>10.1f}{dropped:>10}{errors:>10}")
+
+    server.shutdown()
+    print("🎉 Done")
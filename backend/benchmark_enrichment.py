@@ -0,0 +1,168 @@
+# benchmark_enrichment.py
+"""
+Local stand-in for the Wikipedia REST API, and a replay of QA questions
+against it comparing the previous per-question fetch (new connection, 5 s
+timeout, first word over four letters) with wikipedia_enrichment
+(cache, negative cache, pooled session, latency budget).
+
+    python benchmark_enrichment.py [--questions 2000] [--delay-ms 40] [--budget-ms 800]
+    python benchmark_enrichment.py --serve [--port 8765] [--delay-ms 40]
+
+--serve only runs the fixture server; point the app at it with
+WIKIPEDIA_API_URL=http://127.0.0.1:8765 to try QA without the network.
+The server answers /page/summary/<Title> from FIXTURES, 404 otherwise, with
+delay-ms added to every response; SLOW titles take slow-ms, and tail-pct
+percent of responses take tail-ms.
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+from wikipedia_enrichment import WikipediaEnricher, requests
+
+FIXTURES = {
+    "Photosynthesis": "Photosynthesis is a process used by plants to convert light energy into chemical energy. "
+                      "It happens in chloroplasts. Oxygen is released as a by-product.",
+    "Mitochondrion": "A mitochondrion is an organelle found in most eukaryotic cells. It generates ATP. "
+                     "It has its own DNA.",
+    "Osmosis": "Osmosis is the movement of solvent molecules through a semi-permeable membrane. "
+               "It goes from low to high solute concentration.",
+    "Enzyme": "Enzymes are proteins that act as biological catalysts. They speed up chemical reactions.",
+    "Thermodynamics": "Thermodynamics deals with heat, work and temperature. Its laws govern energy transfer.",
+    "Electromagnetism": "Electromagnetism is the interaction of electric currents and magnetic fields.",
+    "Democracy": "Democracy is a system of government in which power is vested in the people.",
+    "Photon": "A photon is an elementary particle, the quantum of the electromagnetic field.",
+}
+DISAMBIGUATION = {"Mercury", "Cell"}
+SLOW = {"Thermodynamics"}
+
+TOPICS = [t.lower() for t in FIXTURES] + ["mercury", "cells", "respiration", "glycolysis", "kinematics"]
+TEMPLATES = [
+    "Explain {}", "What is {} in simple terms?", "Describe the role of {}", "Why is {} important?",
+    "Give examples of {}", "How does {} work?",
+]
+
+
+def make_handler(delay_ms, slow_ms, tail_pct=0, tail_ms=0):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def do_GET(self):
+            m = re.match(r"^/page/summary/(.+)$", self.path)
+            title = unquote(m.group(1)).replace("_", " ") if m else ""
+            title = title[:1].upper() + title[1:]  # MediaWiki titles are first-letter case-insensitive
+            delay = slow_ms if title in SLOW else delay_ms
+            if tail_pct and random.random() * 100 < tail_pct:
+                delay = max(delay, tail_ms)  # the occasional slow response any API has
+            time.sleep(delay / 1000)
+            if title in FIXTURES:
+                status, body = 200, {"type": "standard", "title": title, "extract": FIXTURES[title]}
+            elif title in DISAMBIGUATION:
+                status, body = 200, {"type": "disambiguation", "title": title, "extract": f"{title} may refer to:"}
+            else:
+                status, body = 404, {"type": "https://mediawiki.org/wiki/HyperSwitch/errors/not_found"}
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_fixture_server(port=0, delay_ms=40, slow_ms=2000, tail_pct=0, tail_ms=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay_ms, slow_ms, tail_pct, tail_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def previous_lookup(base_url, question):
+    """The previous get_wikipedia_content, pointed at base_url"""
+    key_terms = [word for word in question.split() if len(word) > 4]
+    if not key_terms:
+        return None
+    try:
+        response = requests.get(f"{base_url}/page/summary/" + key_terms[0].replace(" ", "_"), timeout=5)
+        if response.status_code == 200:
+            extract = response.json().get("extract", "")
+            if extract:
+                return " ".join(re.split(r"(?<=[.!?])\s+", extract)[:3])
+    except Exception:
+        pass
+    return None
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def replay(fn, questions):
+    timings, found = [], 0
+    for q in questions:
+        started = time.perf_counter()
+        found += bool(fn(q))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="only run the fixture server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--delay-ms", type=int, default=40, help="fixture server latency per response")
+    parser.add_argument("--slow-ms", type=int, default=2000, help="latency of the SLOW titles")
+    parser.add_argument("--tail-pct", type=float, default=0, help="share of responses that take tail-ms")
+    parser.add_argument("--tail-ms", type=int, default=3000)
+    parser.add_argument("--budget-ms", type=int, default=800)
+    parser.add_argument("--previous-sample", type=int, default=200, help="questions replayed the old way")
+    args = parser.parse_args()
+
+    if args.serve:
+        server, url = start_fixture_server(args.port, args.delay_ms, args.slow_ms, args.tail_pct, args.tail_ms)
+        print(f"📚 Wikipedia fixture server on {url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        raise SystemExit
+
+    server, url = start_fixture_server(0, args.delay_ms, args.slow_ms, args.tail_pct, args.tail_ms)
+    rng = random.Random(3)
+    # Popular topics come up far more often than the rest (Zipf-like)
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    questions = [rng.choice(TEMPLATES).format(rng.choices(TOPICS, weights)[0]) for _ in range(args.questions)]
+
+    prev_questions = questions[:args.previous_sample]
+    prev, prev_found = replay(lambda q: previous_lookup(url, q), prev_questions)
+
+    enricher = WikipediaEnricher(base_url=url, budget=args.budget_ms / 1000)
+    new, new_found = replay(enricher.enrich, questions)
+    time.sleep(args.slow_ms / 1000)  # let over-budget fetches land, then replay again warm
+    warm, warm_found = replay(enricher.enrich, questions[:args.previous_sample])
+
+    print(f"Fixture server {url}: {args.delay_ms}ms per response, {args.slow_ms}ms for {', '.join(sorted(SLOW))}\n")
+    print(f"{'':<34}{'questions':>10}{'found':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total s':>10}")
+    for label, timings, found in (
+        ("previous (fetch per question)", prev, prev_found),
+        ("cached, budget, pooled", new, new_found),
+        ("cached, warm replay", warm, warm_found),
+    ):
+        print(f"{label:<34}{len(timings):>10}{found:>8}{percentile(timings, 50):>10.1f}"
+              f"{percentile(timings, 95):>10.1f}{max(timings):>10.1f}{sum(timings) / 1000:>10.2f}")
+
+    print("\nEnricher metrics")
+    print(json.dumps(enricher.metrics(), indent=2))
+    server.shutdown()
+    print("🎉 Done")
@@ -0,0 +1,183 @@
+# benchmark_retrieval.py
+"""
+Compare QA passage retrieval from the BM25 passage index (passage_index) and
+the semantic index (semantic_index, hashed embedder) with the previous
+per-request keyword scan (routes.qa.extract_relevant_content) on one large
+material: build time, index size, per-question latency and whether the
+passage that answers each question makes it into the context.
+
+    python benchmark_retrieval.py [--size-mb 10] [--queries 200]
+    python benchmark_retrieval.py --text FILE [--queries 200]
+
+Generated material gets a few "needle" facts planted in it; their questions
+are the relevance check. With --text only latency is compared.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from flask import Flask
+
+import passage_index
+import semantic_index
+from routes.qa import extract_relevant_content
+
+WORDS = (
+    "cell membrane protein energy transport enzyme reaction molecule structure function system process "
+    "organism gene expression signal pathway receptor binding diffusion gradient concentration synthesis "
+    "metabolism oxygen carbon nitrogen water light plant animal tissue organ layer surface volume rate "
+    "temperature pressure equilibrium balance model theory experiment result analysis sample method"
+).split()
+
+NEEDLES = [
+    ("The Krebs cycle regenerates oxaloacetate in the mitochondrial matrix.",
+     "Where is oxaloacetate regenerated in the Krebs cycle?", "oxaloacetate"),
+    ("Chlorophyll absorbs mostly blue and red wavelengths of light.",
+     "Which wavelengths does chlorophyll absorb?", "wavelengths"),
+    ("Osmoregulation in freshwater fish relies on dilute urine production.",
+     "How do freshwater fish handle osmoregulation?", "osmoregulation"),
+    ("Ribosomes translate messenger RNA into polypeptide chains.",
+     "What do ribosomes translate messenger RNA into?", "polypeptide"),
+]
+
+
+def generate_material(size_mb, seed=7):
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    pages, size, page = [], 0, 0
+    while size < target:
+        page += 1
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "."
+            for _ in range(rng.randint(20, 40))
+        ]
+        body = f"\n--- Page {page} ---\n" + "\n".join(
+            " ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)
+        )
+        pages.append(body)
+        size += len(body)
+
+    for n, (fact, _, _) in enumerate(NEEDLES):
+        at = (n + 1) * len(pages) // (len(NEEDLES) + 1)
+        pages[at] += "\n" + fact
+    return "".join(pages)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def time_queries(fn, questions):
+    timings = []
+    for q in questions:
+        started = time.perf_counter()
+        fn(q)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def semantic_search(question, k=20):
+    return [(score, span) for score, _, span in semantic_index.search("benchmark", [question], k=k)[0]]
+
+
+def bm25_context(index, text, question, max_chars=2000, candidates=20, fused=False):
+    """What routes.qa.retrieve_passages sends, minus the database read"""
+    ranked = index.search(question, k=candidates)
+    if fused:
+        ranked = semantic_index.fuse_rankings(ranked, semantic_search(question, candidates))
+    picked, used = [], 0
+    for _, (start, end, _) in ranked:
+        if used + (end - start) > max_chars and picked:
+            continue
+        picked.append((start, end))
+        used += end - start
+    return "\n...\n".join(text[s:e] for s, e in sorted(picked))[:max_chars]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text", help="plain-text material to use instead of a generated one")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="BM25 queries (the scan gets a tenth)")
+    args = parser.parse_args()
+
+    if not passage_index.NUMPY_AVAILABLE:
+        parser.error("numpy is required for the passage index")
+
+    if args.text:
+        with open(args.text, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        needles = []
+    else:
+        text = generate_material(args.size_mb)
+        needles = NEEDLES
+    print(f"Material: {len(text) / 1048576:.1f} MB, {text.count('--- Page')} pages")
+
+    started = time.perf_counter()
+    index = passage_index.PassageIndex.build(text, content_key=passage_index.content_key(text))
+    build_s = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.npz")
+        index.save(path)
+        index_mb = os.path.getsize(path) / 1048576
+        started = time.perf_counter()
+        index = passage_index.PassageIndex.load(path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    rebuilt = passage_index.PassageIndex.build(
+        text.replace("--- Page 2 ---", "--- Page 2 ---\nAn edited line.", 1), previous=index
+    )
+    rebuild_s = time.perf_counter() - started
+    print(f"Index: {index.n_passages} passages, {len(index.terms)} terms, {index_mb:.1f} MB on disk; "
+          f"build {build_s:.2f}s, one-page edit rebuild {rebuild_s:.2f}s "
+          f"({rebuilt.meta['reused_passages']} passages reused), load {load_ms:.0f}ms")
+
+    semantic_index.SEMANTIC_ROOT = tempfile.mkdtemp()
+    started = time.perf_counter()
+    semantic_index.update_material("benchmark", "material", text)
+    embed_s = time.perf_counter() - started
+    vectors = semantic_index.load_student("benchmark")
+    rows, dim = vectors.rows, vectors.manifest["dim"]
+    print(f"Vectors: {rows} x {dim} float32, {rows * dim * 4 / 1048576:.1f} MB memory-mapped; "
+          f"embedded in {embed_s:.2f}s")
+
+    rng = random.Random(11)
+    questions = [q for _, q, _ in needles] + [
+        f"Explain how {rng.choice(WORDS)} affects {rng.choice(WORDS)} {rng.choice(WORDS)}?"
+        for _ in range(args.queries)
+    ]
+
+    app = Flask(__name__)  # extract_relevant_content logs through current_app
+    with app.app_context():
+        scan_questions = questions[:max(len(needles), args.queries // 10)]
+        scan = time_queries(lambda q: extract_relevant_content(text, q), scan_questions)
+        bm25 = time_queries(lambda q: index.search(q, k=20), questions)
+        context = time_queries(lambda q: bm25_context(index, text, q), questions)
+        cosine = time_queries(lambda q: semantic_search(q), questions)
+        fused = time_queries(lambda q: bm25_context(index, text, q, fused=True), questions)
+        started = time.perf_counter()
+        semantic_index.search("benchmark", questions, k=20)
+        batched_ms = (time.perf_counter() - started) * 1000 / len(questions)
+
+        print(f"\n{'':<30}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        print(f"{'keyword scan (previous)':<30}{len(scan):>8}{percentile(scan, 50):>10.1f}{percentile(scan, 95):>10.1f}")
+        print(f"{'BM25 top 20':<30}{len(bm25):>8}{percentile(bm25, 50):>10.3f}{percentile(bm25, 95):>10.3f}")
+        print(f"{'BM25 + passage text':<30}{len(context):>8}{percentile(context, 50):>10.3f}{percentile(context, 95):>10.3f}")
+        print(f"{'cosine top 20':<30}{len(cosine):>8}{percentile(cosine, 50):>10.3f}{percentile(cosine, 95):>10.3f}")
+        print(f"{'cosine top 20, one batch':<30}{len(questions):>8}{batched_ms:>10.3f}{'':>10}")
+        print(f"{'BM25 + cosine fused + text':<30}{len(fused):>8}{percentile(fused, 50):>10.3f}{percentile(fused, 95):>10.3f}")
+
+        if needles:
+            print("\nAnswer passage in the 2000-char context?")
+            for _, question, marker in needles:
+                old = marker in extract_relevant_content(text, question).lower()
+                new = marker in bm25_context(index, text, question).lower()
+                fuse = marker in bm25_context(index, text, question, fused=True).lower()
+                print(f"  {question:<55} scan {'✅' if old else '❌'}  BM25 {'✅' if new else '❌'}  "
+                      f"fused {'✅' if fuse else '❌'}")
+
+    print("🎉 Done")
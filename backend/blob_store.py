@@ -0,0 +1,161 @@
+# blob_store.py
+"""
+Content-addressed storage for uploaded files.
+
+Every upload is hashed while it streams to a temp file and then stored once
+under uploads/blobs/<aa>/<bb>/<sha256>. When 200 students upload the same
+syllabus, the bytes land on disk once and every CourseMaterial row points at
+the same blob through its content_hash.
+
+Per-student files from before content addressing are sharded the same way,
+under uploads/students/<aa>/<bb>/<student_id>/ keyed on a hash of the id, so
+neither the uploads root nor any fan-out level grows to one entry per
+student. (shard_student_uploads.py moves the old flat uploads/<student_id>/.)
+"""
+import os
+import uuid
+import hashlib
+
+from werkzeug.utils import safe_join
+
+UPLOAD_ROOT = os.path.join(os.path.dirname(__file__), "uploads")
+BLOB_ROOT = os.path.join(UPLOAD_ROOT, "blobs")
+TMP_ROOT = os.path.join(UPLOAD_ROOT, "tmp")
+STUDENT_ROOT = os.path.join(UPLOAD_ROOT, "students")
+
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_path(sha256):
+    """On-disk location of a blob (two-level fan-out keeps directories small)"""
+    return os.path.join(BLOB_ROOT, sha256[:2], sha256[2:4], sha256)
+
+
+def blob_exists(sha256):
+    return os.path.isfile(blob_path(sha256))
+
+
+def student_dir(student_id):
+    """Sharded per-student directory (student ids are not evenly distributed, their hash is)"""
+    key = hashlib.sha1(str(student_id).encode("utf-8")).hexdigest()
+    return os.path.join(STUDENT_ROOT, key[:2], key[2:4], str(student_id))
+
+
+def legacy_student_dir(student_id):
+    """Flat uploads/<student_id> layout, until shard_student_uploads.py has run"""
+    return os.path.join(UPLOAD_ROOT, str(student_id))
+
+
+def student_file_path(student_id, file_name):
+    """Existing per-student file in the sharded or the legacy layout, else None"""
+    for directory in (student_dir(student_id), legacy_student_dir(student_id)):
+        path = safe_join(directory, file_name)
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def _commit_temp(tmp_path, sha256):
+    """Move a fully written temp file into place, or drop it if the blob already exists"""
+    final_path = blob_path(sha256)
+    if os.path.isfile(final_path):
+        os.remove(tmp_path)
+        return final_path, False
+
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # os.replace is atomic on the same filesystem, so a concurrent identical
+    # upload either wins or overwrites with the very same bytes
+    os.replace(tmp_path, final_path)
+    return final_path, True
+
+
+def new_temp_path():
+    os.makedirs(TMP_ROOT, exist_ok=True)
+    return os.path.join(TMP_ROOT, f"{uuid.uuid4().hex}.part")
+
+
+class BlobWriter:
+    """
+    Incremental writer: hash bytes as they are written to a temp file,
+    then commit() them into the store (or abort() to throw them away).
+    """
+
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.tmp_path = new_temp_path()
+        self._file = open(self.tmp_path, "wb")
+
+    def write(self, data):
+        if data:
+            self.hasher.update(data)
+            self._file.write(data)
+            self.size += len(data)
+
+    def commit(self):
+        """Returns (sha256, size, path, created) where created is False for a duplicate"""
+        self._file.close()
+        sha256 = self.hasher.hexdigest()
+        path, created = _commit_temp(self.tmp_path, sha256)
+        return sha256, self.size, path, created
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def store_stream(stream, chunk_size=CHUNK_SIZE):
+    """
+    Hash a readable stream while spooling it to a temp file, then store it.
+    Returns (sha256, size, path, created) where created is False for a duplicate.
+    """
+    writer = BlobWriter()
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except Exception:
+        writer.abort()
+        raise
+
+    return writer.commit()
+
+
+def store_bytes(raw_bytes):
+    """Store an in-memory payload; duplicates skip the disk write entirely"""
+    sha256 = hashlib.sha256(raw_bytes).hexdigest()
+    if blob_exists(sha256):
+        return sha256, len(raw_bytes), blob_path(sha256), False
+
+    tmp_path = new_temp_path()
+    with open(tmp_path, "wb") as wf:
+        wf.write(raw_bytes)
+    path, created = _commit_temp(tmp_path, sha256)
+    return sha256, len(raw_bytes), path, created
+
+
+def store_file(src_path, expected_sha256=None):
+    """
+    Hash and store a file that is already on disk (moves it into the store).
+    With expected_sha256, a mismatch raises ValueError and leaves the file where it is.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    with open(src_path, "rb") as rf:
+        while True:
+            chunk = rf.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size += len(chunk)
+
+    sha256 = hasher.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        raise ValueError(f"checksum mismatch: expected {expected_sha256}, got {sha256}")
+
+    path, created = _commit_temp(src_path, sha256)
+    return sha256, size, path, created
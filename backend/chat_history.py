@@ -0,0 +1,215 @@
+# chat_history.py
+"""
+Chat history for the QA routes, behind a pluggable backend.
+
+    CHAT_HISTORY_BACKEND = "sql"     chat_messages table (default): survives
+                                     restarts, shared by every gunicorn worker
+    CHAT_HISTORY_BACKEND = "memory"  per-process dict, bounded; for local runs
+
+A turn is one row, appended on save; nothing already stored is rewritten.
+History is read newest first with keyset pagination on (created_at, id), so
+a page costs the same however long the conversation is; since() reads the
+same way forwards, for catching up from a known turn.
+
+In front of the backend sits a bounded LRU of the last few turns per
+(student, material), written through on save, so asking a question does not
+read the table. Another worker's writes reach this cache after at most
+CHAT_HISTORY_CACHE_TTL seconds; the /chat-history endpoints bypass it.
+"""
+import time
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from extensions import db
+from models import ChatMessage, gen_id
+
+GENERAL = "general"
+
+BACKENDS = {}
+
+
+def backend(name):
+    """Register a backend class under a CHAT_HISTORY_BACKEND name"""
+    def decorator(cls):
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def material_key(material_id):
+    """What history is filed under: the material id, or 'general' when none was picked"""
+    if not material_id or material_id in ("all", "none"):
+        return GENERAL
+    return str(material_id)
+
+
+def encode_cursor(turn):
+    return f"{turn['timestamp']}|{turn['id']}"
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor; ValueError when malformed"""
+    timestamp, sep, turn_id = (cursor or "").partition("|")
+    if not sep or not turn_id:
+        raise ValueError("malformed cursor")
+    return datetime.fromisoformat(timestamp), turn_id
+
+
+@backend("sql")
+class SQLChatHistoryBackend:
+    def __init__(self, app):
+        self.app = app
+
+    def append(self, student_id, material_id, question, answer):
+        msg = ChatMessage(student_id=student_id, material_id=material_id, question=question, answer=answer)
+        db.session.add(msg)
+        db.session.commit()
+        return msg.to_dict()
+
+    def page(self, student_id, material_id, limit, before=None):
+        """Up to limit turns older than the before cursor, newest first"""
+        query = ChatMessage.query.filter_by(student_id=student_id, material_id=material_id)
+        if before:
+            created_at, turn_id = decode_cursor(before)
+            query = query.filter(or_(
+                ChatMessage.created_at < created_at,
+                and_(ChatMessage.created_at == created_at, ChatMessage.id < turn_id)
+            ))
+        rows = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit).all()
+        return [row.to_dict() for row in rows]
+
+    def since(self, student_id, material_id, limit, after=None):
+        """Up to limit turns newer than the after cursor, oldest first"""
+        query = ChatMessage.query.filter_by(student_id=student_id, material_id=material_id)
+        if after:
+            created_at, turn_id = decode_cursor(after)
+            query = query.filter(or_(
+                ChatMessage.created_at > created_at,
+                and_(ChatMessage.created_at == created_at, ChatMessage.id > turn_id)
+            ))
+        rows = query.order_by(ChatMessage.created_at, ChatMessage.id).limit(limit).all()
+        return [row.to_dict() for row in rows]
+
+    def clear(self, student_id, material_id):
+        deleted = ChatMessage.query.filter_by(student_id=student_id, material_id=material_id).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        return deleted
+
+
+@backend("memory")
+class MemoryChatHistoryBackend:
+    def __init__(self, app):
+        self.max_keys = app.config.get("CHAT_HISTORY_MEMORY_KEYS", 1000)
+        self.max_turns = app.config.get("CHAT_HISTORY_MEMORY_TURNS", 100)
+        self._lock = threading.Lock()
+        self._turns = OrderedDict()  # (student_id, material_id) -> deque of turns, oldest first
+
+    def append(self, student_id, material_id, question, answer):
+        turn = {"id": gen_id(), "question": question, "answer": answer,
+                "timestamp": datetime.utcnow().isoformat()}
+        key = (student_id, material_id)
+        with self._lock:
+            turns = self._turns.get(key)
+            if turns is None:
+                turns = self._turns[key] = deque(maxlen=self.max_turns)
+            turns.append(turn)
+            self._turns.move_to_end(key)
+            while len(self._turns) > self.max_keys:
+                self._turns.popitem(last=False)
+        return turn
+
+    def page(self, student_id, material_id, limit, before=None):
+        with self._lock:
+            turns = list(self._turns.get((student_id, material_id), ()))
+        if before:
+            created_at, turn_id = decode_cursor(before)
+            turns = [t for t in turns if (datetime.fromisoformat(t["timestamp"]), t["id"]) < (created_at, turn_id)]
+        return turns[::-1][:limit]
+
+    def since(self, student_id, material_id, limit, after=None):
+        with self._lock:
+            turns = list(self._turns.get((student_id, material_id), ()))
+        if after:
+            created_at, turn_id = decode_cursor(after)
+            turns = [t for t in turns if (datetime.fromisoformat(t["timestamp"]), t["id"]) > (created_at, turn_id)]
+        return turns[:limit]
+
+    def clear(self, student_id, material_id):
+        with self._lock:
+            turns = self._turns.pop((student_id, material_id), None)
+        return len(turns or ())
+
+
+class ChatHistoryStore:
+    def __init__(self):
+        self.app = None
+        self.backend = None
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()  # (student_id, material_id) -> (loaded_at, deque of turns)
+
+    def init_app(self, app):
+        self.app = app
+        name = app.config.get("CHAT_HISTORY_BACKEND", "sql")
+        if name not in BACKENDS:
+            raise ValueError(f"unknown CHAT_HISTORY_BACKEND '{name}' (have: {', '.join(sorted(BACKENDS))})")
+        self.backend = BACKENDS[name](app)
+        self.cache_size = app.config.get("CHAT_HISTORY_CACHE_SIZE", 1000)
+        self.cache_ttl = app.config.get("CHAT_HISTORY_CACHE_TTL", 30)
+        self.recent_turns = app.config.get("CHAT_HISTORY_RECENT_TURNS", 10)
+        app.extensions["chat_history"] = self
+
+    # Recent turns, for prompts (cached)
+
+    def recent(self, student_id, material_id=None):
+        """The last CHAT_HISTORY_RECENT_TURNS turns, oldest first"""
+        key = (str(student_id), material_key(material_id))
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry and time.monotonic() - entry[0] < self.cache_ttl:
+                self._recent.move_to_end(key)
+                return list(entry[1])
+
+        turns = deque(reversed(self.backend.page(*key, limit=self.recent_turns)), maxlen=self.recent_turns)
+        with self._lock:
+            self._recent[key] = (time.monotonic(), turns)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.cache_size:
+                self._recent.popitem(last=False)
+        return list(turns)
+
+    def append(self, student_id, material_id, question, answer):
+        key = (str(student_id), material_key(material_id))
+        turn = self.backend.append(*key, question=question, answer=answer)
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry:
+                entry[1].append(turn)  # write-through; the deque drops the oldest
+        return turn
+
+    # Full history (always from the backend)
+
+    def page(self, student_id, material_id=None, limit=50, before=None):
+        """(turns oldest first, cursor for the page before them or None)"""
+        turns = self.backend.page(str(student_id), material_key(material_id), limit + 1, before)
+        more = len(turns) > limit
+        turns = turns[:limit]
+        next_cursor = encode_cursor(turns[-1]) if more else None
+        return turns[::-1], next_cursor
+
+    def since(self, student_id, material_id=None, limit=50, after=None):
+        """Up to limit turns after the after cursor (from the start when None), oldest first"""
+        return self.backend.since(str(student_id), material_key(material_id), limit, after)
+
+    def clear(self, student_id, material_id=None):
+        key = (str(student_id), material_key(material_id))
+        with self._lock:
+            self._recent.pop(key, None)
+        return self.backend.clear(*key)
+
+
+chat_history = ChatHistoryStore()
@@ -0,0 +1,45 @@
+# chunk_materials.py
+"""
+Move pre-existing materials from the single LONGTEXT content column into
+material_chunks, a batch at a time.
+
+    python chunk_materials.py [--batch-size 50]
+"""
+import argparse
+
+from app import create_app
+from extensions import db
+from models import CourseMaterial
+
+
+def chunk_existing_materials(batch_size=50):
+    converted = 0
+    while True:
+        ids = [row[0] for row in db.session.query(CourseMaterial.id).filter(
+            db.or_(CourseMaterial.chunked.is_(None), CourseMaterial.chunked.is_(False))
+        ).limit(batch_size).all()]
+
+        if not ids:
+            break
+
+        for mat in CourseMaterial.query.filter(CourseMaterial.id.in_(ids)).all():
+            # Assigning content writes the chunks and clears the legacy column
+            mat.content = mat.legacy_content or ""
+
+        db.session.commit()
+        db.session.expunge_all()  # keep memory flat across batches
+        converted += len(ids)
+        print(f"✅ Chunked {converted} material(s)")
+
+    return converted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        total = chunk_existing_materials(args.batch_size)
+        print(f"🎉 Done: {total} material(s) converted")
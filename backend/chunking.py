@@ -0,0 +1,81 @@
+# chunking.py
+"""
+Split extracted material text into MaterialChunk-sized pieces.
+
+Cuts are made at "--- Page N ---" / "--- Slide N ---" / "--- Sheet N: name ---"
+markers first (so a
+chunk never spans two pages) and then at paragraph breaks, falling back to
+whitespace for very long paragraphs. The split is lossless: joining the
+chunk texts in ordinal order gives back the original string exactly.
+"""
+import re
+
+CHUNK_TARGET_CHARS = 4000
+CHUNK_MAX_CHARS = 8000
+
+PAGE_MARKER_RE = re.compile(r"--- (?:Page|Slide|Sheet) (\d+)(?:: [^\n]*?)? ---")
+
+
+def _page_segments(text):
+    """(start, end, page_number) spans, cut right before each page marker"""
+    markers = list(PAGE_MARKER_RE.finditer(text))
+    if not markers:
+        return [(0, len(text), None)]
+
+    segments = []
+    if markers[0].start() > 0:
+        segments.append((0, markers[0].start(), None))
+
+    for i, m in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        segments.append((m.start(), end, int(m.group(1))))
+
+    return segments
+
+
+def _find_cut(text, pos, target):
+    """Best cut position in (pos, pos + target]: paragraph break, else whitespace, else hard"""
+    lo = pos + target // 2
+    hi = pos + target
+
+    cut = text.rfind("\n\n", lo, hi)
+    if cut != -1:
+        return cut + 2
+
+    cut = text.rfind("\n", lo, hi)
+    if cut != -1:
+        return cut + 1
+
+    cut = text.rfind(" ", lo, hi)
+    if cut != -1:
+        return cut + 1
+
+    return hi
+
+
+def split_into_chunks(text, target=CHUNK_TARGET_CHARS, max_size=CHUNK_MAX_CHARS):
+    """
+    Returns a list of dicts with ordinal, char_start, char_end, page_number and text.
+    """
+    chunks = []
+    if not text:
+        return chunks
+
+    for seg_start, seg_end, page_number in _page_segments(text):
+        pos = seg_start
+        while pos < seg_end:
+            if seg_end - pos <= max_size:
+                end = seg_end
+            else:
+                end = _find_cut(text, pos, target)
+
+            chunks.append({
+                "ordinal": len(chunks),
+                "char_start": pos,
+                "char_end": end,
+                "page_number": page_number,
+                "text": text[pos:end],
+            })
+            pos = end
+
+    return chunks
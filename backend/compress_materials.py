@@ -0,0 +1,192 @@
+# compress_materials.py
+"""
+Convert stored material text to (or back from) compressed chunks, and report
+what compression saves and what decoding costs.
+
+    python compress_materials.py --train-dict [--codec zstd] [--samples 2000]
+    python compress_materials.py --codec zstd [--batch-size 500]
+    python compress_materials.py --codec none          # back to plain text
+    python compress_materials.py --report [--samples 500]
+
+Set MATERIAL_TEXT_CODEC to the same codec so newly extracted text is written
+compressed too. Materials still in the legacy content column need
+chunk_materials.py first. InnoDB only hands the freed pages back after
+OPTIMIZE TABLE material_chunks.
+"""
+import time
+import argparse
+
+from sqlalchemy import func
+from sqlalchemy.orm import undefer
+
+from app import create_app
+from extensions import db
+from models import CourseMaterial, MaterialChunk
+import content_codec
+
+
+def sample_chunk_texts(limit):
+    """Decoded text of up to limit chunks (uuid ids, so id order is effectively random)"""
+    rows = db.session.query(MaterialChunk.text, MaterialChunk.codec, MaterialChunk.text_z).order_by(
+        MaterialChunk.id
+    ).limit(limit).all()
+    return [content_codec.chunk_text(*r) for r in rows]
+
+
+def train_dictionary(codec, samples=2000, size=None):
+    texts = [t for t in sample_chunk_texts(samples) if t.strip()]
+    if len(texts) < 10:
+        print(f"⚠️ Only {len(texts)} chunk(s) to train on, not training a dictionary")
+        return None
+
+    started = time.time()
+    data = content_codec.train_dictionary(codec, texts, size)
+    if not data:
+        print("⚠️ Samples have nothing in common worth a dictionary")
+        return None
+    dict_id = content_codec.save_dictionary(codec, data)
+    print(f"✅ Trained {codec} dictionary {dict_id} ({len(data) / 1024:.1f} KB) "
+          f"on {len(texts)} chunk(s) in {time.time() - started:.1f}s")
+    return dict_id
+
+
+def convert_chunks(codec, level=None, batch_size=500):
+    """Rewrite every chunk not already stored the way codec (None = plain) would store it"""
+    codec = content_codec.resolve_codec(codec)
+    if codec:
+        dict_id = content_codec.current_dictionary_id(codec)
+        target = f"{codec}:{dict_id}" if dict_id else codec
+        pending = db.or_(MaterialChunk.codec.is_(None), MaterialChunk.codec != target)
+    else:
+        target = None
+        pending = MaterialChunk.codec.isnot(None)
+
+    converted = raw_bytes = stored_bytes = 0
+    while True:
+        ids = [row[0] for row in db.session.query(MaterialChunk.id).filter(pending).limit(batch_size).all()]
+        if not ids:
+            break
+
+        for chunk in MaterialChunk.query.options(undefer(MaterialChunk.text_z)).filter(MaterialChunk.id.in_(ids)):
+            text = chunk.body
+            chunk.text, chunk.codec, chunk.text_z = content_codec.encode_for_storage(text, codec, level)
+            raw_bytes += len(text.encode("utf-8"))
+            stored_bytes += len(chunk.text_z) if chunk.codec else len(text.encode("utf-8"))
+
+        db.session.commit()
+        db.session.expunge_all()  # keep memory flat across batches
+        converted += len(ids)
+        print(f"✅ Converted {converted} chunk(s) to {target or 'plain text'}")
+
+    if converted and raw_bytes:
+        print(f"📦 {raw_bytes / 1048576:.1f} MB of text now takes {stored_bytes / 1048576:.1f} MB "
+              f"({raw_bytes / max(stored_bytes, 1):.1f}x)")
+    return converted
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _table_bytes():
+    """material_chunks size according to InnoDB (MySQL only)"""
+    try:
+        return db.session.execute(db.text(
+            "SELECT data_length + index_length FROM information_schema.TABLES "
+            "WHERE table_schema = DATABASE() AND table_name = 'material_chunks'"
+        )).scalar()
+    except Exception:
+        db.session.rollback()
+        return None
+
+
+def report(samples=500):
+    print("Stored chunks")
+    print(f"{'codec':<28}{'chunks':>10}{'stored MB':>12}{'text chars (M)':>16}")
+    for codec, count, plain, packed, chars in db.session.query(
+        MaterialChunk.codec,
+        func.count(MaterialChunk.id),
+        func.sum(func.length(MaterialChunk.text)),
+        func.sum(func.length(MaterialChunk.text_z)),
+        func.sum(MaterialChunk.char_end - MaterialChunk.char_start)
+    ).group_by(MaterialChunk.codec).all():
+        stored = (packed if codec else plain) or 0
+        print(f"{codec or 'plain':<28}{count:>10}{stored / 1048576:>12.1f}{(chars or 0) / 1e6:>16.2f}")
+
+    legacy = CourseMaterial.query.filter(db.or_(CourseMaterial.chunked.is_(None), CourseMaterial.chunked.is_(False))).count()
+    if legacy:
+        print(f"⚠️ {legacy} material(s) still in the legacy content column (run chunk_materials.py)")
+    table_bytes = _table_bytes()
+    if table_bytes is not None:
+        print(f"material_chunks on disk (InnoDB): {table_bytes / 1048576:.1f} MB")
+
+    # Decode cost of what is stored now
+    rows = db.session.query(MaterialChunk.codec, MaterialChunk.text_z).filter(
+        MaterialChunk.codec.isnot(None)
+    ).order_by(MaterialChunk.id).limit(samples).all()
+    if rows:
+        timings, raw = [], 0
+        for tag, blob in rows:
+            started = time.perf_counter()
+            raw += len(content_codec.decode(tag, blob).encode("utf-8"))
+            timings.append(time.perf_counter() - started)
+        total = sum(timings)
+        print(f"\nDecoding {len(rows)} stored chunk(s): {raw / 1048576 / total:.0f} MB/s, "
+              f"p50 {_percentile(timings, 50) * 1e6:.0f}µs, p95 {_percentile(timings, 95) * 1e6:.0f}µs per chunk")
+
+    # What each codec would do with the same sample
+    texts = [t for t in sample_chunk_texts(samples) if t]
+    if not texts:
+        return
+    raw_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    print(f"\nCodecs on {len(texts)} sampled chunk(s), {raw_bytes / 1048576:.1f} MB of text")
+    print(f"{'codec':<28}{'ratio':>8}{'saved MB':>10}{'enc MB/s':>10}{'dec MB/s':>10}{'dec p95 µs':>12}")
+    for codec in content_codec.CODECS:
+        if not content_codec.available(codec):
+            print(f"{codec:<28}  (not installed)")
+            continue
+        for dict_id in dict.fromkeys([None, content_codec.current_dictionary_id(codec)]):
+            started = time.perf_counter()
+            encoded = [content_codec.encode(t, codec, dict_id=dict_id) for t in texts]
+            enc_s = time.perf_counter() - started
+
+            timings = []
+            for tag, blob in encoded:
+                t0 = time.perf_counter()
+                content_codec.decode(tag, blob)
+                timings.append(time.perf_counter() - t0)
+
+            packed = sum(len(blob) for _, blob in encoded)
+            label = f"{codec}:{dict_id}" if dict_id else codec
+            print(f"{label:<28}{raw_bytes / max(packed, 1):>8.2f}{(raw_bytes - packed) / 1048576:>10.1f}"
+                  f"{raw_bytes / 1048576 / enc_s:>10.0f}{raw_bytes / 1048576 / sum(timings):>10.0f}"
+                  f"{_percentile(timings, 95) * 1e6:>12.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codec", choices=["zlib", "zstd", "none"], help="convert chunks to this storage")
+    parser.add_argument("--level", type=int, help="compression level (codec default if omitted)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--train-dict", action="store_true", help="train a shared dictionary on existing chunks")
+    parser.add_argument("--dict-size", type=int, help="dictionary size in bytes")
+    parser.add_argument("--samples", type=int, help="chunks to train on (2000) / to report on (500)")
+    parser.add_argument("--report", action="store_true")
+    args = parser.parse_args()
+
+    if not (args.codec or args.train_dict or args.report):
+        parser.error("pass --codec, --train-dict and/or --report")
+
+    app = create_app()
+    with app.app_context():
+        codec = None if args.codec == "none" else args.codec
+        if args.train_dict:
+            dict_codec = content_codec.resolve_codec(codec or ("zstd" if content_codec.ZSTD_AVAILABLE else "zlib"))
+            train_dictionary(dict_codec, samples=args.samples or 2000, size=args.dict_size)
+        if args.codec:
+            convert_chunks(codec, args.level, args.batch_size)
+        if args.report:
+            report(args.samples or 500)
@@ -13,3 +13,93 @@ class Config:
     )
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB
+
+    # Background extraction queue
+    EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "4"))
+    EXTRACTION_MAX_PER_STUDENT = int(os.getenv("EXTRACTION_MAX_PER_STUDENT", "2"))
+    EXTRACTION_MAX_ATTEMPTS = int(os.getenv("EXTRACTION_MAX_ATTEMPTS", "3"))
+    EXTRACTION_RETRY_BACKOFF = int(os.getenv("EXTRACTION_RETRY_BACKOFF", "10"))  # seconds, doubled per attempt
+    EXTRACTION_HEARTBEAT = int(os.getenv("EXTRACTION_HEARTBEAT", "30"))  # seconds between running-job heartbeats
+    EXTRACTION_STALE_AFTER = int(os.getenv("EXTRACTION_STALE_AFTER", "300"))  # seconds without a heartbeat before a job is reclaimed
+
+    # PDF extraction
+    PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))  # 0 = no limit
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+    PDF_EXTRACTION_PROCESSES = int(os.getenv("PDF_EXTRACTION_PROCESSES", "0")) or None  # None = one per CPU
+    PDF_PROBE_PAGES = int(os.getenv("PDF_PROBE_PAGES", "3"))
+
+    # Local OCR (tesseract) for scanned pages and image uploads
+    PDF_OCR_ENABLED = os.getenv("PDF_OCR_ENABLED", "true").lower() == "true"
+    PDF_OCR_MAX_PAGES = int(os.getenv("PDF_OCR_MAX_PAGES", "50"))  # per document; 0 = no limit
+    PDF_OCR_TIMEOUT = int(os.getenv("PDF_OCR_TIMEOUT", "300"))  # seconds for the whole OCR stage
+    PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", "200"))
+    PDF_OCR_PAGES_PER_TASK = int(os.getenv("PDF_OCR_PAGES_PER_TASK", "2"))
+    OCR_LANG = os.getenv("OCR_LANG", "eng")  # tesseract language(s), e.g. "eng+hin"
+
+    # Serving /uploads: hand file bodies to the front web server (nginx X-Accel / Apache X-Sendfile)
+    USE_X_SENDFILE = os.getenv("USE_X_SENDFILE", "false").lower() == "true"
+
+
+    # Resumable uploads (each PUT stays well under MAX_CONTENT_LENGTH)
+    RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    RESUMABLE_MAX_FILE_SIZE = int(os.getenv("RESUMABLE_MAX_FILE_SIZE", str(2 * 1024 * 1024 * 1024)))
+    RESUMABLE_SESSION_TTL_HOURS = int(os.getenv("RESUMABLE_SESSION_TTL_HOURS", "24"))
+
+    # Extraction result cache (uploads/extraction_cache), LRU-evicted past this size
+    EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+    # Local subject classifier (train with train_subject_classifier.py); below its confidence threshold
+    # Gemini decides. Training calibrates the threshold for TARGET_ACCURACY on held-out materials;
+    # MIN_CONFIDENCE only applies to a model trained without enough data for that
+    SUBJECT_CLASSIFIER_TARGET_ACCURACY = float(os.getenv("SUBJECT_CLASSIFIER_TARGET_ACCURACY", "0.95"))
+    SUBJECT_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("SUBJECT_CLASSIFIER_MIN_CONFIDENCE", "0.5"))
+
+    # Bulk (zip / multi-file) uploads
+    BULK_UPLOAD_MAX_FILES = int(os.getenv("BULK_UPLOAD_MAX_FILES", "200"))
+    BULK_UPLOAD_MAX_BYTES = int(os.getenv("BULK_UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))  # total uncompressed
+    EXTRACTION_MAX_PER_STUDENT_BULK = int(os.getenv("EXTRACTION_MAX_PER_STUDENT_BULK", "4"))
+
+    # Live extraction progress (Server-Sent Events)
+    PROGRESS_KEEPALIVE_SECONDS = int(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+
+    # Spreadsheet / CSV extraction
+    TABLE_MAX_ROWS = int(os.getenv("TABLE_MAX_ROWS", "5000"))  # per file; 0 = no limit
+    TABLE_MAX_CELL_CHARS = int(os.getenv("TABLE_MAX_CELL_CHARS", "200"))
+
+    # Stored material text: '' = plain, 'zlib' or 'zstd' (see content_codec, compress_materials.py)
+    MATERIAL_TEXT_CODEC = os.getenv("MATERIAL_TEXT_CODEC", "")
+    MATERIAL_TEXT_LEVEL = int(os.getenv("MATERIAL_TEXT_LEVEL", "0")) or None  # None = codec default
+
+    # Strip repeated headers/footers, hyphenation and whitespace from extracted text (see text_normalization)
+    TEXT_NORMALIZATION_ENABLED = os.getenv("TEXT_NORMALIZATION_ENABLED", "true").lower() == "true"
+
+    # Semantic passage retrieval (see semantic_index): 'hashed' or a local sentence-transformers model dir
+    SEMANTIC_INDEX_ENABLED = os.getenv("SEMANTIC_INDEX_ENABLED", "true").lower() == "true"
+    SEMANTIC_EMBEDDER = os.getenv("SEMANTIC_EMBEDDER", "hashed")
+    SEMANTIC_FUSION = os.getenv("SEMANTIC_FUSION", "true").lower() == "true"  # false = only when BM25 finds nothing
+
+    # QA chat history (see chat_history): 'sql' (chat_messages table) or 'memory' (per process)
+    CHAT_HISTORY_BACKEND = os.getenv("CHAT_HISTORY_BACKEND", "sql")
+    CHAT_HISTORY_RECENT_TURNS = int(os.getenv("CHAT_HISTORY_RECENT_TURNS", "10"))  # cached per (student, material)
+    CHAT_HISTORY_CACHE_SIZE = int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "1000"))
+    CHAT_HISTORY_CACHE_TTL = int(os.getenv("CHAT_HISTORY_CACHE_TTL", "30"))
+
+    # Rolling summary of older chat turns in QA prompts (see conversation_memory)
+    CHAT_SUMMARY_EVERY = int(os.getenv("CHAT_SUMMARY_EVERY", "6"))  # turns out of the verbatim window per refresh
+    CHAT_SUMMARY_RECENT_TURNS = int(os.getenv("CHAT_SUMMARY_RECENT_TURNS", "4"))  # sent verbatim
+    CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "1500"))
+    CHAT_SUMMARY_WORKERS = int(os.getenv("CHAT_SUMMARY_WORKERS", "2"))
+
+    # Wikipedia context for QA (see wikipedia_enrichment; metrics at /api/debug/wikipedia)
+    WIKIPEDIA_ENABLED = os.getenv("WIKIPEDIA_ENABLED", "true").lower() == "true"
+    WIKIPEDIA_API_URL = os.getenv("WIKIPEDIA_API_URL", "https://en.wikipedia.org/api/rest_v1")
+    WIKIPEDIA_BUDGET_MS = int(os.getenv("WIKIPEDIA_BUDGET_MS", "800"))  # per question, all lookups
+    WIKIPEDIA_MAX_TERMS = int(os.getenv("WIKIPEDIA_MAX_TERMS", "2"))
+    WIKIPEDIA_CACHE_SIZE = int(os.getenv("WIKIPEDIA_CACHE_SIZE", "5000"))
+    WIKIPEDIA_CACHE_TTL = int(os.getenv("WIKIPEDIA_CACHE_TTL", "86400"))
+    WIKIPEDIA_NEGATIVE_TTL = int(os.getenv("WIKIPEDIA_NEGATIVE_TTL", "3600"))  # terms without an article
+    WIKIPEDIA_POOL_SIZE = int(os.getenv("WIKIPEDIA_POOL_SIZE", "8"))
+
+    # ask-question context sources run side by side under one deadline (see context_assembler)
+    CONTEXT_DEADLINE_MS = int(os.getenv("CONTEXT_DEADLINE_MS", "1500"))
+    CONTEXT_WORKERS = int(os.getenv("CONTEXT_WORKERS", "8"))
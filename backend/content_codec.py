@@ -0,0 +1,213 @@
+# content_codec.py
+"""
+Compression for stored material text (MaterialChunk.text_z).
+
+A chunk's codec tag says how its bytes were written:
+    None            plain text in MaterialChunk.text
+    "zlib"          zlib (stdlib)
+    "zlib:<id>"     zlib with a preset dictionary
+    "zstd"          zstandard (optional dependency)
+    "zstd:<id>"     zstandard with a trained dictionary
+
+Lecture notes share a lot of vocabulary and boilerplate, which small chunks
+cannot exploit on their own; a shared dictionary trained on existing chunks
+gives them that context. Dictionaries are stored under
+uploads/models/text_dicts/<codec>-<id>.dict, named by a hash of their bytes,
+and are never overwritten, so every tag stays decodable after retraining.
+
+Nothing in here touches Flask.
+"""
+import os
+import json
+import zlib
+import hashlib
+import threading
+from collections import Counter
+
+import lazy_imports
+
+zstandard = lazy_imports.lazy("zstandard")
+ZSTD_AVAILABLE = lazy_imports.available("zstandard")
+
+DICT_ROOT = os.path.join(os.path.dirname(__file__), "uploads", "models", "text_dicts")
+CURRENT_FILE = os.path.join(DICT_ROOT, "current.json")
+
+CODECS = ("zlib", "zstd")
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+ZLIB_MAX_DICT = 32 * 1024  # deflate's window; a longer zdict is ignored past this
+DEFAULT_DICT_SIZE = {"zlib": ZLIB_MAX_DICT, "zstd": 110 * 1024}
+
+_dicts = {}
+_dicts_lock = threading.Lock()
+
+
+def available(codec):
+    return codec == "zlib" or (codec == "zstd" and ZSTD_AVAILABLE)
+
+
+def resolve_codec(codec):
+    """The codec actually used for a configured name ('' / None = store plain text)"""
+    if not codec or codec == "none":
+        return None
+    if codec not in CODECS:
+        raise ValueError(f"unknown text codec '{codec}'")
+    return codec if available(codec) else "zlib"
+
+
+def split_tag(tag):
+    codec, _, dict_id = tag.partition(":")
+    return codec, dict_id or None
+
+
+# Dictionaries
+
+def _train_zlib_dictionary(samples, size):
+    """
+    zlib has no trainer: keep the lines that recur across most samples
+    (headers, footers, recurring terms), most frequent last, since deflate
+    reaches the end of the dictionary with the shortest distances.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update({line.strip() for line in sample.splitlines() if 8 <= len(line.strip()) <= 200})
+
+    picked, used = [], 0
+    for line, n in counts.most_common():
+        if n < 2:
+            break
+        data = (line + "\n").encode("utf-8")
+        if used + len(data) > size:
+            continue
+        picked.append(data)
+        used += len(data)
+    return b"".join(reversed(picked))
+
+
+def train_dictionary(codec, samples, size=None):
+    """Dictionary bytes trained on sample texts"""
+    size = size or DEFAULT_DICT_SIZE[codec]
+    if codec == "zlib":
+        return _train_zlib_dictionary(samples, min(size, ZLIB_MAX_DICT))
+    if codec == "zstd":
+        encoded = [s.encode("utf-8") for s in samples if s]
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+    raise ValueError(f"unknown text codec '{codec}'")
+
+
+def save_dictionary(codec, data, make_current=True):
+    """Store a dictionary and return its id"""
+    dict_id = hashlib.sha256(data).hexdigest()[:16]
+    os.makedirs(DICT_ROOT, exist_ok=True)
+    path = os.path.join(DICT_ROOT, f"{codec}-{dict_id}.dict")
+    if not os.path.exists(path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    if make_current:
+        current = _read_current()
+        current[codec] = dict_id
+        tmp = CURRENT_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(current, f)
+        os.replace(tmp, CURRENT_FILE)
+    return dict_id
+
+
+def _read_current():
+    try:
+        with open(CURRENT_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def current_dictionary_id(codec):
+    """Id of the dictionary new chunks are written with, or None"""
+    dict_id = _read_current().get(codec)
+    if dict_id and os.path.exists(os.path.join(DICT_ROOT, f"{codec}-{dict_id}.dict")):
+        return dict_id
+    return None
+
+
+def load_dictionary(codec, dict_id):
+    """Raw bytes for zlib, a ZstdCompressionDict for zstd; cached per process"""
+    key = (codec, dict_id)
+    with _dicts_lock:
+        cached = _dicts.get(key)
+    if cached is not None:
+        return cached
+
+    with open(os.path.join(DICT_ROOT, f"{codec}-{dict_id}.dict"), "rb") as f:
+        data = f.read()
+    loaded = zstandard.ZstdCompressionDict(data) if codec == "zstd" else data
+
+    with _dicts_lock:
+        _dicts[key] = loaded
+    return loaded
+
+
+# Encode / decode
+
+def encode(text, codec, level=None, dict_id=None):
+    """Compress text; returns (tag, bytes)"""
+    level = level or DEFAULT_LEVELS[codec]
+    raw = text.encode("utf-8")
+
+    if codec == "zlib":
+        if dict_id:
+            comp = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY,
+                                    load_dictionary("zlib", dict_id))
+        else:
+            comp = zlib.compressobj(level)
+        blob = comp.compress(raw) + comp.flush()
+    elif codec == "zstd":
+        if dict_id:
+            cctx = zstandard.ZstdCompressor(level=level, dict_data=load_dictionary("zstd", dict_id))
+        else:
+            cctx = zstandard.ZstdCompressor(level=level)
+        blob = cctx.compress(raw)
+    else:
+        raise ValueError(f"unknown text codec '{codec}'")
+
+    return (f"{codec}:{dict_id}" if dict_id else codec), blob
+
+
+def decode(tag, blob):
+    codec, dict_id = split_tag(tag)
+    if codec == "zlib":
+        if dict_id:
+            dec = zlib.decompressobj(zdict=load_dictionary("zlib", dict_id))
+            raw = dec.decompress(blob) + dec.flush()
+        else:
+            raw = zlib.decompress(blob)
+    elif codec == "zstd":
+        if dict_id:
+            dctx = zstandard.ZstdDecompressor(dict_data=load_dictionary("zstd", dict_id))
+        else:
+            dctx = zstandard.ZstdDecompressor()
+        raw = dctx.decompress(blob)
+    else:
+        raise ValueError(f"unknown text codec '{codec}'")
+    return raw.decode("utf-8")
+
+
+def chunk_text(text, tag, blob):
+    """A chunk's text from its (text, codec, text_z) columns"""
+    if not tag:
+        return text or ""
+    return decode(tag, blob)
+
+
+def encode_for_storage(text, codec, level=None):
+    """
+    (text, tag, blob) column values for a chunk with the configured codec:
+    plain text when codec is off, otherwise the compressed bytes with the
+    codec's current dictionary (if one has been trained).
+    """
+    codec = resolve_codec(codec)
+    if codec is None:
+        return text, None, None
+    tag, blob = encode(text, codec, level, current_dictionary_id(codec))
+    return None, tag, blob
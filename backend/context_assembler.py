@@ -0,0 +1,108 @@
+# context_assembler.py
+"""
+Concurrent context assembly for ask-question.
+
+A question's context comes from independent sources: the student's
+material, Wikipedia, the conversation memory. gather() starts the pooled
+sources on a shared thread pool (each in its own app context, so with its
+own database session), runs inline sources on the calling thread meanwhile,
+and then waits for the pooled ones only until the overall deadline (or a
+source's own, shorter budget). A source that misses it is dropped and its
+default used; it keeps running in the background, so e.g. a late Wikipedia
+summary still lands in its cache for the next question.
+
+Inline sources are for work that needs the request's session (ORM objects
+loaded by the view); they are not cut short, so keep them to fast ones.
+
+Every call reports per-source timings and status (ok / dropped / error).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+
+
+class Source:
+    def __init__(self, name, fn, budget=None, inline=False, default=None):
+        self.name = name
+        self.fn = fn
+        self.budget = budget  # seconds; None = the overall deadline
+        self.inline = inline
+        self.default = default
+
+
+class ContextAssembler:
+    def __init__(self):
+        self.app = None
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        self.deadline = app.config.get("CONTEXT_DEADLINE_MS", 1500) / 1000
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get("CONTEXT_WORKERS", 8),
+            thread_name_prefix="context"
+        )
+        app.extensions["context_assembler"] = self
+
+    @staticmethod
+    def _run_in_context(app, fn):
+        started = time.perf_counter()
+        with app.app_context():
+            value = fn()
+        return value, (time.perf_counter() - started) * 1000
+
+    def gather(self, sources, deadline=None):
+        """
+        Run sources concurrently; returns ({name: value}, {name: {"ms", "status"}}).
+        Dropped or failed sources get their default.
+        """
+        started = time.perf_counter()
+        ends_at = started + (self.deadline if deadline is None else deadline)
+        app = current_app._get_current_object()
+
+        futures = {}
+        for source in sources:
+            if not source.inline:
+                if self._executor is None:  # not initialised (scripts): run it here
+                    source.inline = True
+                    continue
+                futures[source.name] = self._executor.submit(self._run_in_context, app, source.fn)
+
+        results, timings = {}, {}
+        for source in sources:
+            if not source.inline:
+                continue
+            t0 = time.perf_counter()
+            try:
+                results[source.name] = source.fn()
+                status = "ok"
+            except Exception as e:
+                current_app.logger.warning(f"⚠️ Context source {source.name} failed: {str(e)}")
+                results[source.name] = source.default
+                status = "error"
+            timings[source.name] = {"ms": round((time.perf_counter() - t0) * 1000, 1), "status": status}
+
+        for source in sources:
+            future = futures.get(source.name)
+            if future is None:
+                continue
+            limit = ends_at if source.budget is None else min(ends_at, started + source.budget)
+            try:
+                value, ms = future.result(timeout=max(limit - time.perf_counter(), 0))
+                results[source.name] = value
+                timings[source.name] = {"ms": round(ms, 1), "status": "ok"}
+            except FutureTimeout:
+                future.cancel()  # only helps if it never started; otherwise it finishes unobserved
+                results[source.name] = source.default
+                timings[source.name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "status": "dropped"}
+            except Exception as e:
+                current_app.logger.warning(f"⚠️ Context source {source.name} failed: {str(e)}")
+                results[source.name] = source.default
+                timings[source.name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "status": "error"}
+
+        timings["total"] = {"ms": round((time.perf_counter() - started) * 1000, 1)}
+        return results, timings
+
+
+context_assembler = ContextAssembler()
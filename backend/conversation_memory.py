@@ -0,0 +1,268 @@
+# conversation_memory.py
+"""
+Bounded conversation memory for QA prompts.
+
+A prompt gets the last CHAT_SUMMARY_RECENT_TURNS turns verbatim (each
+capped) plus a rolling summary of everything before them, capped at
+CHAT_SUMMARY_MAX_CHARS, so its size stays the same however long the
+conversation gets. Older turns the summary doesn't cover yet are added as
+extractive lines (capped the same way) until it does.
+
+The summary is stored per (student, material) conversation in
+conversation_summaries along with the last turn it covers. Once
+CHAT_SUMMARY_EVERY turns have aged out of the verbatim window without being
+covered, a background thread folds them into the summary, with the
+summarizer routes.qa registers (Gemini), or an extractive one when that
+fails or returns nothing. Asking a question never waits for a summary.
+
+Workers refresh with an optimistic conditional UPDATE on the covered turn,
+so two workers summarizing the same conversation don't both write.
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import ConversationSummary
+from chat_history import chat_history, material_key, encode_cursor
+
+MAX_BATCH = 40  # turns folded in per summarizer call at most
+QUESTION_CHARS = 150
+ANSWER_CHARS = 200
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s|\n")
+_MARKDOWN_RE = re.compile(r"[*#_`>]+")
+
+
+def _turn_key(turn):
+    return datetime.fromisoformat(turn["timestamp"]), turn["id"]
+
+
+def _after(turn, state):
+    """True when the summary in state does not cover turn yet"""
+    if not state or not state.get("covered_until"):
+        return True
+    return _turn_key(turn) > (state["covered_until"], state["covered_id"])
+
+
+def _cursor(state):
+    """chat_history cursor for the last turn the summary in state covers, or None"""
+    if not state or not state.get("covered_until"):
+        return None
+    return encode_cursor({"timestamp": state["covered_until"].isoformat(), "id": state["covered_id"]})
+
+
+def extractive_summary(previous, turns, max_chars):
+    """One line per turn: the question and the first sentence of its answer; oldest lines go first"""
+    lines = [line for line in (previous or "").splitlines() if line.strip()]
+    for turn in turns:
+        answer = _MARKDOWN_RE.sub("", turn["answer"] or "").strip()
+        answer = _SENTENCE_END_RE.split(answer, 1)[0].strip()
+        question = " ".join((turn["question"] or "").split())
+        lines.append(f"- Asked: {question[:QUESTION_CHARS]} -> {answer[:ANSWER_CHARS]}")
+    while len(lines) > 1 and len("\n".join(lines)) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)[:max_chars]
+
+
+class ConversationMemory:
+    def __init__(self):
+        self.app = None
+        self._summarize = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._cache = OrderedDict()  # (student_id, material_id) -> (loaded_at, state dict or None)
+
+    def init_app(self, app):
+        self.app = app
+        self.every = app.config.get("CHAT_SUMMARY_EVERY", 6)
+        self.recent_turns = app.config.get("CHAT_SUMMARY_RECENT_TURNS", 4)
+        self.max_chars = app.config.get("CHAT_SUMMARY_MAX_CHARS", 1500)
+        self.cache_size = app.config.get("CHAT_HISTORY_CACHE_SIZE", 1000)
+        self.cache_ttl = app.config.get("CHAT_HISTORY_CACHE_TTL", 30)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get("CHAT_SUMMARY_WORKERS", 2),
+            thread_name_prefix="chat-summary"
+        )
+        app.extensions["conversation_memory"] = self
+
+    def summarizer(self, f):
+        """Register f(previous_summary, turns, max_chars) -> summary text or None"""
+        self._summarize = f
+        return f
+
+    # Reading
+
+    def state(self, student_id, material_id=None):
+        """The stored summary as a dict (cached like chat history), or None"""
+        key = (str(student_id), material_key(material_id))
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.monotonic() - entry[0] < self.cache_ttl:
+                self._cache.move_to_end(key)
+                return entry[1]
+
+        row = ConversationSummary.query.filter_by(student_id=key[0], material_id=key[1]).first()
+        state = self._as_state(row)
+        self._remember(key, state)
+        return state
+
+    def prompt_parts(self, student_id, material_id=None):
+        """(summary of older turns, last few turns verbatim, oldest first) for a prompt"""
+        turns = chat_history.recent(student_id, material_id)
+        state = self.state(student_id, material_id)
+        summary = state["summary"] if state else ""
+
+        # Turns that left the verbatim window but aren't summarized yet go in as
+        # extractive lines until the background refresh catches up
+        older = turns[:-self.recent_turns] if self.recent_turns else turns
+        uncovered = [t for t in older if _after(t, state)]
+        if uncovered:
+            summary = "\n".join(filter(None, [summary, extractive_summary("", uncovered, self.max_chars)]))
+
+        return summary, turns[-self.recent_turns:] if self.recent_turns else []
+
+    # Refreshing
+
+    def note_turn(self, student_id, material_id=None):
+        """After a saved turn: refresh in the background once enough turns left the verbatim window"""
+        turns = chat_history.recent(student_id, material_id)
+        older = turns[:-self.recent_turns] if self.recent_turns else turns
+        uncovered = [t for t in older if _after(t, self.state(student_id, material_id))]
+        # chat_history.recent only shows so many turns; a full window is enough then
+        threshold = min(self.every, max(chat_history.recent_turns - self.recent_turns, 1))
+        if len(uncovered) >= threshold:
+            self.schedule(student_id, material_id)
+
+    def schedule(self, student_id, material_id=None):
+        key = (str(student_id), material_key(material_id))
+        with self._lock:
+            if key in self._pending or self._executor is None:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._run, key)
+
+    def _run(self, key):
+        try:
+            with self.app.app_context():
+                try:
+                    self.refresh(*key)
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.warning(f"⚠️ Conversation summary for {key} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def refresh(self, student_id, material_id=None):
+        """
+        Fold turns older than the verbatim window into the summary, oldest
+        first and MAX_BATCH at a time until caught up; returns the new state
+        or None when there was nothing to do (or another worker got there first).
+        """
+        key = (str(student_id), material_key(material_id))
+        window = None
+        if self.recent_turns:
+            recent, _ = chat_history.page(*key, limit=self.recent_turns)
+            if len(recent) < self.recent_turns:
+                return None
+            window = _turn_key(recent[0])  # oldest verbatim turn
+
+        folded = None
+        while True:
+            row = ConversationSummary.query.filter_by(student_id=key[0], material_id=key[1]).first()
+            state = self._as_state(row)
+            turns = chat_history.since(*key, limit=MAX_BATCH, after=_cursor(state))
+            new = [t for t in turns if window is None or _turn_key(t) < window]
+            if not new:
+                return folded
+            state = self._fold(key, row, state, new)
+            if state is None:
+                return folded
+            folded = state
+            if len(new) < MAX_BATCH:
+                return folded
+
+    def _fold(self, key, row, state, new):
+        """Write the summary of state plus new turns; the new state, or None when another worker moved it on"""
+        previous = state["summary"] if state else ""
+        started = time.time()
+        summary = None
+        if self._summarize:
+            try:
+                summary = self._summarize(previous, new, self.max_chars)
+            except Exception as e:
+                self.app.logger.warning(f"⚠️ Summarizer failed for {key[0]}:{key[1]}, using extractive: {str(e)}")
+        engine = "summarizer" if summary else "extractive"
+        if not summary:
+            summary = extractive_summary(previous, new, self.max_chars)
+        summary = summary.strip()[:self.max_chars]
+
+        covered_until, covered_id = _turn_key(new[-1])
+        values = {
+            "summary": summary,
+            "covered_until": covered_until,
+            "covered_id": covered_id,
+            "turns_covered": (state["turns_covered"] if state else 0) + len(new),
+            "updated_at": datetime.utcnow()
+        }
+        if row is None:
+            db.session.add(ConversationSummary(student_id=key[0], material_id=key[1], **values))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # another worker stored the first summary meanwhile
+                return None
+        else:
+            # Only if nobody moved the summary on since we read it
+            updated = ConversationSummary.query.filter_by(id=row.id, covered_id=row.covered_id).update(
+                values, synchronize_session=False
+            )
+            db.session.commit()
+            if not updated:
+                return None
+
+        state = dict(values)
+        self._remember(key, state)
+        self.app.logger.info(
+            f"🧠 Summarized {len(new)} turn(s) of {key[0]}:{key[1]} ({engine}, "
+            f"{len(summary)} chars, {time.time() - started:.1f}s)"
+        )
+        return state
+
+    def clear(self, student_id, material_id=None):
+        key = (str(student_id), material_key(material_id))
+        ConversationSummary.query.filter_by(student_id=key[0], material_id=key[1]).delete(synchronize_session=False)
+        db.session.commit()
+        with self._lock:
+            self._cache.pop(key, None)
+
+    # Cache
+
+    @staticmethod
+    def _as_state(row):
+        if row is None:
+            return None
+        return {
+            "summary": row.summary or "",
+            "covered_until": row.covered_until,
+            "covered_id": row.covered_id,
+            "turns_covered": row.turns_covered or 0,
+            "updated_at": row.updated_at
+        }
+
+    def _remember(self, key, state):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), state)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+conversation_memory = ConversationMemory()
@@ -0,0 +1,129 @@
+# extraction_cache.py
+"""
+On-disk cache of extraction results.
+
+Entries are keyed by (file hash, extractor name, extractor version, options),
+so a result is reused only while neither the file nor the extractor code or
+its settings have changed. Bump the extractor's version in
+routes/materials.py EXTRACTOR_VERSIONS whenever its output changes.
+
+Entries are gzipped JSON files under uploads/extraction_cache; when the total
+size passes the configured limit the least recently used ones are removed.
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+
+CACHE_ROOT = os.path.join(os.path.dirname(__file__), "uploads", "extraction_cache")
+
+_evict_lock = threading.Lock()
+_approx_total = None  # running size estimate, so puts don't walk the tree every time
+
+
+def file_sha256(path, chunk_size=64 * 1024):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as rf:
+        while True:
+            chunk = rf.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def cache_key(file_hash, extractor, version, options=None):
+    raw = json.dumps([file_hash, extractor, str(version), options or {}], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_ROOT, key[:2], f"{key}.json.gz")
+
+
+def get(key):
+    """Cached {"text": ..., "report": ...} or None"""
+    path = _entry_path(key)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as rf:
+            entry = json.load(rf)
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+    # mtime doubles as last-used time for LRU eviction
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return entry
+
+
+def put(key, text, report=None, max_bytes=None):
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as wf:
+        json.dump({"text": text, "report": report or {}, "created_at": time.time()}, wf)
+    os.replace(tmp_path, path)
+
+    if max_bytes:
+        global _approx_total
+        if _approx_total is None:
+            _approx_total = _scan()[1]
+        else:
+            _approx_total += os.path.getsize(path)
+        if _approx_total > max_bytes:
+            evict(max_bytes)
+
+
+def _scan():
+    """[(mtime, size, path)] of every entry, plus their total size"""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_ROOT):
+        for name in files:
+            if not name.endswith(".json.gz"):
+                continue
+            full = os.path.join(root, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, full))
+            total += st.st_size
+    return entries, total
+
+
+def evict(max_bytes):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    global _approx_total
+    with _evict_lock:
+        entries, total = _scan()
+        _approx_total = total
+
+        if total <= max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, full in sorted(entries):
+            try:
+                os.remove(full)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            if total <= max_bytes:
+                break
+
+        _approx_total = total
+        return removed
+
+
+def invalidate(key):
+    try:
+        os.remove(_entry_path(key))
+    except OSError:
+        pass
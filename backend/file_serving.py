@@ -0,0 +1,142 @@
+# file_serving.py
+"""
+Uploaded-file responses with HTTP caching and byte ranges.
+
+send_upload() wraps flask.send_file with conditional=True, which already
+gives us strong ETags, If-None-Match / If-Modified-Since (304) and a single
+Range (206, honouring If-Range). The file body goes out through the WSGI
+server's file wrapper, so gunicorn & co. use sendfile(2) for it, and with
+USE_X_SENDFILE the front web server streams it instead of Python.
+
+werkzeug does not do multi-range requests (bytes=0-99,500-599); those are
+answered here as multipart/byteranges, streamed from disk a block at a time.
+"""
+import os
+import uuid
+import mimetypes
+from datetime import datetime, timezone
+
+from flask import request, send_file, current_app
+from werkzeug.http import is_resource_modified
+
+READ_BLOCK = 64 * 1024
+MAX_RANGES = 50  # more than this and the Range header is ignored (RFC 7233 §6.1)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _satisfiable_ranges(ranges, length):
+    """(start, stop) pairs clamped to the file, sorted and coalesced; stop is exclusive"""
+    spans = []
+    for start, stop in ranges:
+        if start < 0:  # suffix range: the last -start bytes
+            start, stop = max(length + start, 0), length
+        stop = length if stop is None else min(stop, length)
+        if start < stop:
+            spans.append((start, stop))
+
+    spans.sort()
+    merged = []
+    for start, stop in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _if_range_allows(etag, mtime):
+    """False when an If-Range validator no longer matches (then the full file is sent)"""
+    if_range = request.if_range
+    if if_range.etag:
+        return bool(etag) and if_range.etag == etag
+    if if_range.date:
+        return mtime <= if_range.date
+    return True
+
+
+def _multirange_response(path, spans, length, mimetype):
+    boundary = uuid.uuid4().hex
+    headers = [
+        (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{length}\r\n\r\n"
+        ).encode("ascii")
+        for start, stop in spans
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("ascii")
+    content_length = sum(len(h) for h in headers) + sum(stop - start for start, stop in spans) + len(closing)
+
+    def generate():
+        with open(path, "rb") as f:
+            for header, (start, stop) in zip(headers, spans):
+                yield header
+                f.seek(start)
+                remaining = stop - start
+                while remaining:
+                    block = f.read(min(READ_BLOCK, remaining))
+                    if not block:
+                        return
+                    remaining -= len(block)
+                    yield block
+        yield closing
+
+    rv = current_app.response_class(
+        generate(), status=206, mimetype=f"multipart/byteranges; boundary={boundary}", direct_passthrough=True
+    )
+    rv.content_length = content_length
+    return rv
+
+
+def send_upload(path, etag=None, download_name=None, as_attachment=True, immutable=False):
+    """
+    Serve a file on disk with conditional GET and Range support.
+    etag is the content hash when known (a strong validator); otherwise
+    werkzeug derives one from mtime/size/path. Content-addressed files are
+    immutable and may be cached by the browser for a year.
+    """
+    stat = os.stat(path)
+    length = stat.st_size
+    mtime = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+
+    ranges = request.range
+    multirange = ranges is not None and ranges.units == "bytes" and len(ranges.ranges) > 1
+    if (multirange and len(ranges.ranges) <= MAX_RANGES
+            and is_resource_modified(request.environ, etag=etag, last_modified=mtime)
+            and _if_range_allows(etag, mtime)):
+        spans = _satisfiable_ranges(ranges.ranges, length)
+        if not spans:
+            rv = current_app.response_class(status=416)
+            rv.headers["Content-Range"] = f"bytes */{length}"
+            return rv
+
+        mimetype = mimetypes.guess_type(download_name or path)[0] or "application/octet-stream"
+        rv = _multirange_response(path, spans, length, mimetype)
+        if etag:
+            rv.set_etag(etag)
+        rv.last_modified = mtime
+        rv.headers["Accept-Ranges"] = "bytes"
+    else:
+        if multirange:
+            # werkzeug answers any multi-range with 416; without the header it
+            # sends the 304 or the full file, which is what these cases need
+            request.environ.pop("HTTP_RANGE", None)
+        rv = send_file(
+            path,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=etag if etag else True,
+            last_modified=mtime,
+            max_age=IMMUTABLE_MAX_AGE if immutable else 0,
+        )
+
+    # Students' own files: never in shared caches
+    rv.cache_control.public = False
+    rv.cache_control.private = True
+    if immutable:
+        rv.cache_control.max_age = IMMUTABLE_MAX_AGE
+        rv.cache_control.immutable = True
+    else:
+        rv.cache_control.no_cache = True  # always revalidate, the ETag makes that a 304
+    return rv
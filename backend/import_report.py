@@ -0,0 +1,63 @@
+# import_report.py
+"""
+Startup import-time report: how long importing the app takes, and what each
+optional library (deferred by lazy_imports) would add if it were imported
+eagerly. Every measurement runs in a fresh interpreter.
+
+    python import_report.py
+"""
+import sys
+import json
+import subprocess
+
+APP_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import app
+elapsed = (time.perf_counter() - started) * 1000
+import lazy_imports
+print(json.dumps({
+    "app_import_ms": elapsed,
+    "modules": {name: name in sys.modules for name in lazy_imports.registered()}
+}))
+"""
+
+MODULE_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+try:
+    __import__(sys.argv[1])
+    print(json.dumps((time.perf_counter() - started) * 1000))
+except Exception:
+    print("null")
+"""
+
+
+def run_probe(code, *args):
+    out = subprocess.run(
+        [sys.executable, "-c", code, *args],
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()
+    return json.loads(out[-1])
+
+
+if __name__ == '__main__':
+    startup = run_probe(APP_PROBE)
+    print(f"⏱️ Importing the app: {startup['app_import_ms']:.0f} ms")
+    print()
+    print(f"{'module':<24}{'at startup':<14}{'cold import':>12}")
+
+    deferred_ms = 0.0
+    for name, loaded in sorted(startup["modules"].items()):
+        cost = run_probe(MODULE_PROBE, name)
+        if cost is None:
+            cost_text = "not installed"
+        else:
+            cost_text = f"{cost:.0f} ms"
+            if not loaded:
+                deferred_ms += cost
+        print(f"{name:<24}{'imported' if loaded else 'deferred':<14}{cost_text:>12}")
+
+    print()
+    print(f"🎉 Deferred until first use: ~{deferred_ms:.0f} ms "
+          f"(overlapping dependencies make this an upper bound)")
@@ -0,0 +1,86 @@
+# index_materials.py
+"""
+Build the BM25 passage index (see passage_index) and the students' semantic
+indexes (see semantic_index) for materials extracted before they existed,
+or whose index is missing or out of date. Changing SEMANTIC_EMBEDDER needs
+a run with --all.
+
+    python index_materials.py [--batch-size 20] [--all] [--no-semantic]
+"""
+import os
+import argparse
+
+from flask import current_app
+
+from app import create_app
+from extensions import db
+from models import CourseMaterial
+import passage_index
+import semantic_index
+
+
+def index_summary(index):
+    return {k: index.meta[k] for k in ("content_key", "passages", "terms", "reused_passages", "build_ms")}
+
+
+def needs_index(mat):
+    key = ((mat.extraction_stats or {}).get("passage_index") or {}).get("content_key")
+    return not key or not os.path.exists(passage_index.index_path(mat.id))
+
+
+def needs_vectors(mat, embedder):
+    info = (mat.extraction_stats or {}).get("semantic_index") or {}
+    return not info.get("content_key") or info.get("embedder") != embedder.name
+
+
+def index_existing_materials(batch_size=20, rebuild_all=False, semantic=True):
+    ids = [row[0] for row in db.session.query(CourseMaterial.id).filter(
+        CourseMaterial.processing_status == 'completed'
+    ).order_by(CourseMaterial.student_id, CourseMaterial.id).all()]
+    embedder_name = current_app.config.get("SEMANTIC_EMBEDDER")
+    embedder = semantic_index.get_embedder(embedder_name) if semantic else None
+
+    indexed = 0
+    for start in range(0, len(ids), batch_size):
+        for mat in CourseMaterial.query.filter(CourseMaterial.id.in_(ids[start:start + batch_size])):
+            stats = dict(mat.extraction_stats or {})
+            text = None
+            if rebuild_all or needs_index(mat):
+                text = mat.content or ""
+                index = passage_index.update_index(mat.id, text)
+                stats["passage_index"] = index_summary(index)
+                print(f"✅ {mat.title}: {index.meta['passages']} passages, {index.meta['terms']} terms "
+                      f"in {index.meta['build_ms'] / 1000:.1f}s")
+            if semantic and (rebuild_all or needs_vectors(mat, embedder)):
+                text = mat.content or "" if text is None else text
+                stats["semantic_index"] = summary = semantic_index.update_material(
+                    mat.student_id, mat.id, text, embedder=embedder_name
+                )
+                print(f"🧭 {mat.title}: {summary['passages']} passage vectors ({summary['embedder']}) "
+                      f"in {summary['build_ms'] / 1000:.1f}s")
+            if text is not None:
+                mat.extraction_stats = stats
+                indexed += 1
+
+        db.session.commit()
+        db.session.expunge_all()  # keep memory flat across batches
+
+    return indexed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--all", action="store_true", help="rebuild indexes that look up to date too")
+    parser.add_argument("--no-semantic", action="store_true", help="only the BM25 passage index")
+    args = parser.parse_args()
+
+    if not passage_index.NUMPY_AVAILABLE:
+        parser.error("numpy is required for the passage index")
+
+    app = create_app()
+    with app.app_context():
+        semantic = (not args.no_semantic and app.config.get("SEMANTIC_INDEX_ENABLED", True)
+                    and semantic_index.embedder_available(app.config.get("SEMANTIC_EMBEDDER")))
+        total = index_existing_materials(args.batch_size, rebuild_all=args.all, semantic=semantic)
+        print(f"🎉 Done: {total} material(s) indexed")
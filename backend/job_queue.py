@@ -0,0 +1,311 @@
+# job_queue.py
+"""
+Background job queue for material extraction.
+
+Jobs are persisted in the extraction_jobs table so they survive restarts and
+are shared between gunicorn workers. Each process runs a bounded thread pool
+and claims queued jobs with a conditional UPDATE, so a job only ever runs in
+one place. A per-student cap keeps one student's upload burst from taking
+every worker.
+
+Workers start with the first request a process serves (or its first
+enqueue), so CLI commands and maintenance scripts that call create_app()
+never claim jobs. A running job's heartbeat_at is refreshed every
+EXTRACTION_HEARTBEAT seconds; one that has gone EXTRACTION_STALE_AFTER
+seconds without a heartbeat is assumed to have lost its process and is
+requeued, however long the extraction itself takes.
+"""
+import time
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, or_
+
+import progress_events
+from extensions import db
+from models import ExtractionJob, CourseMaterial
+
+
+class ExtractionJobQueue:
+    def __init__(self):
+        self.app = None
+        self.handlers = {}
+        self.failure_handlers = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._running = set()  # job ids this process is working on
+        self._started = False
+        self._heartbeat = None
+        self._timer = None
+        self._last_recovery = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get("EXTRACTION_WORKERS", 4)
+        self.per_student_limit = app.config.get("EXTRACTION_MAX_PER_STUDENT", 2)
+        # Bulk uploads fan out wider than one-off uploads
+        self.student_limits = {
+            "extract_bulk": app.config.get("EXTRACTION_MAX_PER_STUDENT_BULK", 4)
+        }
+        self.max_attempts = app.config.get("EXTRACTION_MAX_ATTEMPTS", 3)
+        self.retry_backoff = app.config.get("EXTRACTION_RETRY_BACKOFF", 10)
+        self.stale_after = app.config.get("EXTRACTION_STALE_AFTER", 300)
+        self.heartbeat_interval = app.config.get("EXTRACTION_HEARTBEAT", 30)
+        app.extensions["extraction_queue"] = self
+        app.before_request(self._start_on_request)
+
+    def _start_on_request(self):
+        """First request of a serving process: pick up whatever a previous run left queued"""
+        if self._started:
+            return
+        self._started = True
+        try:
+            self.dispatch()
+        except Exception as e:
+            self.app.logger.warning(f"Extraction queue startup dispatch skipped: {str(e)}")
+
+    def _ensure_workers(self):
+        if self._executor is not None:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="extraction"
+                )
+                self._heartbeat = threading.Thread(
+                    target=self._beat, name="extraction-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+
+    def handler(self, kind):
+        """Register the function that processes jobs of the given kind"""
+        def decorator(f):
+            self.handlers[kind] = f
+            return f
+        return decorator
+
+    def on_failure(self, kind):
+        """Register a function called with a job of the given kind once it has failed for good"""
+        def decorator(f):
+            self.failure_handlers[kind] = f
+            return f
+        return decorator
+
+    def enqueue(self, material_id, student_id, kind="extract"):
+        """Persist a new job and try to start it right away"""
+        job = ExtractionJob(
+            material_id=str(material_id),
+            student_id=str(student_id),
+            kind=kind,
+            status='queued',
+            attempts=0,
+            max_attempts=self.max_attempts,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+        progress_events.bus.clear(str(material_id))
+
+        self.dispatch()
+        return job
+
+    def enqueue_many(self, material_ids, student_id, kind="extract"):
+        """
+        Add jobs for several materials and commit them together with whatever
+        else is pending in the session (e.g. the material rows themselves)
+        """
+        jobs = [
+            ExtractionJob(
+                material_id=str(material_id),
+                student_id=str(student_id),
+                kind=kind,
+                status='queued',
+                attempts=0,
+                max_attempts=self.max_attempts,
+                created_at=datetime.utcnow()
+            )
+            for material_id in material_ids
+        ]
+        db.session.add_all(jobs)
+        db.session.commit()
+        for material_id in material_ids:
+            progress_events.bus.clear(str(material_id))
+
+        self.dispatch()
+        return jobs
+
+    def dispatch(self):
+        """Claim as many runnable jobs as there are free workers"""
+        if self.app is None:
+            return
+        self._started = True
+        self._ensure_workers()
+
+        with self._lock:
+            free = self.max_workers - self._inflight
+            if free <= 0:
+                return
+
+            with self.app.app_context():
+                self._recover_stale()
+                now = datetime.utcnow()
+
+                running = dict(
+                    db.session.query(ExtractionJob.student_id, func.count(ExtractionJob.id))
+                    .filter(ExtractionJob.status == 'running')
+                    .group_by(ExtractionJob.student_id)
+                    .all()
+                )
+
+                candidates = ExtractionJob.query.filter(
+                    ExtractionJob.status == 'queued',
+                    or_(ExtractionJob.run_after.is_(None), ExtractionJob.run_after <= now)
+                ).order_by(ExtractionJob.created_at).limit(free * 20).all()
+
+                for job in candidates:
+                    if free <= 0:
+                        break
+                    limit = self.student_limits.get(job.kind, self.per_student_limit)
+                    if running.get(job.student_id, 0) >= limit:
+                        continue
+
+                    claimed = ExtractionJob.query.filter_by(id=job.id, status='queued').update({
+                        "status": 'running',
+                        "attempts": ExtractionJob.attempts + 1,
+                        "started_at": now,
+                        "heartbeat_at": now,
+                        "run_after": None
+                    }, synchronize_session=False)
+                    db.session.commit()
+
+                    if not claimed:
+                        continue  # another worker process got there first
+
+                    running[job.student_id] = running.get(job.student_id, 0) + 1
+                    free -= 1
+                    self._inflight += 1
+                    self._running.add(job.id)
+                    self._executor.submit(self._run, job.id)
+
+                self._schedule_next_retry(now)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(ExtractionJob, job_id)
+            try:
+                handler = self.handlers.get(job.kind)
+                if handler is None:
+                    raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+
+                handler(job)
+
+                job.status = 'completed'
+                job.finished_at = datetime.utcnow()
+                job.last_error = None
+                db.session.commit()
+                self.app.logger.info(f"✅ Job {job_id} completed (attempt {job.attempts})")
+
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception(f"❌ Job {job_id} failed (attempt {job.attempts})")
+                self._record_failure(job_id, e)
+
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._inflight -= 1
+                    self._running.discard(job_id)
+
+        self.dispatch()
+
+    def _record_failure(self, job_id, error):
+        job = db.session.get(ExtractionJob, job_id)
+        job.last_error = str(error)[:2000]
+
+        if job.attempts < job.max_attempts:
+            delay = self.retry_backoff * (2 ** (job.attempts - 1))
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            self.app.logger.info(f"🔁 Job {job_id} will retry in {delay}s")
+            progress_events.bus.publish(job.material_id, {
+                "stage": "retrying", "attempt": job.attempts, "retry_in_seconds": delay
+            })
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+
+            mat = db.session.get(CourseMaterial, job.material_id)
+            if mat:
+                mat.processing_status = 'failed'
+                mat.content = f"❌ Extraction error: {str(error)}"
+                if not mat.subject or mat.subject == "Processing...":
+                    mat.subject = "Unknown"
+
+        db.session.commit()
+        if job.status == 'failed':
+            progress_events.bus.publish(job.material_id, {"stage": "failed", "error": job.last_error})
+            on_failure = self.failure_handlers.get(job.kind)
+            if on_failure:
+                try:
+                    on_failure(job)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception(f"❌ Failure handler for job {job_id} failed")
+
+    def _beat(self):
+        """Keep heartbeat_at fresh on the jobs this process is running"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                with self.app.app_context():
+                    ExtractionJob.query.filter(
+                        ExtractionJob.id.in_(job_ids),
+                        ExtractionJob.status == 'running'
+                    ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+                    db.session.commit()
+            except Exception as e:
+                self.app.logger.warning(f"⚠️ Extraction heartbeat failed: {str(e)}")
+
+    def _recover_stale(self):
+        """Requeue running jobs whose worker process stopped heartbeating (died mid-extraction)"""
+        now = datetime.utcnow()
+        if self._last_recovery and now - self._last_recovery < timedelta(seconds=60):
+            return
+        self._last_recovery = now
+
+        cutoff = now - timedelta(seconds=self.stale_after)
+        reclaimed = ExtractionJob.query.filter(
+            ExtractionJob.status == 'running',
+            # Jobs claimed before heartbeats existed only have started_at
+            func.coalesce(ExtractionJob.heartbeat_at, ExtractionJob.started_at) < cutoff
+        ).update({"status": 'queued', "run_after": None}, synchronize_session=False)
+        db.session.commit()
+
+        if reclaimed:
+            self.app.logger.warning(f"♻️ Requeued {reclaimed} stale extraction job(s)")
+
+    def _schedule_next_retry(self, now):
+        next_due = db.session.query(func.min(ExtractionJob.run_after)).filter(
+            ExtractionJob.status == 'queued',
+            ExtractionJob.run_after > now
+        ).scalar()
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if next_due:
+            delay = max((next_due - now).total_seconds(), 0.5)
+            self._timer = threading.Timer(delay, self.dispatch)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+extraction_queue = ExtractionJobQueue()
@@ -0,0 +1,254 @@
+# json_stream_upload.py
+"""
+Streaming parser for JSON uploads of the form
+
+    {"student_id": "...", "title": "...", "file_data": "data:<mime>;base64,AAAA..."}
+
+The small fields are collected as usual, but the one big base64 string is
+decoded incrementally and written straight to a sink (a BlobWriter), so
+neither the JSON text, the base64 string nor the decoded bytes are ever held
+in memory as a whole. Only flat objects are expected; nested values are
+accepted but must fit in max_field_chars.
+"""
+import re
+import json
+import codecs
+import base64
+import binascii
+
+READ_SIZE = 64 * 1024
+DATA_URL_RE = re.compile(r'data:(?P<mime>[^;,]*)(?:;[^,]*)?,')
+_WHITESPACE = str.maketrans('', '', ' \t\r\n')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class _Reader:
+    """Buffered text reader over a byte stream"""
+
+    def __init__(self, stream, read_size=READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        raw = self.stream.read(self.read_size)
+        if not raw:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self.decoder.decode(b'', final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self.decoder.decode(raw)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while self.pos >= len(self.buf):
+            if not self._fill():
+                return ''
+        return self.buf[self.pos]
+
+    def next(self):
+        c = self.peek()
+        if not c:
+            raise ValueError("unexpected end of JSON")
+        self.pos += 1
+        return c
+
+    def skip_ws(self):
+        while self.peek() in (' ', '\t', '\r', '\n'):
+            self.pos += 1
+
+    def expect(self, ch):
+        self.skip_ws()
+        c = self.next()
+        if c != ch:
+            raise ValueError(f"expected '{ch}' but found '{c}'")
+
+    def take_run(self, stops):
+        """Longest run of already-buffered text up to (not including) any stop char"""
+        if self.peek() == '':
+            raise ValueError("unexpected end of JSON")
+        end = len(self.buf)
+        for s in stops:
+            i = self.buf.find(s, self.pos, end)
+            if i != -1:
+                end = i
+        run = self.buf[self.pos:end]
+        self.pos = end
+        return run
+
+
+def _read_escape(reader):
+    c = reader.next()
+    if c == 'u':
+        return chr(int(''.join(reader.next() for _ in range(4)), 16))
+    if c not in _ESCAPES:
+        raise ValueError(f"invalid escape '\\{c}'")
+    return _ESCAPES[c]
+
+
+def _read_raw_value(reader, max_chars):
+    """Raw JSON text of one value (string, number, literal, or small nested value)"""
+    parts = []
+    size = 0
+    depth = 0
+    in_string = False
+
+    while True:
+        c = reader.peek()
+        if c == '':
+            if depth or in_string:
+                raise ValueError("unexpected end of JSON")
+            break
+
+        if in_string:
+            reader.pos += 1
+            parts.append(c)
+            if c == '\\':
+                parts.append(reader.next())
+            elif c == '"':
+                in_string = False
+                if depth == 0:
+                    break
+        elif c == '"':
+            reader.pos += 1
+            parts.append(c)
+            in_string = True
+        elif c in '{[':
+            reader.pos += 1
+            parts.append(c)
+            depth += 1
+        elif c in '}]':
+            if depth == 0:
+                break
+            reader.pos += 1
+            parts.append(c)
+            depth -= 1
+        elif c == ',' and depth == 0:
+            break
+        else:
+            reader.pos += 1
+            parts.append(c)
+
+        size += 1
+        if size > max_chars:
+            raise ValueError("JSON field too large")
+
+    return ''.join(parts).strip()
+
+
+class Base64StreamDecoder:
+    """Decode base64 text fed in arbitrary pieces, writing bytes to a sink"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.pending = ''
+
+    def feed(self, text):
+        self.pending += text.translate(_WHITESPACE)
+        usable = len(self.pending) // 4 * 4
+        if usable:
+            try:
+                self.sink.write(base64.b64decode(self.pending[:usable], validate=True))
+            except binascii.Error as e:
+                raise ValueError(f"invalid base64: {str(e)}")
+            self.pending = self.pending[usable:]
+
+    def finish(self):
+        if self.pending:
+            tail = self.pending + '=' * (-len(self.pending) % 4)
+            try:
+                self.sink.write(base64.b64decode(tail, validate=True))
+            except binascii.Error as e:
+                raise ValueError(f"invalid base64: {str(e)}")
+            self.pending = ''
+
+
+def _stream_string(reader, sink, prefix_limit=512):
+    """Decode a JSON string holding (data-URL) base64 into sink; returns the MIME type if any"""
+    reader.expect('"')
+    decoder = Base64StreamDecoder(sink)
+    head = ''
+    mime = None
+    head_done = False
+
+    while True:
+        run = reader.take_run('"\\')
+        if run:
+            if head_done:
+                decoder.feed(run)
+            else:
+                head += run
+        else:
+            c = reader.next()
+            if c == '"':
+                break
+            ch = _read_escape(reader)
+            if head_done:
+                decoder.feed(ch)
+            else:
+                head += ch
+
+        if not head_done and (len(head) >= prefix_limit or ',' in head or not 'data:'.startswith(head[:5])):
+            m = DATA_URL_RE.match(head)
+            if m:
+                mime = m.group('mime') or None
+                head = head[m.end():]
+            decoder.feed(head)
+            head_done = True
+
+    if not head_done:
+        m = DATA_URL_RE.match(head)
+        if m:
+            mime = m.group('mime') or None
+            head = head[m.end():]
+        decoder.feed(head)
+
+    decoder.finish()
+    return mime
+
+
+def parse_json_upload(stream, stream_field, sink, max_field_chars=64 * 1024):
+    """
+    Parse a top-level JSON object from stream.
+    The string value of stream_field is base64-decoded into sink as it arrives.
+    Returns (fields, found, mime): the other fields, whether stream_field was
+    present, and the MIME type from its data-URL prefix.
+    """
+    reader = _Reader(stream)
+    fields = {}
+    found = False
+    mime = None
+
+    reader.expect('{')
+    reader.skip_ws()
+    if reader.peek() == '}':
+        reader.next()
+        return fields, found, mime
+
+    while True:
+        reader.skip_ws()
+        key = json.loads(_read_raw_value(reader, max_field_chars))
+        if not isinstance(key, str):
+            raise ValueError("object keys must be strings")
+        reader.expect(':')
+        reader.skip_ws()
+
+        if key == stream_field and reader.peek() == '"' and not found:
+            mime = _stream_string(reader, sink)
+            found = True
+        else:
+            fields[key] = json.loads(_read_raw_value(reader, max_field_chars))
+
+        reader.skip_ws()
+        c = reader.next()
+        if c == '}':
+            break
+        if c != ',':
+            raise ValueError(f"expected ',' or '}}' but found '{c}'")
+
+    return fields, found, mime
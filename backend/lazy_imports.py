@@ -0,0 +1,103 @@
+# lazy_imports.py
+"""
+Optional heavy libraries, imported the first time they are used instead of
+when the app boots.
+
+    PyPDF2 = lazy_imports.lazy("PyPDF2")
+    PDF_AVAILABLE = lazy_imports.available("PyPDF2")  # find_spec only, no import
+
+    PyPDF2.PdfReader(f)  # the real import happens here, once
+
+Every import triggered through a proxy is timed, so import_report() (and
+`python import_report.py`) can show what startup no longer pays for.
+"""
+import sys
+import time
+import threading
+import importlib
+import importlib.util
+
+_lock = threading.RLock()
+_modules = {}       # name -> LazyModule
+_availability = {}  # name -> bool
+_import_ms = {}     # name -> ms spent importing on first use
+
+
+def available(name):
+    """True if the module is installed, without importing it"""
+    if name in sys.modules:
+        return True
+    if name not in _availability:
+        try:
+            _availability[name] = importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):
+            # find_spec imports parent packages, which may themselves be missing
+            _availability[name] = False
+    return _availability[name]
+
+
+class LazyModule:
+    """Stands in for a module; the first attribute access imports it"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    already_loaded = self._name in sys.modules
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if not already_loaded:
+                        _import_ms[self._name] = round((time.perf_counter() - started) * 1000, 2)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+class LazyObject:
+    """Stands in for an object built by factory() on first attribute access (e.g. a Gemini model)"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._obj = None
+
+    def __getattr__(self, attr):
+        if self._obj is None:
+            with _lock:
+                if self._obj is None:
+                    self._obj = self._factory()
+        return getattr(self._obj, attr)
+
+
+def lazy(name):
+    """Shared lazy proxy for a module"""
+    with _lock:
+        if name not in _modules:
+            _modules[name] = LazyModule(name)
+        return _modules[name]
+
+
+def registered():
+    return sorted(_modules)
+
+
+def import_report():
+    """Per optional module: installed, imported yet, and what its first import cost"""
+    return [
+        {
+            "module": name,
+            "available": available(name),
+            "loaded": _modules[name]._module is not None or name in sys.modules,
+            "import_ms": _import_ms.get(name)
+        }
+        for name in registered()
+    ]
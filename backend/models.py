@@ -3,11 +3,22 @@
 from datetime import datetime
 import uuid
 from extensions import db
-from sqlalchemy import LargeBinary, Text
+from sqlalchemy import LargeBinary, Text, event, func
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+from flask import current_app, has_app_context
+from chunking import split_into_chunks
+import content_codec
 
 def gen_id():
     return str(uuid.uuid4())
 
+def _text_codec_settings():
+    """(MATERIAL_TEXT_CODEC, MATERIAL_TEXT_LEVEL) of the current app, if any"""
+    if not has_app_context():
+        return None, None
+    return current_app.config.get("MATERIAL_TEXT_CODEC"), current_app.config.get("MATERIAL_TEXT_LEVEL")
+
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.String(36), primary_key=True, default=gen_id)
@@ -23,14 +34,329 @@ class CourseMaterial(db.Model):
     title = db.Column(db.String(255))
     subject = db.Column(db.String(120))
     file_type = db.Column(db.String(50))
-    file_name = db.Column(db.String(255))
-    file_size = db.Column(db.Integer)
+    file_name = db.Column(db.String(255))  # blob reference (sha256) for content-addressed uploads
+    original_file_name = db.Column(db.String(255))
+    content_hash = db.Column(db.String(64), index=True)  # sha256 of the uploaded bytes
+    text_hash = db.Column(db.String(64), index=True)  # sha256 of normalized extracted text
+    file_size = db.Column(db.BigInteger)  # bytes; a 2 GiB resumable upload overflows INT
     file_blob = db.Column(LargeBinary)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     processing_status = db.Column(db.String(50), default='processing')
-    content = db.Column(Text(length=4294967295))  # LONGTEXT
+    # Text lives in material_chunks; this LONGTEXT column only holds rows from
+    # before chunking and is deferred so queries never pull it in by accident
+    legacy_content = db.deferred(db.Column('content', Text(length=4294967295)))
+    content_length = db.Column(db.Integer)
+    chunked = db.Column(db.Boolean, default=False)
+    extraction_engine = db.Column(db.String(30))  # pdfplumber / pypdf2 / ocr / ...
+    extraction_stats = db.Column(db.JSON)  # probe measurements + timings, for tuning
+    # Text as extracted, before text_normalization; always compressed (content_codec)
+    raw_text_codec = db.Column(db.String(32))
+    raw_text_z = db.deferred(db.Column(LargeBinary(length=4294967295)))  # LONGBLOB
+    batch_id = db.Column(db.String(36), index=True)  # UploadBatch for zip / multi-file uploads
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    chunks = db.relationship(
+        'MaterialChunk',
+        lazy='dynamic',
+        order_by='MaterialChunk.ordinal',
+        cascade='all, delete-orphan',
+        passive_deletes=True
+    )
+
+    @property
+    def content(self):
+        """Full text, assembled from chunks on first access and kept for the instance"""
+        cached = self.__dict__.get('_content_cache')
+        if cached is not None:
+            return cached
+
+        if self.chunked:
+            rows = db.session.query(
+                MaterialChunk.text, MaterialChunk.codec, MaterialChunk.text_z
+            ).filter_by(
+                material_id=self.id
+            ).order_by(MaterialChunk.ordinal).all()
+            text = ''.join(content_codec.chunk_text(*r) for r in rows)
+        else:
+            text = self.legacy_content
+
+        self.__dict__['_content_cache'] = text
+        return text
+
+    @content.setter
+    def content(self, text):
+        # Chunk rows are (re)written in the before_flush hook below
+        if self.id is None:
+            self.id = gen_id()
+        self.__dict__['_content_cache'] = text
+        self.__dict__['_pending_content'] = text
+        self.legacy_content = None
+        self.content_length = len(text) if text else 0
+        self.chunked = True
+
+    @property
+    def raw_content(self):
+        """Extracted text before normalization; content itself for rows from before that stage"""
+        if self.raw_text_codec is None:
+            return self.content
+        return content_codec.decode(self.raw_text_codec, self.raw_text_z)
+
+    @raw_content.setter
+    def raw_content(self, text):
+        if text is None:
+            self.raw_text_codec, self.raw_text_z = None, None
+            return
+        codec, level = _text_codec_settings()
+        codec = content_codec.resolve_codec(codec or "zlib")
+        self.raw_text_codec, self.raw_text_z = content_codec.encode(
+            text, codec, level, content_codec.current_dictionary_id(codec)
+        )
+
+    @property
+    def text_length(self):
+        if self.content_length is not None:
+            return self.content_length
+        return len(self.content or "")
+
+    def content_prefix(self, max_chars):
+        """First max_chars of the text, reading only the chunks that cover them"""
+        cached = self.__dict__.get('_content_cache')
+        if cached is not None:
+            return cached[:max_chars]
+
+        if self.chunked:
+            rows = db.session.query(
+                MaterialChunk.text, MaterialChunk.codec, MaterialChunk.text_z
+            ).filter(
+                MaterialChunk.material_id == self.id,
+                MaterialChunk.char_start < max_chars
+            ).order_by(MaterialChunk.ordinal).all()
+            return ''.join(content_codec.chunk_text(*r) for r in rows)[:max_chars]
+
+        prefix = db.session.query(
+            func.substr(CourseMaterial.legacy_content, 1, max_chars)
+        ).filter(CourseMaterial.id == self.id).scalar()
+        return prefix or ""
+
+    def content_slices(self, spans):
+        """Text of each (start, end) character span, reading only the chunks that cover them"""
+        if not spans:
+            return []
+        if self.__dict__.get('_content_cache') is not None or not self.chunked:
+            text = self.content or ""
+            return [text[start:end] for start, end in spans]
+
+        rows = db.session.query(
+            MaterialChunk.char_start, MaterialChunk.text, MaterialChunk.codec, MaterialChunk.text_z
+        ).filter(
+            MaterialChunk.material_id == self.id,
+            db.or_(*[db.and_(MaterialChunk.char_start < end, MaterialChunk.char_end > start)
+                     for start, end in spans])
+        ).order_by(MaterialChunk.ordinal).all()
+        pieces = [(chunk_start, content_codec.chunk_text(text, codec, text_z))
+                  for chunk_start, text, codec, text_z in rows]
+
+        return [
+            ''.join(
+                piece[max(start - chunk_start, 0):end - chunk_start]
+                for chunk_start, piece in pieces
+                if chunk_start < end and chunk_start + len(piece) > start
+            )
+            for start, end in spans
+        ]
+
+class MaterialChunk(db.Model):
+    """
+    A page/paragraph-aligned slice of a material's extracted text.
+    With MATERIAL_TEXT_CODEC set the text is stored compressed in text_z and
+    codec says how (see content_codec); read it through body / chunk_text.
+    """
+    __tablename__ = 'material_chunks'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    material_id = db.Column(
+        db.String(36),
+        db.ForeignKey('course_materials.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    ordinal = db.Column(db.Integer, nullable=False)
+    char_start = db.Column(db.Integer, nullable=False)
+    char_end = db.Column(db.Integer, nullable=False)
+    page_number = db.Column(db.Integer)
+    text = db.Column(db.Text(length=16777215))  # MEDIUMTEXT; NULL when compressed
+    codec = db.Column(db.String(32))  # None = plain text; zlib / zstd[:dictionary id]
+    text_z = db.deferred(db.Column(LargeBinary(length=16777215)))  # MEDIUMBLOB
+
+    @property
+    def body(self):
+        """The chunk's text, decompressed if needed"""
+        return content_codec.chunk_text(self.text, self.codec, self.text_z)
+
+    __table_args__ = (
+        db.Index('idx_chunk_material_ordinal', 'material_id', 'ordinal'),
+    )
+
+@event.listens_for(Session, 'before_flush')
+def write_pending_chunks(session, flush_context, instances):
+    """Replace the chunk rows of every material whose content was assigned"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, CourseMaterial) or '_pending_content' not in obj.__dict__:
+            continue
+
+        text = obj.__dict__.pop('_pending_content')
+        with session.no_autoflush:
+            session.query(MaterialChunk).filter_by(
+                material_id=obj.id
+            ).delete(synchronize_session=False)
+
+        codec, level = _text_codec_settings()
+
+        for chunk in split_into_chunks(text or ""):
+            chunk["text"], chunk["codec"], chunk["text_z"] = content_codec.encode_for_storage(
+                chunk["text"], codec, level
+            )
+            session.add(MaterialChunk(material_id=obj.id, **chunk))
+
+class ExtractionJob(db.Model):
+    """Background extraction work for an uploaded material"""
+    __tablename__ = 'extraction_jobs'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    material_id = db.Column(
+        db.String(36),
+        db.ForeignKey('course_materials.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    student_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(50), default='extract')
+    status = db.Column(db.String(20), default='queued')  # queued / running / completed / failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    last_error = db.Column(db.Text)
+    run_after = db.Column(db.DateTime)  # retry backoff; NULL = runnable now
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # refreshed by the worker while it runs
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_job_status_created', 'status', 'created_at'),
+        db.Index('idx_job_student_status', 'student_id', 'status'),
+        db.Index('idx_job_material', 'material_id'),
+    )
+
+class UploadSession(db.Model):
+    """Resumable upload in progress (init -> PUT chunks -> finalize)"""
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    student_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    title = db.Column(db.String(255))
+    subject = db.Column(db.String(120))
+    file_name = db.Column(db.String(255))
+    file_type = db.Column(db.String(50))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # optional whole-file checksum from the client
+    content_hash = db.Column(db.String(64))  # blob already stored, so a retried finalize skips store_file
+    status = db.Column(db.String(20), default='open')  # open / finalized / aborted
+    material_id = db.Column(db.String(36), db.ForeignKey('course_materials.id'))
+    expires_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_upload_student', 'student_id'),
+        db.Index('idx_upload_expires', 'status', 'expires_at'),
+    )
+
+class UploadBatch(db.Model):
+    """Materials uploaded together (zip or multi-file); subjects are detected once for the batch"""
+    __tablename__ = 'upload_batches'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    student_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    total_files = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='extracting')  # extracting / classifying / completed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_batch_student', 'student_id'),
+    )
+
+class UploadSessionChunk(db.Model):
+    """One received chunk; a row per chunk keeps parallel PUTs free of lost updates"""
+    __tablename__ = 'upload_session_chunks'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    upload_id = db.Column(
+        db.String(36),
+        db.ForeignKey('upload_sessions.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    chunk_index = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('upload_id', 'chunk_index', name='uq_upload_chunk'),
+    )
+
+class SharedArtifact(db.Model):
+    """AI output shared by every material with the same normalized text"""
+    __tablename__ = 'shared_artifacts'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    content_key = db.Column(db.String(64), nullable=False)  # CourseMaterial.text_hash
+    artifact_type = db.Column(db.String(50), nullable=False)  # summary / subject / quiz_bank
+    language = db.Column(db.String(10), nullable=False, default='')
+    prompt_version = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.JSON)
+    hit_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('content_key', 'artifact_type', 'language', 'prompt_version',
+                            name='uq_artifact_key'),
+    )
+
+class ChatMessage(db.Model):
+    """One question/answer turn of a student's chat about a material ('general' = none picked)"""
+    __tablename__ = 'chat_messages'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    student_id = db.Column(db.String(36), nullable=False)
+    material_id = db.Column(db.String(64), nullable=False, default='general')
+    question = db.Column(Text, nullable=False)
+    answer = db.Column(Text(length=16777215), nullable=False)  # MEDIUMTEXT
+    # Microseconds on MySQL too: turns a second apart must still page in order
+    created_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+                           default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # InnoDB appends the primary key, so (created_at, id) keyset pages come off this index
+        db.Index('idx_chat_student_material_created', 'student_id', 'material_id', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "question": self.question,
+            "answer": self.answer,
+            "timestamp": self.created_at.isoformat() if self.created_at else None
+        }
+
+class ConversationSummary(db.Model):
+    """Rolling summary of a chat's older turns, up to and including the covered turn"""
+    __tablename__ = 'conversation_summaries'
+    id = db.Column(db.String(36), primary_key=True, default=gen_id)
+    student_id = db.Column(db.String(36), nullable=False)
+    material_id = db.Column(db.String(64), nullable=False, default='general')
+    summary = db.Column(Text, nullable=False, default='')
+    covered_until = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'))  # ChatMessage.created_at
+    covered_id = db.Column(db.String(36))  # ChatMessage.id; with covered_until, a chat_history cursor
+    turns_covered = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'material_id', name='uq_summary_conversation'),
+    )
+
 class Quiz(db.Model):
     __tablename__ = 'quizzes'
     id = db.Column(db.String(36), primary_key=True, default=gen_id)
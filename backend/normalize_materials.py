@@ -0,0 +1,74 @@
+# normalize_materials.py
+"""
+Run the text normalization stage (see text_normalization) over materials
+extracted before it existed, keeping their current text as the raw text.
+Materials that already have raw text are re-normalized from it, so this is
+also how a new normalizer version is applied without re-extracting.
+
+    python normalize_materials.py [--batch-size 50] [--all]
+"""
+import argparse
+
+from flask import current_app
+from sqlalchemy.orm import undefer
+
+from app import create_app
+from extensions import db
+from models import CourseMaterial
+import text_normalization
+import passage_index
+import semantic_index
+
+
+def normalize_existing_materials(batch_size=50, include_normalized=False):
+    query = db.session.query(CourseMaterial.id).filter(CourseMaterial.processing_status == 'completed')
+    if not include_normalized:
+        query = query.filter(CourseMaterial.raw_text_codec.is_(None))
+    ids = [row[0] for row in query.order_by(CourseMaterial.id).all()]
+    embedder = current_app.config.get("SEMANTIC_EMBEDDER")
+    semantic = current_app.config.get("SEMANTIC_INDEX_ENABLED", True) and semantic_index.embedder_available(embedder)
+
+    done = chars_in = chars_out = 0
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        for mat in CourseMaterial.query.options(undefer(CourseMaterial.raw_text_z)).filter(CourseMaterial.id.in_(batch)):
+            raw = mat.raw_content
+            if not raw:
+                continue
+            text, stats = text_normalization.normalize_text(raw)
+            mat.raw_content = raw
+            mat.content = text
+            extraction_stats = dict(mat.extraction_stats or {}, normalization=stats)
+            if passage_index.NUMPY_AVAILABLE:
+                index = passage_index.update_index(mat.id, text)
+                extraction_stats["passage_index"] = {
+                    k: index.meta[k] for k in ("content_key", "passages", "terms", "reused_passages", "build_ms")
+                }
+            if semantic:
+                extraction_stats["semantic_index"] = semantic_index.update_material(
+                    mat.student_id, mat.id, text, embedder=embedder
+                )
+            mat.extraction_stats = extraction_stats
+            chars_in += stats["chars_in"]
+            chars_out += stats["chars_out"]
+
+        db.session.commit()
+        db.session.expunge_all()  # keep memory flat across batches
+        done += len(batch)
+        print(f"✅ Normalized {done}/{len(ids)} material(s)")
+
+    if chars_in:
+        print(f"🧹 {chars_in:,} -> {chars_out:,} chars ({100 * (chars_in - chars_out) / chars_in:.1f}% less to send to Gemini)")
+    return done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--all", action="store_true", help="also re-normalize materials that already have raw text")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        total = normalize_existing_materials(args.batch_size, include_normalized=args.all)
+        print(f"🎉 Done: {total} material(s) normalized")
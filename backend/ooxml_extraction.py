@@ -0,0 +1,226 @@
+# ooxml_extraction.py
+"""
+Streaming text extraction for DOCX and PPTX.
+
+Both formats are zip archives of XML parts. Instead of building the full
+python-docx / python-pptx object model, the parts are read straight out of
+the zip with iterparse, text is yielded block by block, and every element is
+cleared (and detached) as soon as it has been read, so memory stays flat
+whatever the size of the document. There are no paragraph, table or slide
+caps.
+
+Only the standard library is used. Elements are matched by local name, so
+both transitional and strict OOXML namespaces work. Nothing in here touches
+Flask.
+"""
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+
+DOCX_MAIN_PART = "word/document.xml"
+PPTX_MAIN_PART = "ppt/presentation.xml"
+PPTX_RELS_PART = "ppt/_rels/presentation.xml.rels"
+
+PROGRESS_EVERY = 200  # docx blocks between progress callbacks
+
+_SLIDE_NAME_RE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+class _TextCollector:
+    """
+    Shared paragraph/table bookkeeping for WordprocessingML and DrawingML:
+    runs build paragraphs, paragraphs inside a table build cells, cells build
+    ' | '-joined rows. A tab element is a tab character in a run, but also a
+    tab stop definition in paragraph properties (w:tabs, a:tabLst); only the
+    former is text.
+    """
+
+    def __init__(self):
+        self.runs = []
+        self.cell_paragraphs = []
+        self.cells = []
+        self.rows = []
+        self.table_depth = 0
+        self.tab_stops_depth = 0
+
+    def start(self, name):
+        if name == "tbl":
+            self.table_depth += 1
+        elif name in ("tabs", "tabLst"):
+            self.tab_stops_depth += 1
+
+    def end(self, name, elem):
+        """Returns ('paragraph', text), ('table', text) or None"""
+        if name == "t":
+            self.runs.append(elem.text or "")
+        elif name == "tab":
+            if not self.tab_stops_depth:
+                self.runs.append("\t")
+        elif name in ("tabs", "tabLst"):
+            self.tab_stops_depth -= 1
+        elif name in ("br", "cr"):
+            self.runs.append("\n")
+        elif name == "p":
+            text = "".join(self.runs)
+            self.runs = []
+            if self.table_depth:
+                self.cell_paragraphs.append(text)
+            else:
+                return "paragraph", text
+        elif name == "tc" and self.table_depth:
+            self.cells.append("\n".join(p for p in self.cell_paragraphs if p.strip()).strip())
+            self.cell_paragraphs = []
+        elif name == "tr" and self.table_depth:
+            if any(self.cells):
+                self.rows.append(" | ".join(self.cells))
+            self.cells = []
+        elif name == "tbl" and self.table_depth:
+            self.table_depth -= 1
+            if self.table_depth == 0:
+                rows, self.rows = self.rows, []
+                if rows:
+                    return "table", "[TABLE]\n" + "\n".join(rows)
+        return None
+
+
+def _discard(elem, stack):
+    """
+    Free an element once its end event has been handled. Earlier siblings are
+    already gone, so it is its parent's only child and removal is O(1); the
+    tree never holds more than the currently open path.
+    """
+    if stack:
+        stack[-1].remove(elem)
+    elem.clear()
+
+
+def iter_docx_blocks(file_path, on_progress=None):
+    """
+    Yield the body of a DOCX as text blocks in document order: paragraphs,
+    and tables as '[TABLE]' followed by one ' | '-joined line per row.
+    on_progress(bytes_read, part_size, chars) is called every PROGRESS_EVERY blocks.
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        info = zf.getinfo(DOCX_MAIN_PART)
+        with zf.open(info) as part:
+            collector = _TextCollector()
+            stack = []
+            blocks = chars = 0
+
+            for event, elem in ET.iterparse(part, events=("start", "end")):
+                name = _local(elem.tag)
+
+                if event == "start":
+                    stack.append(elem)
+                    collector.start(name)
+                    continue
+
+                stack.pop()
+                block = collector.end(name, elem)
+                if block and block[1].strip():
+                    blocks += 1
+                    chars += len(block[1])
+                    yield block[1]
+                    if on_progress and blocks % PROGRESS_EVERY == 0:
+                        on_progress(part.tell(), info.file_size, chars)
+
+                _discard(elem, stack)
+
+            if on_progress:
+                on_progress(info.file_size, info.file_size, chars)
+
+
+def extract_docx_text(file_path, on_progress=None):
+    return "\n\n".join(iter_docx_blocks(file_path, on_progress)).strip()
+
+
+def pptx_slide_parts(zf):
+    """Slide part names in presentation order"""
+    try:
+        with zf.open(PPTX_RELS_PART) as rels_part:
+            rels = {rel.get("Id"): rel.get("Target") for rel in ET.parse(rels_part).getroot()}
+
+        parts = []
+        with zf.open(PPTX_MAIN_PART) as main_part:
+            for _, elem in ET.iterparse(main_part):
+                if _local(elem.tag) != "sldId":
+                    continue
+                # r:id, whatever prefix/namespace the relationships schema uses
+                rel_id = next((v for k, v in elem.attrib.items() if k.startswith("{") and _local(k) == "id"), None)
+                target = rels.get(rel_id)
+                if target:
+                    if target.startswith("/"):
+                        parts.append(target.lstrip("/"))
+                    else:
+                        parts.append(posixpath.normpath(posixpath.join("ppt", target)))
+        if parts:
+            return parts
+    except (KeyError, ET.ParseError):
+        pass
+
+    # No usable relationships: fall back to slideN numbering
+    numbered = [(int(m.group(1)), n) for n in zf.namelist() for m in [_SLIDE_NAME_RE.match(n)] if m]
+    return [n for _, n in sorted(numbered)]
+
+
+def _slide_text_blocks(part):
+    """Text of every shape (and table) on one slide, in document order"""
+    collector = _TextCollector()
+    shape_paragraphs = []
+    stack = []
+
+    for event, elem in ET.iterparse(part, events=("start", "end")):
+        name = _local(elem.tag)
+        if event == "start":
+            stack.append(elem)
+            collector.start(name)
+            continue
+
+        stack.pop()
+        block = collector.end(name, elem)
+        if block:
+            kind, text = block
+            if kind == "paragraph":
+                shape_paragraphs.append(text)
+            elif text.strip():
+                yield text
+
+        if name == "sp":
+            text = "\n".join(shape_paragraphs)
+            shape_paragraphs = []
+            if text.strip():
+                yield text
+
+        _discard(elem, stack)
+
+
+def iter_pptx_slides(file_path, on_progress=None):
+    """
+    Yield (slide_number, text) for every slide in presentation order.
+    on_progress(slides_done, slides_total, chars) is called after each slide.
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        names = set(zf.namelist())
+        parts = [p for p in pptx_slide_parts(zf) if p in names]
+        chars = 0
+
+        for number, part_name in enumerate(parts, 1):
+            with zf.open(part_name) as part:
+                text = "\n".join(_slide_text_blocks(part))
+            chars += len(text)
+            yield number, text
+            if on_progress:
+                on_progress(number, len(parts), chars)
+
+
+def extract_pptx_text(file_path, on_progress=None):
+    """Slides with the standard '--- Slide N ---' markers"""
+    return "\n".join(
+        f"\n--- Slide {number} ---\n{text}\n" if text else f"\n--- Slide {number} ---\n"
+        for number, text in iter_pptx_slides(file_path, on_progress)
+    ).strip()
@@ -0,0 +1,328 @@
+# passage_index.py
+"""
+Per-material BM25 index for question answering.
+
+At ingest a material's text is cut into ~600-character passages (page-aligned,
+see chunking.split_into_chunks) and tokenized with a light English stemmer;
+the postings are stored as a CSR matrix (term -> passage ids + term
+frequencies) in uploads/indexes/<aa>/<material_id>.npz. Answering a question
+is then a handful of NumPy ops over the postings of the question's terms,
+well under a millisecond even for a 10 MB material, instead of re-splitting
+and substring-scanning the whole text per request.
+
+Reprocessing a material updates its index incrementally: the postings of
+passages whose text hash is unchanged are carried over from the old index
+as arrays; only new or changed passages are tokenized again.
+
+Nothing in here touches Flask.
+"""
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+import lazy_imports
+from chunking import split_into_chunks
+
+np = lazy_imports.lazy("numpy")
+NUMPY_AVAILABLE = lazy_imports.available("numpy")
+
+INDEX_ROOT = os.path.join(os.path.dirname(__file__), "uploads", "indexes")
+INDEX_VERSION = 1
+
+PASSAGE_TARGET_CHARS = 600
+PASSAGE_MAX_CHARS = 1000
+K1 = 1.2
+B = 0.75
+MAX_TF = 65535  # stored as uint16
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have he her his how i if "
+    "in into is it its me my no not of on or our she so such than that the their them then there these "
+    "they this to was we were what when where which while who whom why will with would you your "
+    "about also each explain describe define page slide".split()
+)
+
+# Longest suffix first; (suffix, replacement)
+_SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("ousness", "ous"), ("iveness", "ive"),
+    ("ations", "ate"), ("ation", "ate"), ("ments", ""), ("ment", ""), ("ness", ""), ("ings", ""),
+    ("ing", ""), ("edly", ""), ("ies", "y"), ("ied", "y"), ("sses", "ss"), ("ed", ""), ("ly", ""),
+    ("es", ""), ("s", ""),
+)
+_UNDOUBLE = frozenset("bdfgmnprt")
+
+_cache_lock = threading.Lock()
+_loaded = OrderedDict()  # material_id -> (mtime, PassageIndex)
+
+
+@lru_cache(maxsize=200000)
+def stem(word):
+    """Light suffix-stripping stemmer: 'reactions', 'reacted', 'reacting' -> 'react'"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix):
+            base = word[:-len(suffix)]
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                return word
+            if len(base) < 3:
+                continue
+            base += replacement
+            if not replacement and len(base) > 3 and base[-1] == base[-2] and base[-1] in _UNDOUBLE:
+                base = base[:-1]  # running -> runn -> run
+            return base
+    return word
+
+
+def tokenize(text):
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def passage_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def index_path(material_id):
+    return os.path.join(INDEX_ROOT, str(material_id)[:2], f"{material_id}.npz")
+
+
+class PassageIndex:
+    def __init__(self, terms, indptr, doc_ids, tfs, starts, ends, pages, doc_len, hashes, meta):
+        self.terms = terms
+        self.term_row = {t: i for i, t in enumerate(terms)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.starts = starts
+        self.ends = ends
+        self.pages = pages
+        self.doc_len = doc_len
+        self.hashes = hashes
+        self.meta = meta
+        avgdl = float(doc_len.mean()) if len(doc_len) else 0.0
+        # BM25 length normalisation per passage, computed once per load
+        self._norm = (K1 * (1 - B + B * doc_len / avgdl)).astype("float32") if avgdl else doc_len.astype("float32")
+
+    @property
+    def n_passages(self):
+        return len(self.starts)
+
+    # Building
+
+    @classmethod
+    def build(cls, text, previous=None, content_key=None):
+        """Index text; with previous, unchanged passages keep their postings as they are"""
+        started = time.time()
+        passages = split_into_chunks(text or "", PASSAGE_TARGET_CHARS, PASSAGE_MAX_CHARS)
+        hashes = [passage_hash(p["text"]) for p in passages]
+
+        # Term ids: the previous index's rows first, so its postings carry over unchanged
+        vocab = {t: i for i, t in enumerate(previous.terms)} if previous is not None else {}
+        doc_len = np.zeros(len(passages), dtype=np.int32)
+
+        old_doc = {}
+        if previous is not None:
+            for i, h in enumerate(previous.hashes.tolist()):
+                old_doc.setdefault(h, i)
+        old_to_new = np.full(previous.n_passages if previous is not None else 0, -1, dtype=np.int64)
+
+        fresh_terms, fresh_docs, fresh_tfs = [], [], []
+        for doc, (passage, h) in enumerate(zip(passages, hashes)):
+            old = old_doc.pop(h, None)  # a repeated passage only reuses once
+            if old is not None:
+                old_to_new[old] = doc
+                doc_len[doc] = previous.doc_len[old]
+                continue
+            counts = Counter(tokenize(passage["text"]))
+            doc_len[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                fresh_terms.append(vocab.setdefault(term, len(vocab)))
+                fresh_docs.append(doc)
+                fresh_tfs.append(min(tf, MAX_TF))
+
+        parts = [(np.asarray(fresh_terms, dtype=np.int64), np.asarray(fresh_docs, dtype=np.int64),
+                  np.asarray(fresh_tfs, dtype=np.uint16))]
+        reused = int((old_to_new >= 0).sum())
+        if reused:
+            old_rows = np.repeat(np.arange(len(previous.terms), dtype=np.int64), np.diff(previous.indptr))
+            new_docs = old_to_new[previous.doc_ids]
+            keep = new_docs >= 0
+            parts.append((old_rows[keep], new_docs[keep], previous.tfs[keep]))
+
+        ids = np.concatenate([p[0] for p in parts])
+        docs = np.concatenate([p[1] for p in parts]).astype(np.int32)
+        tfs = np.concatenate([p[2] for p in parts]).astype(np.uint16)
+
+        # Drop terms no passage uses any more, sort the rest, then postings into CSR
+        term_list = list(vocab)
+        used = np.flatnonzero(np.bincount(ids, minlength=len(term_list)))
+        terms = sorted(term_list[i] for i in used.tolist())
+        remap = np.full(len(term_list), -1, dtype=np.int64)
+        remap[[vocab[t] for t in terms]] = np.arange(len(terms))
+        rows = remap[ids]
+        order = np.lexsort((docs, rows))
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(terms)), out=indptr[1:])
+
+        meta = {
+            "version": INDEX_VERSION,
+            "content_key": content_key,
+            "content_length": len(text or ""),
+            "passages": len(passages),
+            "terms": len(terms),
+            "reused_passages": reused,
+        }
+        index = cls(
+            terms=terms,
+            indptr=indptr,
+            doc_ids=docs[order],
+            tfs=tfs[order],
+            starts=np.asarray([p["char_start"] for p in passages], dtype=np.int64),
+            ends=np.asarray([p["char_end"] for p in passages], dtype=np.int64),
+            pages=np.asarray([p["page_number"] or 0 for p in passages], dtype=np.int32),
+            doc_len=doc_len,
+            hashes=np.asarray(hashes, dtype=np.uint64),
+            meta=meta,
+        )
+        meta["build_ms"] = round((time.time() - started) * 1000, 2)
+        return index
+
+    # Querying
+
+    def search(self, query, k=10):
+        """[(score, passage)] best first; passage = (char_start, char_end, page_number or None)"""
+        if not self.n_passages:
+            return []
+        n = self.n_passages
+        scores = np.zeros(n, dtype=np.float32)
+        matched = False
+
+        for term in set(tokenize(query)):
+            row = self.term_row.get(term)
+            if row is None:
+                continue
+            s, e = self.indptr[row], self.indptr[row + 1]
+            ids = self.doc_ids[s:e]
+            tf = self.tfs[s:e].astype(np.float32)
+            idf = math.log(1 + (n - (e - s) + 0.5) / ((e - s) + 0.5))
+            scores[ids] += idf * tf * (K1 + 1) / (tf + self._norm[ids])
+            matched = True
+
+        if not matched:
+            return []
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (float(scores[i]), (int(self.starts[i]), int(self.ends[i]), int(self.pages[i]) or None))
+            for i in top if scores[i] > 0
+        ]
+
+    # Persistence
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+                indptr=self.indptr, doc_ids=self.doc_ids, tfs=self.tfs,
+                starts=self.starts, ends=self.ends, pages=self.pages,
+                doc_len=self.doc_len, hashes=self.hashes,
+                meta=np.frombuffer(json.dumps(self.meta).encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            terms_blob = data["terms"].tobytes().decode("utf-8")
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != INDEX_VERSION:
+                return None
+            return cls(
+                terms=terms_blob.split("\n") if terms_blob else [],
+                indptr=data["indptr"], doc_ids=data["doc_ids"], tfs=data["tfs"],
+                starts=data["starts"], ends=data["ends"], pages=data["pages"],
+                doc_len=data["doc_len"], hashes=data["hashes"], meta=meta,
+            )
+
+
+def load_index(material_id, expected_key=None, cache_size=32):
+    """
+    The material's index (kept in a per-process LRU, reloaded when the file
+    changes), or None when missing, unreadable or built for other content.
+    """
+    if not NUMPY_AVAILABLE:
+        return None
+    path = index_path(material_id)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _cache_lock:
+        entry = _loaded.get(material_id)
+        if entry and entry[0] == mtime:
+            _loaded.move_to_end(material_id)
+            index = entry[1]
+        else:
+            index = None
+
+    if index is None:
+        try:
+            index = PassageIndex.load(path)
+        except Exception:
+            index = None
+        if index is None:
+            return None
+        with _cache_lock:
+            _loaded[material_id] = (mtime, index)
+            _loaded.move_to_end(material_id)
+            while len(_loaded) > cache_size:
+                _loaded.popitem(last=False)
+
+    if expected_key is not None and index.meta.get("content_key") != expected_key:
+        return None  # built for an earlier version of the text
+    return index
+
+
+def content_key(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def update_index(material_id, text):
+    """
+    (Re)build and persist a material's index, reusing its previous one, and
+    return it. Nothing is rebuilt when the text is unchanged.
+    """
+    key = content_key(text)
+    previous = None
+    try:
+        if os.path.exists(index_path(material_id)):
+            previous = PassageIndex.load(index_path(material_id))
+    except Exception:
+        previous = None
+    if previous is not None and previous.meta.get("content_key") == key:
+        return previous
+
+    index = PassageIndex.build(text, previous=previous, content_key=key)
+    index.save(index_path(material_id))
+    return index
+
+
+def delete_index(material_id):
+    with _cache_lock:
+        _loaded.pop(material_id, None)
+    try:
+        os.remove(index_path(material_id))
+    except OSError:
+        pass
@@ -0,0 +1,402 @@
+# pdf_extraction.py
+"""
+Parallel per-page PDF text extraction.
+
+The page range is split into fixed-size batches that run in a shared process
+pool, so CPU-bound parsing uses every core instead of holding the GIL of the
+web worker. Results are merged back in page order with the same
+"--- Page N ---" markers the rest of the app expects.
+
+probe_pdf() samples the first pages with the cheap engine and picks the
+engine for the whole document up front, instead of always paying for
+pdfplumber and only falling back when it comes back empty.
+
+ocr_pages() is the local OCR stage for pages that came back (nearly) empty:
+only those pages are rasterized (pdfium) and run through tesseract, spread
+over the same pool, within a page budget and an overall timeout.
+
+A worker that dies (out of memory, a segfault on a bad file) breaks the whole
+pool; with_pool() then replaces it and runs the work once more.
+
+Nothing in here touches Flask: the functions run inside pool processes.
+"""
+import os
+import re
+import time
+import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import lazy_imports
+
+# Imported on first use, so pool processes and app startup skip them until a PDF arrives
+pdfplumber = lazy_imports.lazy("pdfplumber")
+PyPDF2 = lazy_imports.lazy("PyPDF2")
+PDFPLUMBER_AVAILABLE = lazy_imports.available("pdfplumber")
+PDF_AVAILABLE = lazy_imports.available("PyPDF2")
+
+# Local OCR: pdfium rasterizes, tesseract reads
+pdfium = lazy_imports.lazy("pypdfium2")
+pytesseract = lazy_imports.lazy("pytesseract")
+Image = lazy_imports.lazy("PIL.Image")
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+
+ENGINES = ("pdfplumber", "pypdf2")
+
+# Probe thresholds (tune from the extraction_stats recorded on materials)
+PROBE_MIN_CHARS_PER_PAGE = 40    # below this a page is treated as scanned
+PROBE_TABLE_OPS_PER_PAGE = 30    # ruling lines / rectangles that suggest tables
+PROBE_MULTICOLUMN_RATIO = 0.25   # share of lines with wide internal gaps
+
+_DRAW_OP_RE = re.compile(rb"\s(?:re|l)\s")
+_WIDE_GAP_RE = re.compile(r"\S {3,}\S|\S\t+\S")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(max_workers=None):
+    """Shared process pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the callers are threaded (job queue), forking them is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count() or 2,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def reset_pool(broken):
+    """Drop a broken pool so the next get_pool() starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def with_pool(max_workers, run):
+    """run(pool), and once more on a fresh pool if a worker died and broke the first"""
+    pool = get_pool(max_workers)
+    try:
+        return run(pool)
+    except BrokenProcessPool:
+        reset_pool(pool)
+        return run(get_pool(max_workers))
+
+
+def count_pages(file_path):
+    """Number of pages in a PDF, or 0 if it cannot be opened"""
+    try:
+        if PDF_AVAILABLE:
+            with open(file_path, 'rb') as f:
+                return len(PyPDF2.PdfReader(f).pages)
+        if PDFPLUMBER_AVAILABLE:
+            with pdfplumber.open(file_path) as pdf:
+                return len(pdf.pages)
+    except Exception:
+        pass
+    return 0
+
+
+def extract_page_range(file_path, engine, start, end):
+    """
+    Extract pages [start, end) with one engine.
+    Returns a list of (page_number, text) with 1-based page numbers.
+    Runs inside a pool process.
+    """
+    pages = []
+
+    if engine == "pdfplumber":
+        with pdfplumber.open(file_path) as pdf:
+            for i in range(start, min(end, len(pdf.pages))):
+                page = pdf.pages[i]
+                try:
+                    pages.append((i + 1, page.extract_text() or ""))
+                except Exception:
+                    pages.append((i + 1, ""))
+                finally:
+                    # pdfplumber caches layout objects per page; drop them as we go
+                    page.close()
+
+    elif engine == "pypdf2":
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            for i in range(start, min(end, len(reader.pages))):
+                try:
+                    pages.append((i + 1, reader.pages[i].extract_text() or ""))
+                except Exception:
+                    pages.append((i + 1, ""))
+
+    else:
+        raise ValueError(f"Unknown PDF engine: {engine}")
+
+    return pages
+
+
+def engine_available(engine):
+    return (engine == "pdfplumber" and PDFPLUMBER_AVAILABLE) or (engine == "pypdf2" and PDF_AVAILABLE)
+
+
+def extract_pages(file_path, engine="pdfplumber", max_pages=None, pages_per_task=25,
+                  max_workers=None, total_pages=None, on_progress=None):
+    """
+    Extract text page by page, fanning page batches out across the process pool.
+    Returns (pages, total_pages) where pages is an ordered list of (page_number, text).
+    on_progress(pages_done, pages_total, chars) is called as batches finish.
+    """
+    if not engine_available(engine):
+        raise RuntimeError(f"PDF engine '{engine}' not installed")
+
+    if total_pages is None:
+        total_pages = count_pages(file_path)
+    limit = min(total_pages, max_pages) if max_pages else total_pages
+
+    if limit <= 0:
+        return [], total_pages
+
+    ranges = [(s, min(s + pages_per_task, limit)) for s in range(0, limit, pages_per_task)]
+
+    # Small documents are not worth the pool round trip
+    if len(ranges) == 1:
+        pages = extract_page_range(file_path, engine, 0, limit)
+        if on_progress:
+            on_progress(limit, limit, sum(len(t or "") for _, t in pages))
+        return pages, total_pages
+
+    results = [None] * len(ranges)
+    pages_done = chars = 0
+
+    def run(pool):
+        nonlocal pages_done, chars
+        # On a retry, only the batches the broken pool didn't finish
+        futures = {pool.submit(extract_page_range, file_path, engine, s, e): i
+                   for i, (s, e) in enumerate(ranges) if results[i] is None}
+        for fut in as_completed(futures):
+            batch = fut.result()
+            results[futures[fut]] = batch
+            if on_progress:
+                pages_done += len(batch)
+                chars += sum(len(t or "") for _, t in batch)
+                on_progress(pages_done, limit, chars)
+
+    with_pool(max_workers, run)
+
+    pages = []
+    for batch in results:  # range order == page order
+        pages.extend(batch)
+
+    return pages, total_pages
+
+
+def ocr_available(images_only=False):
+    """pytesseract + the tesseract binary, and pdfium unless only images are OCR'd"""
+    if not (lazy_imports.available("pytesseract") and shutil.which(TESSERACT_CMD)):
+        return False
+    if images_only:
+        return lazy_imports.available("PIL")
+    return lazy_imports.available("pypdfium2")
+
+
+def ocr_page_batch(file_path, page_numbers, dpi=200, lang="eng", page_timeout=60):
+    """
+    Rasterize and OCR the given 1-based pages. Returns [(page_number, text)].
+    Runs inside a pool process; a page that fails or times out comes back empty.
+    """
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    results = []
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for page_no in page_numbers:
+            page = pdf[page_no - 1]
+            try:
+                image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+                text = pytesseract.image_to_string(image, lang=lang, timeout=page_timeout)
+            except Exception:
+                text = ""
+            finally:
+                page.close()
+            results.append((page_no, (text or "").strip()))
+    finally:
+        pdf.close()
+    return results
+
+
+def ocr_pages(file_path, page_numbers, max_pages=50, pages_per_task=2, timeout=300,
+              dpi=200, lang="eng", max_workers=None, on_progress=None):
+    """
+    OCR a subset of pages across the process pool.
+    At most max_pages pages are OCR'd (the rest are reported as skipped) and
+    the whole stage gives up after timeout seconds; batches already running
+    finish in the background, each page bounded by tesseract's own timeout.
+    Returns ({page_number: text}, stats).
+    on_progress(pages_done, pages_total, chars) is called as batches finish.
+    """
+    started = time.time()
+    selected = list(page_numbers)[:max_pages] if max_pages else list(page_numbers)
+    stats = {
+        "requested_pages": len(page_numbers),
+        "ocr_pages": len(selected),
+        "skipped_over_budget": len(page_numbers) - len(selected),
+        "completed_pages": 0,
+        "failed_batches": 0,
+        "timed_out": False,
+    }
+    texts = {}
+
+    if selected:
+        page_timeout = max(1, min(60, int(timeout)))
+        chars = 0
+
+        def run(pool):
+            nonlocal chars
+            # On a retry, only the pages the broken pool didn't finish, within what is left of timeout
+            todo = [page_no for page_no in selected if page_no not in texts]
+            batches = [todo[i:i + pages_per_task] for i in range(0, len(todo), pages_per_task)]
+            futures = [pool.submit(ocr_page_batch, file_path, batch, dpi, lang, page_timeout) for batch in batches]
+            try:
+                for fut in as_completed(futures, timeout=max(0, timeout - (time.time() - started))):
+                    try:
+                        batch = fut.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception:
+                        stats["failed_batches"] += 1
+                        continue
+                    for page_no, text in batch:
+                        texts[page_no] = text
+                        chars += len(text)
+                    if on_progress:
+                        on_progress(len(texts), len(selected), chars)
+            except FuturesTimeout:
+                stats["timed_out"] = True
+                for fut in futures:
+                    fut.cancel()
+
+        with_pool(max_workers, run)
+
+    stats["completed_pages"] = len(texts)
+    stats["ms"] = round((time.time() - started) * 1000, 2)
+    return texts, stats
+
+
+def ocr_image(file_path, lang="eng", page_timeout=60):
+    """OCR an image file (png/jpg/...). Runs inside a pool process."""
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    with Image.open(file_path) as image:
+        if getattr(image, "n_frames", 1) > 1:
+            # multi-page TIFF: one page marker per frame
+            parts = []
+            for frame in range(image.n_frames):
+                image.seek(frame)
+                text = pytesseract.image_to_string(image.convert("L"), lang=lang, timeout=page_timeout)
+                parts.append((frame + 1, (text or "").strip()))
+            return format_pages(parts)
+        return pytesseract.image_to_string(image.convert("L"), lang=lang, timeout=page_timeout).strip()
+
+
+def format_pages(pages):
+    """Join (page_number, text) pairs with the standard page markers"""
+    text = ""
+    for page_no, page_text in pages:
+        if page_text:
+            text += f"\n--- Page {page_no} ---\n{page_text}\n"
+    return text
+
+
+def _page_has_images(page):
+    try:
+        resources = page.get("/Resources") or {}
+        xobjects = resources.get("/XObject") or {}
+        return any(xobjects[name].get_object().get("/Subtype") == "/Image" for name in xobjects)
+    except Exception:
+        return False
+
+
+def _page_draw_ops(page):
+    try:
+        contents = page.get_contents()
+        return len(_DRAW_OP_RE.findall(contents.get_data())) if contents else 0
+    except Exception:
+        return 0
+
+
+def probe_pdf(file_path, sample_pages=3, ocr_available=False):
+    """
+    Sample the first pages with the cheap engine (PyPDF2) and pick the engine
+    for the whole document:
+      - ocr        almost no text but embedded images (scanned)
+      - pdfplumber ruled tables or multi-column layout that PyPDF2 scrambles
+      - pypdf2     plain running text
+    Returns a dict with the choice and the measurements behind it.
+    """
+    started = time.time()
+    probe = {
+        "engine": "pdfplumber" if PDFPLUMBER_AVAILABLE else "pypdf2",
+        "reason": "default",
+        "sampled_pages": 0,
+        "total_pages": 0,
+        "chars_per_page": 0.0,
+        "image_pages": 0,
+        "table_ops_per_page": 0.0,
+        "multicolumn_ratio": 0.0,
+    }
+
+    if not PDF_AVAILABLE:
+        probe["probe_ms"] = round((time.time() - started) * 1000, 2)
+        return probe
+
+    try:
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            total = len(reader.pages)
+            sampled = min(sample_pages, total)
+            chars = draw_ops = image_pages = 0
+            lines = wide_lines = 0
+
+            for i in range(sampled):
+                page = reader.pages[i]
+                try:
+                    page_text = page.extract_text() or ""
+                except Exception:
+                    page_text = ""
+
+                page_chars = len(page_text.strip())
+                chars += page_chars
+                draw_ops += _page_draw_ops(page)
+                if page_chars < PROBE_MIN_CHARS_PER_PAGE and _page_has_images(page):
+                    image_pages += 1
+
+                for line in page_text.splitlines():
+                    if line.strip():
+                        lines += 1
+                        if _WIDE_GAP_RE.search(line):
+                            wide_lines += 1
+
+        probe.update({
+            "sampled_pages": sampled,
+            "total_pages": total,
+            "chars_per_page": round(chars / sampled, 1) if sampled else 0.0,
+            "image_pages": image_pages,
+            "table_ops_per_page": round(draw_ops / sampled, 1) if sampled else 0.0,
+            "multicolumn_ratio": round(wide_lines / lines, 3) if lines else 0.0,
+        })
+
+        if sampled and probe["chars_per_page"] < PROBE_MIN_CHARS_PER_PAGE and image_pages:
+            probe["engine"], probe["reason"] = ("ocr", "scanned") if ocr_available else (probe["engine"], "scanned_no_ocr")
+        elif probe["table_ops_per_page"] >= PROBE_TABLE_OPS_PER_PAGE and PDFPLUMBER_AVAILABLE:
+            probe["engine"], probe["reason"] = "pdfplumber", "tables"
+        elif probe["multicolumn_ratio"] >= PROBE_MULTICOLUMN_RATIO and PDFPLUMBER_AVAILABLE:
+            probe["engine"], probe["reason"] = "pdfplumber", "layout"
+        elif sampled:
+            probe["engine"], probe["reason"] = "pypdf2", "plain_text"
+
+    except Exception as e:
+        probe["reason"] = f"probe_failed: {str(e)[:200]}"
+
+    probe["probe_ms"] = round((time.time() - started) * 1000, 2)
+    return probe
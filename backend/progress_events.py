@@ -0,0 +1,128 @@
+# progress_events.py
+"""
+In-process event bus for extraction progress.
+
+The extraction worker publishes events (stage, pages done, chars, ETA) for a
+material; every Server-Sent Events connection for that material subscribes
+and receives them through its own bounded queue. The latest event per
+material is retained briefly, so a client that connects mid-extraction
+starts from the current state rather than waiting for the next event.
+A new run (enqueue, reprocess) clears it, so a stream opened right after
+never replays the previous run's completed/failed event.
+
+Events only reach subscribers in the same process. The SSE endpoint falls
+back to reading the material's status when a job runs in another worker.
+"""
+import time
+import queue
+import threading
+from collections import defaultdict
+
+TERMINAL_STAGES = ("completed", "failed")
+
+
+class ProgressBus:
+    def __init__(self, queue_size=100, retain_seconds=300, max_retained=1000):
+        self.queue_size = queue_size
+        self.retain_seconds = retain_seconds
+        self.max_retained = max_retained
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._latest = {}
+
+    def publish(self, material_id, event):
+        event = dict(event, material_id=material_id, ts=round(time.time(), 3))
+        with self._lock:
+            self._latest[material_id] = event
+            if len(self._latest) > self.max_retained:
+                self._prune()
+            subscribers = list(self._subscribers.get(material_id, ()))
+
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow reader: drop its oldest event, progress is cumulative anyway
+                try:
+                    q.get_nowait()
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscribe(self, material_id):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[material_id].add(q)
+        return q
+
+    def unsubscribe(self, material_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(material_id)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[material_id]
+
+    def clear(self, material_id):
+        """Forget the retained event of a material's previous run"""
+        with self._lock:
+            self._latest.pop(material_id, None)
+
+    def latest(self, material_id):
+        with self._lock:
+            return self._latest.get(material_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retain_seconds
+        stale = [
+            material_id for material_id, event in self._latest.items()
+            if event["ts"] < cutoff and material_id not in self._subscribers
+        ]
+        for material_id in stale:
+            del self._latest[material_id]
+
+
+bus = ProgressBus()
+
+
+class ProgressReporter:
+    """
+    Callable handed to the extractors: reporter(stage, done=..., total=..., chars=...)
+    publishes an event with elapsed time and an ETA. Repeated updates within
+    min_interval are dropped; a stage change is always sent.
+    """
+
+    def __init__(self, material_id, min_interval=0.5, progress_bus=None):
+        self.material_id = material_id
+        self.min_interval = min_interval
+        self.bus = progress_bus or bus
+        self.started = time.time()
+        self._last_stage = None
+        self._last_sent = 0.0
+        self._stage_started = self.started
+
+    def __call__(self, stage, done=None, total=None, chars=None, **extra):
+        now = time.time()
+        finished = bool(done and total and done >= total)
+        if stage == self._last_stage and now - self._last_sent < self.min_interval and not finished:
+            return
+
+        if stage != self._last_stage:
+            self._stage_started = now
+
+        # ETA from this stage's own rate (probing etc. would skew it)
+        eta = None
+        if done and total and done < total:
+            eta = round((now - self._stage_started) / done * (total - done), 1)
+
+        self.bus.publish(self.material_id, {
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "chars": chars,
+            "elapsed_seconds": round(now - self.started, 1),
+            "eta_seconds": eta,
+            **extra
+        })
+        self._last_stage = stage
+        self._last_sent = now
@@ -23,6 +23,18 @@ try:
 except Exception as e:
     print(f"⚠️ Materials routes failed: {e}")
 
+try:
+    from . import resumable_uploads
+    print("✅ Resumable upload routes loaded")
+except Exception as e:
+    print(f"⚠️ Resumable upload routes failed: {e}")
+
+try:
+    from . import bulk_uploads
+    print("✅ Bulk upload routes loaded")
+except Exception as e:
+    print(f"⚠️ Bulk upload routes failed: {e}")
+
 try:
     from . import qa
     print("✅ QA routes loaded")
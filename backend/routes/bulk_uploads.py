@@ -0,0 +1,299 @@
+"""
+Bulk uploads: a zip of handouts and/or several files in one multipart request.
+
+    POST /api/upload-materials           files=<a.pdf> files=<handouts.zip> ... student_id=...
+    GET  /api/upload-batches/<batch_id>  per-file status (?stream=1 for live updates)
+
+Every file (or zip member) is streamed into the blob store, then all the
+CourseMaterial rows and their extraction jobs are inserted in one
+transaction. Extraction fans out over the job queue's worker pool, and
+subjects are detected for the whole batch at once when the last file is
+done. Both endpoints answer in NDJSON, one status line per file, as it happens.
+"""
+import os
+import json
+import time
+import zipfile
+from datetime import datetime
+
+from flask import request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import api
+from extensions import db
+from models import CourseMaterial, UploadBatch, User
+from job_queue import extraction_queue
+import blob_store
+from .materials import (
+    detect_subjects_batch, resolve_extractor, run_extraction_job, upload_extension
+)
+
+ZIP_TYPES = ('zip', 'application/zip', 'application/x-zip-compressed')
+STATUS_POLL_INTERVAL = 1.0  # seconds between DB polls while streaming batch status
+STATUS_STREAM_TIMEOUT = 15 * 60
+
+
+def ndjson(payload):
+    return json.dumps(payload) + "\n"
+
+
+def is_zip(file_storage):
+    name = (file_storage.filename or '').lower()
+    return name.endswith('.zip') or (file_storage.mimetype or '').lower() in ZIP_TYPES
+
+
+def iter_upload_members(files):
+    """
+    Yield (name, stream, declared_size) for every file in the request,
+    expanding zips member by member without extracting them to disk first
+    """
+    for f in files:
+        if not is_zip(f):
+            yield f.filename or 'upload.bin', f.stream, None
+            continue
+
+        # The multipart parser spools uploads to a seekable file, which is all zipfile needs
+        with zipfile.ZipFile(f.stream) as zf:
+            for info in zf.infolist():
+                base = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith('__MACOSX/') or not base or base.startswith('.'):
+                    continue
+                with zf.open(info) as member:
+                    yield base, member, info.file_size
+
+
+def batch_status(batch):
+    rows = db.session.query(
+        CourseMaterial.id, CourseMaterial.title, CourseMaterial.original_file_name,
+        CourseMaterial.processing_status, CourseMaterial.subject
+    ).filter(CourseMaterial.batch_id == batch.id).order_by(CourseMaterial.created_at).all()
+
+    return {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "total_files": batch.total_files,
+        "completed": sum(1 for r in rows if r.processing_status == 'completed'),
+        "failed": sum(1 for r in rows if r.processing_status == 'failed'),
+        "files": [
+            {
+                "id": r.id,
+                "title": r.title,
+                "file": r.original_file_name,
+                "status": r.processing_status,
+                "subject": r.subject
+            }
+            for r in rows
+        ]
+    }
+
+
+def finish_upload_batch(batch_id):
+    """
+    Detect subjects for the whole batch once nothing in it is still extracting.
+    Called after each file's final status is committed. Finishers take the batch
+    row lock before counting, so whichever runs last sees every other file
+    done and claims the batch; the others see it pending or already claimed.
+    """
+    db.session.commit()  # count from a fresh snapshot, not one taken before other files finished
+    batch = UploadBatch.query.filter_by(id=batch_id).with_for_update().first()
+    if batch is None or batch.status != 'extracting':
+        db.session.commit()
+        return False
+
+    pending = CourseMaterial.query.filter_by(batch_id=batch_id, processing_status='processing').count()
+    if pending:
+        db.session.commit()
+        return False
+
+    # Claim the batch so concurrent finishers classify it only once
+    batch.status = 'classifying'
+    db.session.commit()
+
+    try:
+        mats = CourseMaterial.query.filter_by(
+            batch_id=batch_id, processing_status='completed', subject='Processing...'
+        ).all()
+
+        if mats:
+            started = time.time()
+            subjects = detect_subjects_batch([
+                (mat.title, mat.content_prefix(3000), mat.text_hash) for mat in mats
+            ])
+            for mat, subject in zip(mats, subjects):
+                mat.subject = subject
+            current_app.logger.info(
+                f"📚 Detected {len(mats)} subject(s) for batch {batch_id} in {(time.time() - started) * 1000:.0f} ms"
+            )
+    except Exception:
+        db.session.rollback()
+        UploadBatch.query.filter_by(id=batch_id).update({"status": 'extracting'}, synchronize_session=False)
+        db.session.commit()
+        raise
+
+    UploadBatch.query.filter_by(id=batch_id).update(
+        {"status": 'completed', "finished_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return True
+
+
+@extraction_queue.handler("extract_bulk")
+def run_bulk_extraction_job(job):
+    """Extract one file of a batch; subject detection waits for the rest of the batch"""
+    mat = run_extraction_job(job, detect=False)
+    if mat is not None and mat.batch_id:
+        finish_upload_batch(mat.batch_id)
+
+
+@extraction_queue.on_failure("extract_bulk")
+def finish_batch_after_failure(job):
+    """A file that failed for good no longer holds up its batch's subject detection"""
+    mat = db.session.get(CourseMaterial, job.material_id)
+    if mat is not None and mat.batch_id:
+        finish_upload_batch(mat.batch_id)
+
+
+@api.route('/upload-materials', methods=['POST'])
+def upload_materials_bulk():
+    files = request.files.getlist('files') + request.files.getlist('file')
+    student_id = request.form.get('student_id')
+    subject = (request.form.get('subject') or '').strip()  # applies to every file; empty = auto-detect
+
+    if not student_id or not files:
+        return jsonify({"error": "student_id and at least one file required"}), 400
+    if User.query.get(student_id) is None:
+        return jsonify({"error": "student_id not found"}), 400
+
+    max_files = current_app.config.get("BULK_UPLOAD_MAX_FILES", 200)
+    max_bytes = current_app.config.get("BULK_UPLOAD_MAX_BYTES", 1024 * 1024 * 1024)
+
+    def generate():
+        stored = []
+        total_bytes = 0
+
+        try:
+            for name, stream, declared_size in iter_upload_members(files):
+                if resolve_extractor(name, '') is None:
+                    yield ndjson({"event": "skipped", "file": name, "reason": "unsupported file type"})
+                    continue
+                if len(stored) >= max_files:
+                    yield ndjson({"event": "skipped", "file": name, "reason": f"more than {max_files} files"})
+                    continue
+                if declared_size is not None and total_bytes + declared_size > max_bytes:
+                    yield ndjson({"event": "skipped", "file": name, "reason": "batch size limit reached"})
+                    continue
+
+                try:
+                    content_hash, file_size, _, created = blob_store.store_stream(stream)
+                except Exception as e:
+                    current_app.logger.exception(f"Failed to store {name}")
+                    yield ndjson({"event": "error", "file": name, "error": "file_write_failed", "msg": str(e)})
+                    continue
+
+                total_bytes += file_size
+                stored.append((name, content_hash, file_size))
+                yield ndjson({
+                    "event": "stored", "file": name, "size": file_size,
+                    "content_hash": content_hash, "deduplicated": not created
+                })
+
+        except zipfile.BadZipFile as e:
+            yield ndjson({"event": "error", "error": "invalid_zip", "msg": str(e)})
+
+        if not stored:
+            yield ndjson({"event": "done", "batch_id": None, "files": 0})
+            return
+
+        try:
+            # All rows and jobs for the batch in a single transaction
+            batch = UploadBatch(student_id=str(student_id), total_files=len(stored), status='extracting')
+            db.session.add(batch)
+            db.session.flush()
+
+            mats = []
+            for name, content_hash, file_size in stored:
+                mat = CourseMaterial(
+                    student_id=str(student_id),
+                    title=os.path.splitext(name)[0] or name,
+                    subject=subject or "Processing...",
+                    file_type=upload_extension(name),
+                    file_name=content_hash,
+                    original_file_name=name[:255],
+                    content_hash=content_hash,
+                    file_size=file_size,
+                    batch_id=batch.id,
+                    processing_status='processing',
+                    upload_date=datetime.utcnow(),
+                    created_at=datetime.utcnow()
+                )
+                db.session.add(mat)
+                mats.append(mat)
+            db.session.flush()
+
+            jobs = extraction_queue.enqueue_many([m.id for m in mats], student_id, kind="extract_bulk")
+            current_app.logger.info(f"📬 Batch {batch.id}: queued {len(jobs)} extraction job(s)")
+
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            current_app.logger.exception("DB error in upload_materials_bulk")
+            yield ndjson({"event": "error", "error": "db_error", "msg": str(e)})
+            return
+
+        for mat, job in zip(mats, jobs):
+            yield ndjson({"event": "queued", "file": mat.original_file_name, "id": mat.id, "job_id": job.id})
+
+        yield ndjson({
+            "event": "done",
+            "batch_id": batch.id,
+            "files": len(mats),
+            "status_url": f"/api/upload-batches/{batch.id}"
+        })
+
+    return Response(stream_with_context(generate()), status=202, mimetype='application/x-ndjson')
+
+
+@api.route('/upload-batches/<batch_id>', methods=['GET'])
+def upload_batch_status(batch_id):
+    try:
+        batch = UploadBatch.query.get(batch_id)
+        if batch is None:
+            return jsonify({"error": "batch not found"}), 404
+
+        # Covers batches whose last file failed outright (no job left to finish them)
+        if batch.status == 'extracting':
+            finish_upload_batch(batch_id)
+            db.session.refresh(batch)
+
+        if request.args.get('stream', '').lower() not in ('1', 'true', 'yes'):
+            return jsonify(batch_status(batch)), 200
+
+    except Exception as e:
+        current_app.logger.exception("upload_batch_status failed")
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        last_seen = {}
+        deadline = time.time() + STATUS_STREAM_TIMEOUT
+
+        while True:
+            current = UploadBatch.query.get(batch_id)
+            status = batch_status(current)
+            for f in status["files"]:
+                state = (f["status"], f["subject"])
+                if last_seen.get(f["id"]) != state:
+                    last_seen[f["id"]] = state
+                    yield ndjson({"event": "file", **f})
+
+            if current.status == 'completed' or time.time() > deadline:
+                status.pop("files")
+                yield ndjson({"event": "batch", **status})
+                return
+
+            # End the transaction so the next poll sees the workers' commits
+            db.session.commit()
+            db.session.expire_all()
+            time.sleep(STATUS_POLL_INTERVAL)
+            if current.status == 'extracting':
+                finish_upload_batch(batch_id)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
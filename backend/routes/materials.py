@@ -1,74 +1,67 @@
 import os
-import re
-import uuid
+import json
 import time
-import base64
+import queue
 import traceback
 from datetime import datetime
 
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, Response, stream_with_context
 from sqlalchemy.exc import SQLAlchemyError
 
 from . import api
 from extensions import db
-from models import CourseMaterial, User
-
-# Text extraction imports with availability flags
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-    
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
-
-try:
-    from docx import Document as DocxDocument
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-try:
-    from pptx import Presentation
-    PPTX_AVAILABLE = True
-except ImportError:
-    PPTX_AVAILABLE = False
-
-try:
-    from PIL import Image
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-
-try:
-    from openpyxl import load_workbook
-    EXCEL_AVAILABLE = True
-except ImportError:
-    EXCEL_AVAILABLE = False
-
-# Gemini for subject detection
-try:
-    import google.generativeai as genai
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
-    if GEMINI_API_KEY and len(GEMINI_API_KEY) > 10:
-        genai.configure(api_key=GEMINI_API_KEY)
-        subject_model = genai.GenerativeModel('gemini-2.5-flash')
-        GEMINI_AVAILABLE = True
-    else:
-        GEMINI_AVAILABLE = False
-except:
-    GEMINI_AVAILABLE = False
+from models import CourseMaterial, ExtractionJob, User
+from job_queue import extraction_queue
+import pdf_extraction
+import ooxml_extraction
+import tabular_extraction
+import blob_store
+import artifact_cache
+import json_stream_upload
+import extraction_cache
+import subject_classifier
+import text_normalization
+import passage_index
+import semantic_index
+import lazy_imports
+import progress_events
+
+# Extraction libraries are imported on first use (see lazy_imports);
+# the availability flags only check that they are installed
+PyPDF2 = lazy_imports.lazy("PyPDF2")
+pdfplumber = lazy_imports.lazy("pdfplumber")
+
+PDF_AVAILABLE = lazy_imports.available("PyPDF2")
+PDFPLUMBER_AVAILABLE = lazy_imports.available("pdfplumber")
+OCR_AVAILABLE = pdf_extraction.ocr_available(images_only=True)
+IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp', 'gif', 'webp'}
+PANDAS_AVAILABLE = lazy_imports.available("pandas")
+EXCEL_AVAILABLE = tabular_extraction.EXCEL_AVAILABLE
+
+# Gemini for subject detection (model built on the first detection)
+genai = lazy_imports.lazy("google.generativeai")
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_AVAILABLE = bool(GEMINI_API_KEY and len(GEMINI_API_KEY) > 10) and lazy_imports.available("google.generativeai")
+
+
+def _subject_model():
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+
+subject_model = lazy_imports.LazyObject(_subject_model)
+
+# Bump an extractor's version whenever its output changes; cached results
+# keyed on the old version are then ignored (see extraction_cache)
+EXTRACTOR_VERSIONS = {
+    'pdf': '4',
+    'docx': '4',
+    'pptx': '4',
+    'txt': '2',
+    'xlsx': '2',
+    'csv': '3',
+    'image': '1',
+}
 
 # upload root folder
 UPLOAD_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
@@ -87,27 +80,6 @@ SUBJECT_KEYWORDS = {
 }
 
 
-def decode_data_url(data_url):
-    if not data_url:
-        return None, None
-    m = re.match(r'data:(?P<mime>[^;]+);base64,(?P<b64>.+)', data_url, re.S)
-    if m:
-        mime = m.group('mime')
-        b64 = m.group('b64')
-    else:
-        mime = None
-        b64 = data_url
-    try:
-        raw = base64.b64decode(b64, validate=True)
-        return mime, raw
-    except Exception:
-        try:
-            raw = base64.b64decode(b64)
-            return mime, raw
-        except Exception:
-            return None, None
-
-
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
@@ -163,19 +135,49 @@ def detect_subject_fallback(text_sample, title):
     return "General Studies"
 
 
+def is_user_subject(subject):
+    """True if the user picked a real subject rather than asking for auto-detection"""
+    return bool(subject and subject.strip() and subject.lower() not in ['auto', 'detect', 'unknown'])
+
+
+def detect_subject_shared(text_content, title, user_provided_subject=None, content_key=None):
+    """
+    detect_subject, with detected labels shared across every material
+    that has the same normalized text (see artifact_cache)
+    """
+    if is_user_subject(user_provided_subject) or not content_key:
+        return detect_subject(text_content, title, user_provided_subject)
+
+    cached = artifact_cache.get_artifact(content_key, "subject")
+    if cached:
+        current_app.logger.info(f"♻️ Shared subject label: {cached}")
+        return cached
+
+    subject = detect_subject(text_content, title)
+    artifact_cache.put_artifact(content_key, "subject", subject)
+    return subject
+
+
 def detect_subject(text_content, title, user_provided_subject=None):
     """
-    Detect subject from content using AI or keyword matching
-    Priority: user_provided > gemini > keyword_matching > default
+    Detect subject from content using the local classifier, AI or keyword matching
+    Priority: user_provided > confident classifier > gemini > keyword_matching > default
     """
     # If user explicitly provided a subject, use it
-    if user_provided_subject and user_provided_subject.strip() and user_provided_subject.lower() not in ['auto', 'detect', 'unknown']:
+    if is_user_subject(user_provided_subject):
         return user_provided_subject.strip()
     
     # Get text sample for detection (first 3000 chars)
     text_sample = text_content[:3000] if text_content else ""
     
-    # Try Gemini first
+    # Local classifier first; Gemini only when it isn't sure
+    label, confidence = subject_classifier.predict(title, text_sample)
+    min_confidence = subject_classifier.min_confidence(current_app.config.get("SUBJECT_CLASSIFIER_MIN_CONFIDENCE", 0.5))
+    if label and confidence >= min_confidence:
+        current_app.logger.info(f"🧮 Classifier detected subject: {label} ({confidence:.2f})")
+        return label
+    
+    # Then Gemini
     gemini_subject = detect_subject_with_gemini(text_sample, title)
     if gemini_subject:
         return gemini_subject
@@ -184,69 +186,236 @@ def detect_subject(text_content, title, user_provided_subject=None):
     return detect_subject_fallback(text_sample, title)
 
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF - handles both text-based and scanned PDFs"""
-    text = ""
+def detect_subjects_batch_with_gemini(items):
+    """One Gemini call for several (title, text_sample) pairs; list of subjects or None"""
+    if not GEMINI_AVAILABLE or not items:
+        return None
     
-    # Method 1: pdfplumber (best for text PDFs)
-    if PDFPLUMBER_AVAILABLE:
-        try:
-            import pdfplumber
-            with pdfplumber.open(file_path) as pdf:
-                for i, page in enumerate(pdf.pages[:50]):  # Limit to first 50 pages for performance
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += f"\n--- Page {i+1} ---\n{page_text}\n"
-            
-            if text.strip() and len(text) > 100:
-                current_app.logger.info(f"✓ Extracted {len(text)} chars using pdfplumber")
-                return text.strip()
-        except Exception as e:
-            current_app.logger.warning(f"pdfplumber failed: {str(e)}")
+    try:
+        listing = "\n\n".join(
+            f"[{i + 1}] Title: {title}\nContent Sample:\n{sample[:800]}"
+            for i, (title, sample) in enumerate(items)
+        )
+        prompt = f"""Determine the subject area of each of these {len(items)} educational materials.
+
+{listing}
+
+Instructions:
+- Identify the PRIMARY academic subject of each material (e.g., Mathematics, Physics, Chemistry, Biology, History, etc.)
+- Use standard academic subject names
+- Return ONLY a JSON array of {len(items)} subject names, in the same order
+
+Subjects:"""
+
+        response = subject_model.generate_content(prompt)
+        text = response.text if response and response.text else ""
+        subjects = json.loads(text[text.find('['):text.rfind(']') + 1])
+        if isinstance(subjects, list) and len(subjects) == len(items):
+            current_app.logger.info(f"🤖 Gemini detected {len(items)} subjects in one call")
+            return [str(s).strip() or None for s in subjects]
+        current_app.logger.warning("Gemini batch subject detection returned the wrong number of subjects")
+    except Exception as e:
+        current_app.logger.warning(f"Gemini batch subject detection failed: {str(e)}")
     
-    # Method 2: PyPDF2 fallback
-    if PDF_AVAILABLE and not text.strip():
+    return None
+
+
+def detect_subjects_batch(items, gemini_batch_size=20):
+    """
+    detect_subject_shared for many materials at once: items are (title, text, content_key).
+    Shared labels and the local classifier are tried per item; whatever is left
+    goes to Gemini a group at a time instead of one call per material.
+    """
+    min_confidence = subject_classifier.min_confidence(current_app.config.get("SUBJECT_CLASSIFIER_MIN_CONFIDENCE", 0.5))
+    results = [None] * len(items)
+    shared = set()
+    pending = []
+
+    for i, (title, text, content_key) in enumerate(items):
+        cached = artifact_cache.get_artifact(content_key, "subject") if content_key else None
+        if cached:
+            results[i] = cached
+            shared.add(i)
+            continue
+
+        label, confidence = subject_classifier.predict(title, (text or "")[:3000])
+        if label and confidence >= min_confidence:
+            results[i] = label
+        else:
+            pending.append(i)
+
+    for start in range(0, len(pending), gemini_batch_size):
+        group = pending[start:start + gemini_batch_size]
+        samples = [(items[i][0], (items[i][1] or "")[:3000]) for i in group]
+        subjects = detect_subjects_batch_with_gemini(samples) or [None] * len(group)
+        for i, subject, (title, sample) in zip(group, subjects, samples):
+            results[i] = subject or detect_subject_fallback(sample, title)
+
+    for i, (_, _, content_key) in enumerate(items):
+        if content_key and i not in shared:
+            artifact_cache.put_artifact(content_key, "subject", results[i])
+
+    return results
+
+
+def ocr_enabled(images_only=False):
+    """Local OCR switched on and tesseract (plus pdfium for PDFs) installed"""
+    return bool(current_app.config.get("PDF_OCR_ENABLED", True)) and pdf_extraction.ocr_available(images_only)
+
+
+def extract_text_from_pdf(file_path, report=None, progress=None):
+    """
+    Extract text from PDF - handles both text-based and scanned PDFs.
+    A quick probe of the first pages picks the engine; the others remain as fallbacks.
+    Pages that still come back (nearly) empty are OCR'd locally when tesseract is
+    available, within PDF_OCR_MAX_PAGES pages and PDF_OCR_TIMEOUT seconds.
+    If a report dict is passed, the engine choice and timings are recorded in it;
+    progress(stage, ...) receives page counts as batches finish.
+    """
+    report = report if report is not None else {}
+    progress = progress or (lambda *args, **kwargs: None)
+    max_pages = current_app.config.get("PDF_MAX_PAGES", 500)
+    pages_per_task = current_app.config.get("PDF_PAGES_PER_TASK", 25)
+    workers = current_app.config.get("PDF_EXTRACTION_PROCESSES")
+    use_ocr = ocr_enabled()
+
+    progress("probing")
+    probe = pdf_extraction.probe_pdf(
+        file_path,
+        sample_pages=current_app.config.get("PDF_PROBE_PAGES", 3),
+        ocr_available=use_ocr
+    )
+    report["probe"] = probe
+    total_pages = probe["total_pages"] or pdf_extraction.count_pages(file_path)
+    current_app.logger.info(
+        f"🔬 PDF probe chose {probe['engine']} ({probe['reason']}) in {probe['probe_ms']}ms"
+    )
+
+    if probe["engine"] == "ocr":
+        # Scanned: one pass of the cheap engine only to find the pages that do have text
+        engines = ["pypdf2", "pdfplumber"]
+    else:
+        engines = [probe["engine"]] + [e for e in pdf_extraction.ENGINES if e != probe["engine"]]
+    attempts = []
+    best_pages, best_engine, best_chars = [], None, -1
+
+    for engine in engines:
+        if not pdf_extraction.engine_available(engine):
+            continue
+        started = time.time()
         try:
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                num_pages = min(len(pdf_reader.pages), 50)  # Limit pages
-                for page_num in range(num_pages):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += f"\n--- Page {page_num+1} ---\n{page_text}\n"
-            
+            pages, total_pages = pdf_extraction.extract_pages(
+                file_path, engine=engine, max_pages=max_pages,
+                pages_per_task=pages_per_task, max_workers=workers,
+                total_pages=total_pages,
+                on_progress=lambda done, total, chars, engine=engine: progress(
+                    "extracting", done=done, total=total, chars=chars, unit="pages", engine=engine
+                )
+            )
+            text = pdf_extraction.format_pages(pages)
+            elapsed_ms = round((time.time() - started) * 1000, 2)
+            attempts.append({"engine": engine, "ms": elapsed_ms, "chars": len(text)})
+
+            if len(text) > best_chars:
+                best_pages, best_engine, best_chars = pages, engine, len(text)
             if text.strip() and len(text) > 100:
-                current_app.logger.info(f"✓ Extracted {len(text)} chars using PyPDF2")
-                return text.strip()
+                current_app.logger.info(
+                    f"✓ Extracted {len(text)} chars from {len(pages)}/{total_pages} pages "
+                    f"using {engine} in {elapsed_ms / 1000:.2f}s"
+                )
+                break
+            if probe["engine"] == "ocr":
+                break  # the other engine will not find text in scans either
         except Exception as e:
-            current_app.logger.warning(f"PyPDF2 failed: {str(e)}")
-    
-    return text.strip() if text.strip() else None
+            attempts.append({"engine": engine, "ms": round((time.time() - started) * 1000, 2), "error": str(e)[:200]})
+            current_app.logger.warning(f"{engine} failed: {str(e)}")
+        finally:
+            report["attempts"] = attempts
 
+    pages, engine = list(best_pages), best_engine
+    limit = min(total_pages, max_pages) if max_pages else total_pages
 
-def extract_text_from_docx(file_path):
-    """Extract text from DOCX"""
-    if not DOCX_AVAILABLE:
-        return "⚠️ python-docx not available"
-    
+    if use_ocr and limit:
+        # OCR only the pages the text engines left (nearly) empty
+        page_text = dict(pages)
+        empty = [
+            n for n in range(1, limit + 1)
+            if len((page_text.get(n) or "").strip()) < pdf_extraction.PROBE_MIN_CHARS_PER_PAGE
+        ]
+        if empty:
+            ocr_budget = current_app.config.get("PDF_OCR_MAX_PAGES", 50)
+            progress("ocr", done=0, total=min(len(empty), ocr_budget or len(empty)), unit="pages")
+            ocr_texts, ocr_stats = pdf_extraction.ocr_pages(
+                file_path, empty,
+                max_pages=ocr_budget,
+                pages_per_task=current_app.config.get("PDF_OCR_PAGES_PER_TASK", 2),
+                timeout=current_app.config.get("PDF_OCR_TIMEOUT", 300),
+                dpi=current_app.config.get("PDF_OCR_DPI", 200),
+                lang=current_app.config.get("OCR_LANG", "eng"),
+                max_workers=workers,
+                on_progress=lambda done, total, chars: progress(
+                    "ocr", done=done, total=total, chars=chars, unit="pages"
+                )
+            )
+            report["ocr"] = ocr_stats
+            current_app.logger.info(
+                f"👁️ OCR'd {ocr_stats['completed_pages']}/{ocr_stats['ocr_pages']} empty pages "
+                f"in {ocr_stats['ms'] / 1000:.2f}s"
+                + (f", {ocr_stats['skipped_over_budget']} over the page budget" if ocr_stats['skipped_over_budget'] else "")
+                + (" (timed out)" if ocr_stats['timed_out'] else "")
+            )
+
+            for page_no, text in ocr_texts.items():
+                if len(text.strip()) > len((page_text.get(page_no) or "").strip()):
+                    page_text[page_no] = text
+            if any(t.strip() for t in ocr_texts.values()):
+                engine = f"{engine}+ocr" if engine and best_chars > 0 else "ocr"
+            pages = sorted(page_text.items())
+
+    text = pdf_extraction.format_pages(pages).strip()
+    if not text:
+        return None
+
+    report.update({"engine": engine, "pages": len(pages), "total_pages": total_pages})
+    if max_pages and total_pages > max_pages:
+        current_app.logger.warning(f"⚠️ PDF has {total_pages} pages, extracted first {max_pages}")
+        text += f"\n\n[... {total_pages - max_pages} more pages not extracted (page limit {max_pages}) ...]"
+    return text
+
+
+def extract_text_from_image(file_path, progress=None):
+    """OCR a scanned page / photo (png, jpg, tiff...) with the local tesseract"""
+    if not ocr_enabled(images_only=True):
+        current_app.logger.warning("⚠️ Image OCR not available (needs pytesseract + tesseract)")
+        return None
+    timeout = current_app.config.get("PDF_OCR_TIMEOUT", 300)
     try:
-        doc = DocxDocument(file_path)
-        text = []
-        
-        for para in doc.paragraphs[:500]:  # Limit paragraphs
-            if para.text.strip():
-                text.append(para.text)
-        
-        for table in doc.tables[:20]:  # Limit tables
-            table_text = "\n[TABLE]\n"
-            for row in table.rows:
-                row_text = ' | '.join(cell.text.strip() for cell in row.cells)
-                if row_text.strip():
-                    table_text += row_text + "\n"
-            text.append(table_text)
-        
-        full_text = '\n\n'.join(text)
+        if progress:
+            progress("ocr", done=0, total=1, unit="images")
+        text = pdf_extraction.with_pool(
+            current_app.config.get("PDF_EXTRACTION_PROCESSES"),
+            lambda pool: pool.submit(
+                pdf_extraction.ocr_image, file_path,
+                current_app.config.get("OCR_LANG", "eng"), max(1, min(60, timeout))
+            ).result(timeout=timeout)
+        )
+        if progress:
+            progress("ocr", done=1, total=1, chars=len(text), unit="images")
+        return text.strip() or None
+    except Exception as e:
+        current_app.logger.error(f"Image OCR failed: {str(e)}")
+        return None
+
+
+def extract_text_from_docx(file_path, progress=None):
+    """Extract text from DOCX, streaming the XML out of the zip (see ooxml_extraction)"""
+    try:
+        full_text = ooxml_extraction.extract_docx_text(
+            file_path,
+            on_progress=progress and (lambda done, total, chars: progress(
+                "extracting", done=done, total=total, chars=chars, unit="bytes"
+            ))
+        )
         
         if full_text.strip():
             current_app.logger.info(f"✓ Extracted {len(full_text)} chars from DOCX")
@@ -254,31 +423,20 @@ def extract_text_from_docx(file_path):
             
     except Exception as e:
         current_app.logger.error(f"DOCX extraction failed: {str(e)}")
-        return f"❌ DOCX error: {str(e)}"
+        return None
     
     return None
 
 
-def extract_text_from_pptx(file_path):
-    """Extract text from PowerPoint"""
-    if not PPTX_AVAILABLE:
-        return "⚠️ python-pptx not available"
-    
+def extract_text_from_pptx(file_path, progress=None):
+    """Extract text from PowerPoint, one slide part at a time (see ooxml_extraction)"""
     try:
-        prs = Presentation(file_path)
-        text = []
-        
-        for slide_num, slide in enumerate(prs.slides[:100], 1):  # Limit slides
-            slide_text = f"\n--- Slide {slide_num} ---\n"
-            
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    slide_text += shape.text + "\n"
-            
-            if slide_text.strip():
-                text.append(slide_text)
-        
-        full_text = '\n'.join(text)
+        full_text = ooxml_extraction.extract_pptx_text(
+            file_path,
+            on_progress=progress and (lambda done, total, chars: progress(
+                "extracting", done=done, total=total, chars=chars, unit="slides"
+            ))
+        )
         
         if full_text.strip():
             current_app.logger.info(f"✓ Extracted {len(full_text)} chars from PPTX")
@@ -286,7 +444,31 @@ def extract_text_from_pptx(file_path):
             
     except Exception as e:
         current_app.logger.error(f"PPTX extraction failed: {str(e)}")
-        return f"❌ PPTX error: {str(e)}"
+        return None
+    
+    return None
+
+
+def extract_text_from_table(file_path, extractor, progress=None):
+    """Extract rows from an xlsx workbook or CSV as compact text tables (see tabular_extraction)"""
+    options = extractor_options(extractor)
+    on_progress = progress and (lambda done, total, chars: progress(
+        "extracting", done=done, total=total, chars=chars, unit="rows"
+    ))
+    
+    try:
+        if extractor == 'xlsx':
+            full_text = tabular_extraction.extract_xlsx_text(file_path, on_progress=on_progress, **options)
+        else:
+            full_text = tabular_extraction.extract_csv_text(file_path, on_progress=on_progress, **options)
+        
+        if full_text.strip():
+            current_app.logger.info(f"✓ Extracted {len(full_text)} chars from {extractor.upper()}")
+            return full_text.strip()
+            
+    except Exception as e:
+        current_app.logger.error(f"{extractor.upper()} extraction failed: {str(e)}")
+        return None
     
     return None
 
@@ -309,7 +491,7 @@ def extract_text_from_txt(file_path):
         except Exception as e:
             current_app.logger.error(f"TXT extraction failed with {encoding}: {str(e)}")
     
-    return "❌ Could not read TXT file"
+    return None
 
 
 def truncate_content_intelligently(text, max_chars=10000000):
@@ -338,46 +520,407 @@ def truncate_content_intelligently(text, max_chars=10000000):
     return truncated
 
 
-def extract_content_from_file(file_path, file_type, title):
-    """Main extraction function - optimized for large files"""
-    current_app.logger.info(f"🔍 Extracting content from: {file_path} (type: {file_type})")
-    
+def resolve_extractor(file_path, file_type):
+    """Name of the extractor for a file ('pdf', 'docx', 'pptx', 'txt', 'xlsx', 'csv', 'image'), or None if unsupported"""
     file_type_lower = (file_type or '').lower()
     file_ext = os.path.splitext(file_path)[1].lower()
     
     if not file_type_lower:
         file_type_lower = file_ext.replace('.', '')
     
+    if file_type_lower in ['pdf', 'application/pdf'] or file_ext == '.pdf':
+        return 'pdf'
+    if file_type_lower in ['docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'] or file_ext == '.docx':
+        return 'docx'
+    if file_type_lower in ['pptx', 'ppt', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'] or file_ext in ['.pptx', '.ppt']:
+        return 'pptx'
+    if file_type_lower in ['txt', 'text/plain'] or file_ext == '.txt':
+        return 'txt'
+    if file_type_lower in ['xlsx', 'xlsm', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'] or file_ext in ['.xlsx', '.xlsm']:
+        return 'xlsx'
+    if file_type_lower in ['csv', 'text/csv'] or file_ext == '.csv':
+        return 'csv'
+    if file_type_lower in IMAGE_TYPES or file_type_lower.startswith('image/') or file_ext.lstrip('.') in IMAGE_TYPES:
+        return 'image'
+    return None
+
+
+def extractor_options(extractor):
+    """Settings that change an extractor's output (part of the extraction cache key)"""
+    if extractor == 'pdf':
+        options = {"max_pages": current_app.config.get("PDF_MAX_PAGES", 500), "ocr": ocr_enabled()}
+        if options["ocr"]:
+            options.update({
+                "ocr_max_pages": current_app.config.get("PDF_OCR_MAX_PAGES", 50),
+                "ocr_dpi": current_app.config.get("PDF_OCR_DPI", 200),
+                "ocr_lang": current_app.config.get("OCR_LANG", "eng"),
+            })
+        return options
+    if extractor == 'image':
+        return {"ocr": ocr_enabled(images_only=True), "ocr_lang": current_app.config.get("OCR_LANG", "eng")}
+    if extractor in ('xlsx', 'csv'):
+        return {
+            "max_rows": current_app.config.get("TABLE_MAX_ROWS", 5000),
+            "max_cell_chars": current_app.config.get("TABLE_MAX_CELL_CHARS", 200)
+        }
+    return {}
+
+
+def extraction_cache_key(mat, file_path):
+    """Cache key for the material's file with the current extractor, or None if unsupported"""
+    extractor = resolve_extractor(file_path, mat.file_type)
+    if extractor is None:
+        return None
+    file_hash = mat.content_hash or extraction_cache.file_sha256(file_path)
+    return extraction_cache.cache_key(
+        file_hash, extractor, EXTRACTOR_VERSIONS[extractor], extractor_options(extractor)
+    )
+
+
+def extract_content_from_file(file_path, file_type, title, report=None, progress=None):
+    """
+    Main extraction function - optimized for large files.
+    Pass a dict as report to collect engine/timing details for the material,
+    and a progress callable (see progress_events.ProgressReporter) for live updates.
+    Returns None when no usable text came out (never an error message, which
+    would otherwise be cached and stored as if it were the material's text).
+    """
+    current_app.logger.info(f"🔍 Extracting content from: {file_path} (type: {file_type})")
+    
+    extractor = resolve_extractor(file_path, file_type)
     extracted_text = None
+    progress = progress or (lambda *args, **kwargs: None)
+    if extractor not in ('pdf', 'image'):
+        progress("extracting", extractor=extractor)
     
     # PDF files
-    if file_type_lower in ['pdf', 'application/pdf'] or file_ext == '.pdf':
-        extracted_text = extract_text_from_pdf(file_path)
+    if extractor == 'pdf':
+        extracted_text = extract_text_from_pdf(file_path, report, progress)
     
     # DOCX files
-    elif file_type_lower in ['docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'] or file_ext == '.docx':
-        extracted_text = extract_text_from_docx(file_path)
+    elif extractor == 'docx':
+        extracted_text = extract_text_from_docx(file_path, progress)
     
     # PowerPoint files
-    elif file_type_lower in ['pptx', 'ppt', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'] or file_ext in ['.pptx', '.ppt']:
-        extracted_text = extract_text_from_pptx(file_path)
+    elif extractor == 'pptx':
+        extracted_text = extract_text_from_pptx(file_path, progress)
     
     # Text files
-    elif file_type_lower in ['txt', 'text/plain'] or file_ext == '.txt':
+    elif extractor == 'txt':
         extracted_text = extract_text_from_txt(file_path)
     
+    # Spreadsheets and CSV
+    elif extractor in ('xlsx', 'csv'):
+        extracted_text = extract_text_from_table(file_path, extractor, progress)
+    
+    # Scans and photos
+    elif extractor == 'image':
+        extracted_text = extract_text_from_image(file_path, progress)
+    
     # Unsupported format
     else:
-        return f"⚠️ Unsupported file format: {file_type_lower or file_ext}"
+        file_ext = os.path.splitext(file_path)[1].lower()
+        current_app.logger.warning(f"⚠️ Unsupported file format: {(file_type or '').lower() or file_ext}")
+        if report is not None:
+            report["error"] = f"Unsupported file format: {(file_type or '').lower() or file_ext}"
+        return None
     
     if extracted_text and len(extracted_text) > 50:
         # Truncate if too large (safety measure)
         extracted_text = truncate_content_intelligently(extracted_text, max_chars=10000000)  # 10MB limit
+        progress("extracted", chars=len(extracted_text))
         
         current_app.logger.info(f"✅ Successfully extracted {len(extracted_text)} characters")
         return extracted_text
     else:
-        return f"❌ Could not extract text from '{title}'"
+        current_app.logger.warning(f"⚠️ Could not extract text from '{title}'")
+        return None
+
+
+def upload_extension(client_file_name, mime=None):
+    """File type for a new upload: the client's extension, else the MIME subtype"""
+    ext = os.path.splitext(client_file_name or '')[1].replace('.', '').lower()
+    if ext and ext != 'bin':
+        return ext
+    return mime.split('/')[-1] if mime else ext
+
+
+def material_file_path(mat):
+    """Location of a material's uploaded file on disk"""
+    if mat.content_hash:
+        return blob_store.blob_path(mat.content_hash)
+    # Uploads from before content-addressed storage
+    return (blob_store.student_file_path(mat.student_id, mat.file_name)
+            or os.path.join(blob_store.student_dir(mat.student_id), mat.file_name))
+
+
+def find_extracted_duplicate(mat):
+    """Another material with the same bytes whose extraction already succeeded"""
+    if not mat.content_hash:
+        return None
+    return CourseMaterial.query.filter(
+        CourseMaterial.content_hash == mat.content_hash,
+        CourseMaterial.id != mat.id,
+        CourseMaterial.processing_status == 'completed'
+    ).order_by(CourseMaterial.created_at.desc()).first()
+
+
+def semantic_enabled():
+    """Semantic index switched on and its embedder usable here"""
+    return bool(current_app.config.get("SEMANTIC_INDEX_ENABLED", True)) and semantic_index.embedder_available(
+        current_app.config.get("SEMANTIC_EMBEDDER")
+    )
+
+
+def process_material(mat, file_path, user_subject=None, reuse_existing=True, force=False, detect=True):
+    """
+    Extract content and detect subject for a material, updating the row in place.
+    Results come from the extraction cache when the file and extractor are unchanged
+    (unless force); with reuse_existing, text already extracted for an identical
+    upload is copied over. detect=False leaves subject detection to the caller.
+    """
+    report = {}
+    started = time.time()
+    progress = progress_events.ProgressReporter(mat.id)
+
+    key = extraction_cache_key(mat, file_path)
+    cached = extraction_cache.get(key) if key and not force else None
+    donor = find_extracted_duplicate(mat) if reuse_existing and cached is None else None
+
+    if cached is not None:
+        extracted_content = cached["text"]
+        report.update(cached.get("report") or {})
+        report["cache_hit"] = True
+        progress("extracted", chars=len(extracted_content or ""), cached=True)
+        current_app.logger.info(f"♻️ Extraction cache hit for {mat.title}")
+    elif donor is not None:
+        # Byte-identical upload: reuse the text instead of extracting again
+        extracted_content = donor.raw_content
+        report.update(donor.extraction_stats or {})
+        report["engine"] = donor.extraction_engine
+        report["reused_from"] = donor.id
+        current_app.logger.info(f"♻️ Reusing extracted text of material {donor.id} (same content hash)")
+    else:
+        extracted_content = extract_content_from_file(file_path, mat.file_type, mat.title, report, progress)
+        if key and extracted_content and len(extracted_content) > 50:
+            extraction_cache.put(
+                key, extracted_content, report,
+                max_bytes=current_app.config.get("EXTRACTION_CACHE_MAX_BYTES")
+            )
+    report["extract_ms"] = round((time.time() - started) * 1000, 2)
+    report["cache_key"] = key
+
+    # Headers/footers, hyphenation and whitespace out; the raw text is kept (mat.raw_content)
+    raw_content = extracted_content
+    if extracted_content and len(extracted_content) > 50 and current_app.config.get("TEXT_NORMALIZATION_ENABLED", True):
+        extracted_content, report["normalization"] = text_normalization.normalize_text(raw_content)
+        current_app.logger.info(
+            f"🧹 Normalized {report['normalization']['chars_in']} -> {report['normalization']['chars_out']} chars"
+        )
+
+    # BM25 passage index for QA (see passage_index); only changed passages are re-tokenized
+    if extracted_content and len(extracted_content) > 50 and passage_index.NUMPY_AVAILABLE:
+        progress("indexing", chars=len(extracted_content))
+        try:
+            index = passage_index.update_index(mat.id, extracted_content)
+            report["passage_index"] = {
+                k: index.meta[k] for k in ("content_key", "passages", "terms", "reused_passages", "build_ms")
+            }
+        except Exception as e:
+            current_app.logger.warning(f"⚠️ Passage index failed for {mat.title}: {str(e)}")
+
+    # Passage vectors in the student's semantic index (see semantic_index)
+    if extracted_content and len(extracted_content) > 50 and semantic_enabled():
+        progress("embedding", chars=len(extracted_content))
+        try:
+            report["semantic_index"] = semantic_index.update_material(
+                mat.student_id, mat.id, extracted_content, embedder=current_app.config.get("SEMANTIC_EMBEDDER")
+            )
+        except Exception as e:
+            current_app.logger.warning(f"⚠️ Semantic index failed for {mat.title}: {str(e)}")
+
+    mat.extraction_engine = report.get("engine")
+    mat.extraction_stats = report
+
+    if extracted_content and len(extracted_content) > 50:
+        mat.raw_content = raw_content
+        mat.content = extracted_content
+        mat.processing_status = 'completed'
+
+        # Hash of the extractor's output, so shared artifacts survive normalizer changes
+        mat.text_hash = artifact_cache.normalized_text_hash(raw_content)
+
+        # AUTO-DETECT SUBJECT if not provided
+        if detect and not is_user_subject(user_subject):
+            progress("detecting_subject", chars=len(extracted_content))
+        if detect:
+            detected_subject = detect_subject_shared(extracted_content, mat.title, user_subject, mat.text_hash)
+        elif is_user_subject(user_subject):
+            detected_subject = user_subject.strip()
+        else:
+            detected_subject = mat.subject  # detected later, e.g. once for a whole upload batch
+        mat.subject = detected_subject
+
+        current_app.logger.info(f"✅ Extraction complete ({len(extracted_content)} chars). Subject: {detected_subject}")
+    else:
+        reason = report.get("error") or f"Could not extract text from '{mat.title}'"
+        mat.raw_content = None
+        mat.content = extracted_content or f"❌ {reason}"
+        mat.processing_status = 'failed'
+        mat.subject = user_subject or "Unknown"
+        current_app.logger.warning(f"⚠️ Empty extraction for {mat.title}")
+
+    db.session.commit()
+    progress(mat.processing_status, chars=mat.content_length or 0, subject=mat.subject)
+    return mat
+
+
+@extraction_queue.handler("extract")
+def run_extraction_job(job, detect=True):
+    """Background worker entry point for a queued upload"""
+    mat = db.session.get(CourseMaterial, job.material_id)
+    if mat is None:
+        current_app.logger.warning(f"Material {job.material_id} gone before extraction, skipping")
+        return None
+
+    file_path = material_file_path(mat)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Uploaded file missing on disk: {mat.file_name}")
+
+    user_subject = mat.subject if mat.subject not in (None, "", "Processing...") else None
+
+    current_app.logger.info(f"🔄 Starting text extraction for: {mat.title} (attempt {job.attempts})")
+    mat.processing_status = 'processing'
+    db.session.commit()
+
+    return process_material(mat, file_path, user_subject, detect=detect)
+
+
+@api.route('/material-status/<material_id>', methods=['GET'])
+def material_status(material_id):
+    """Processing status of a material and its latest extraction job"""
+    try:
+        mat = CourseMaterial.query.get(material_id)
+        if not mat:
+            return jsonify({"error": "Material not found"}), 404
+
+        job = ExtractionJob.query.filter_by(
+            material_id=material_id
+        ).order_by(ExtractionJob.created_at.desc()).first()
+
+        payload = {
+            "id": mat.id,
+            "status": mat.processing_status,
+            "subject": mat.subject,
+            "extraction_engine": mat.extraction_engine,
+            "extraction_stats": mat.extraction_stats,
+            "job": None
+        }
+
+        if job:
+            payload["job"] = {
+                "id": job.id,
+                "status": job.status,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+                "last_error": job.last_error,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "started_at": job.started_at.isoformat() if job.started_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+                "retry_at": job.run_after.isoformat() if job.run_after else None
+            }
+
+        return jsonify(payload), 200
+
+    except Exception as e:
+        current_app.logger.exception("material_status failed")
+        return jsonify({"error": str(e)}), 500
+
+
+def sse_message(event):
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+
+@api.route('/material-progress/<material_id>', methods=['GET'])
+def material_progress_stream(material_id):
+    """
+    Server-Sent Events stream of extraction progress for one material
+    (stage, pages done, chars, ETA), ending with a completed/failed event
+    """
+    status = db.session.query(CourseMaterial.processing_status).filter_by(id=material_id).scalar()
+    if status is None:
+        return jsonify({"error": "Material not found"}), 404
+
+    keepalive = current_app.config.get("PROGRESS_KEEPALIVE_SECONDS", 15)
+
+    def generate():
+        # Subscribe before reading state so no event can slip in between
+        events = progress_events.bus.subscribe(material_id)
+        try:
+            latest = progress_events.bus.latest(material_id)
+            # A terminal event while the row says processing is from an earlier run
+            # (e.g. retained by another worker process); wait for this run's events
+            if latest and latest["stage"] in progress_events.TERMINAL_STAGES and status == 'processing':
+                latest = None
+            if latest:
+                yield sse_message(latest)
+                if latest["stage"] in progress_events.TERMINAL_STAGES:
+                    return
+            elif status != 'processing':
+                yield sse_message({"material_id": material_id, "stage": status})
+                return
+
+            while True:
+                try:
+                    event = events.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    # The job may be running in another worker process, whose events
+                    # never reach this bus; the status column still tells us when it ends
+                    current = db.session.query(CourseMaterial.processing_status).filter_by(id=material_id).scalar()
+                    db.session.commit()
+                    if current != 'processing':
+                        yield sse_message({"material_id": material_id, "stage": current or 'failed'})
+                        return
+                    continue
+
+                yield sse_message(event)
+                if event["stage"] in progress_events.TERMINAL_STAGES:
+                    return
+        finally:
+            progress_events.bus.unsubscribe(material_id, events)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+def create_material_and_enqueue(student_id, title, subject, client_file_name, ext, content_hash, file_size):
+    """Create the CourseMaterial row for a stored blob and queue its extraction"""
+    # Create database record immediately (before extraction)
+    mat = CourseMaterial(
+        student_id=str(student_id),
+        title=title,
+        subject=subject or "Processing...",  # Temporary
+        file_type=ext,
+        file_name=content_hash,
+        original_file_name=client_file_name[:255],
+        content_hash=content_hash,
+        file_size=file_size,
+        processing_status='processing',
+        upload_date=datetime.utcnow(),
+        created_at=datetime.utcnow()
+    )
+
+    db.session.add(mat)
+    db.session.commit()
+    current_app.logger.info(f"💾 Created material record: ID={mat.id}")
+
+    # Hand extraction + subject detection to the background queue
+    job = extraction_queue.enqueue(mat.id, student_id)
+    current_app.logger.info(f"📬 Queued extraction job {job.id} for: {title}")
+    return mat, job
 
 
 @api.route('/upload-material', methods=['POST'])
@@ -401,142 +944,72 @@ def upload_material():
             if user is None:
                 return jsonify({"error": "student_id not found"}), 400
 
-            subdir = os.path.join(UPLOAD_ROOT, str(student_id))
-            ensure_dir(subdir)
-
-            safe_name = client_file_name.replace("/", "_")[:200]
-            unique_name = f"{uuid.uuid4().hex[:8]}_{safe_name}"
-            file_path = os.path.join(subdir, unique_name)
-
-            # Stream large file to disk (no memory buffering)
+            # Stream large file into the blob store, hashing as we go (no memory buffering)
             try:
-                with open(file_path, "wb") as wf:
-                    chunk_size = 8192  # 8KB chunks
-                    while True:
-                        chunk = f.stream.read(chunk_size)
-                        if not chunk:
-                            break
-                        wf.write(chunk)
-                        file_size += len(chunk)
-                
-                current_app.logger.info(f"📁 Saved file: {file_path} ({file_size} bytes)")
+                content_hash, file_size, file_path, created = blob_store.store_stream(f.stream)
+                current_app.logger.info(
+                    f"📁 {'Saved' if created else 'Deduplicated'} blob {content_hash[:12]} ({file_size} bytes)"
+                )
             except Exception as e:
                 current_app.logger.exception("Failed to write file")
                 return jsonify({"error": "file_write_failed", "msg": str(e)}), 500
 
-            ext = mime.split('/')[-1] if mime else os.path.splitext(client_file_name)[1].replace('.', '')
+            ext = upload_extension(client_file_name, mime)
 
         else:
-            # JSON upload (for smaller files)
+            # JSON upload: base64 file_data is decoded incrementally straight into the blob store
+            writer = blob_store.BlobWriter()
             try:
-                data = request.get_json(force=True)
+                data, has_file_data, mime = json_stream_upload.parse_json_upload(
+                    request.stream, 'file_data', writer
+                )
+            except ValueError as e:
+                writer.abort()
+                return jsonify({"error": "invalid json or file_data (base64)", "msg": str(e)}), 400
             except Exception as e:
-                return jsonify({"error": "invalid json", "msg": str(e)}), 400
+                writer.abort()
+                current_app.logger.exception("Failed to write file")
+                return jsonify({"error": "file_write_failed", "msg": str(e)}), 500
 
             student_id = data.get('student_id')
             title = data.get('title', 'Untitled')
-            subject = data.get('subject', '').strip()
+            subject = (data.get('subject') or '').strip()
             client_file_name = data.get('file_name') or (title.replace(" ", "_")[:60] + ".bin")
             file_type = data.get('file_type') or ''
-            file_data = data.get('file_data')
 
-            if not student_id or not file_data:
+            if not student_id or not has_file_data or writer.size == 0:
+                writer.abort()
                 return jsonify({"error": "student_id and file_data required"}), 400
 
-            mime, raw_bytes = decode_data_url(file_data)
-            if raw_bytes is None:
-                return jsonify({"error": "invalid file_data (base64)"}), 400
-
-            file_size = len(raw_bytes)
-            ext = (file_type or (mime.split('/')[-1] if mime else '')).lower()
+            ext = (file_type or upload_extension(client_file_name, mime)).lower()
 
             user = User.query.get(student_id)
             if user is None:
+                writer.abort()
                 return jsonify({"error": "student_id not found"}), 400
 
-            subdir = os.path.join(UPLOAD_ROOT, str(student_id))
-            ensure_dir(subdir)
-
-            safe_name = client_file_name.replace("/", "_")[:200]
-            unique_name = f"{uuid.uuid4().hex[:8]}_{safe_name}"
-            file_path = os.path.join(subdir, unique_name)
-
             try:
-                with open(file_path, "wb") as wf:
-                    wf.write(raw_bytes)
-                current_app.logger.info(f"📁 Saved file: {file_path} ({file_size} bytes)")
+                content_hash, file_size, file_path, created = writer.commit()
+                current_app.logger.info(
+                    f"📁 {'Saved' if created else 'Deduplicated'} blob {content_hash[:12]} ({file_size} bytes)"
+                )
             except Exception as e:
+                writer.abort()
                 current_app.logger.exception("Failed to write file")
                 return jsonify({"error": "file_write_failed", "msg": str(e)}), 500
 
-        # Create database record immediately (before extraction)
-        mat = CourseMaterial(
-            student_id=str(student_id),
-            title=title,
-            subject=subject or "Processing...",  # Temporary
-            file_type=ext,
-            file_name=unique_name,
-            file_size=file_size,
-            processing_status='processing',
-            upload_date=datetime.utcnow(),
-            created_at=datetime.utcnow()
+        mat, job = create_material_and_enqueue(
+            student_id, title, subject, client_file_name, ext, content_hash, file_size
         )
 
-        db.session.add(mat)
-        db.session.commit()
-        
-        material_id = mat.id
-        current_app.logger.info(f"💾 Created material record: ID={material_id}")
-
-        # EXTRACT TEXT FROM FILE
-        try:
-            current_app.logger.info(f"🔄 Starting text extraction for: {title}")
-            
-            extracted_content = extract_content_from_file(file_path, ext, title)
-            
-            if extracted_content and len(extracted_content) > 50:
-                mat.content = extracted_content
-                mat.processing_status = 'completed'
-                
-                # AUTO-DETECT SUBJECT if not provided
-                detected_subject = detect_subject(extracted_content, title, subject)
-                mat.subject = detected_subject
-                
-                preview = extracted_content[:300].replace('\n', ' ')
-                current_app.logger.info(f"✅ Extraction complete ({len(extracted_content)} chars). Subject: {detected_subject}")
-            else:
-                mat.content = extracted_content or f"⚠️ Extraction returned empty content"
-                mat.processing_status = 'failed'
-                mat.subject = subject or "Unknown"
-                current_app.logger.warning(f"⚠️ Empty extraction for {title}")
-            
-            db.session.commit()
-            
-            return jsonify({
-                "id": material_id,
-                "chunks_created": 1,
-                "status": mat.processing_status,
-                "subject": mat.subject,
-                "content_length": len(mat.content or ""),
-                "content_preview": (mat.content or "")[:200],
-                "message": "Upload and extraction completed successfully" if mat.processing_status == 'completed' else "Extraction had issues"
-            }), 201
-
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.exception("❌ Text extraction failed")
-            
-            mat.processing_status = 'failed'
-            mat.content = f"❌ Extraction error: {str(e)}"
-            mat.subject = subject or "Unknown"
-            db.session.commit()
-            
-            return jsonify({
-                "id": material_id,
-                "error": "extraction_failed",
-                "msg": str(e),
-                "status": "failed"
-            }), 500
+        return jsonify({
+            "id": mat.id,
+            "job_id": job.id,
+            "status": mat.processing_status,
+            "subject": mat.subject,
+            "status_url": f"/api/material-status/{mat.id}",
+            "message": "Upload received, extraction queued"
+        }), 202
 
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -556,38 +1029,46 @@ def reprocess_material(material_id):
         if not mat:
             return jsonify({"error": "Material not found"}), 404
         
-        file_path = os.path.join(UPLOAD_ROOT, str(mat.student_id), mat.file_name)
+        file_path = material_file_path(mat)
         
         if not os.path.exists(file_path):
             return jsonify({"error": "File not found on disk"}), 404
         
-        current_app.logger.info(f"🔄 Re-processing material: {mat.title}")
-        
-        mat.processing_status = 'processing'
-        db.session.commit()
+        data = request.get_json(silent=True) or {}
+        force = bool(data.get('force')) or request.args.get('force', '').lower() in ('1', 'true', 'yes')
         
-        extracted_content = extract_content_from_file(file_path, mat.file_type, mat.title)
+        # Same file, same extractor version and options: nothing would change
+        if not force and mat.processing_status == 'completed':
+            key = extraction_cache_key(mat, file_path)
+            stats = mat.extraction_stats or {}
+            indexed = (
+                ('passage_index' in stats or not passage_index.NUMPY_AVAILABLE)
+                and ('semantic_index' in stats or not semantic_enabled())
+            )
+            if key and stats.get('cache_key') == key and indexed:
+                return jsonify({
+                    "id": material_id,
+                    "status": mat.processing_status,
+                    "subject": mat.subject,
+                    "content_length": mat.content_length or 0,
+                    "cached": True,
+                    "message": "Content is up to date (use force to re-extract)"
+                }), 200
         
-        if extracted_content and len(extracted_content) > 50:
-            mat.content = extracted_content
-            mat.processing_status = 'completed'
-            
-            # Re-detect subject
-            detected_subject = detect_subject(extracted_content, mat.title, mat.subject)
-            mat.subject = detected_subject
-            
-            current_app.logger.info(f"✅ Re-extraction complete. Subject: {detected_subject}")
-        else:
-            mat.content = extracted_content or "⚠️ Re-extraction failed"
-            mat.processing_status = 'failed'
+        current_app.logger.info(f"🔄 Re-processing material: {mat.title} (force={force})")
         
+        mat.processing_status = 'processing'
         db.session.commit()
+        progress_events.bus.clear(material_id)
+        
+        process_material(mat, file_path, mat.subject, reuse_existing=False, force=force)
         
         return jsonify({
             "id": material_id,
             "status": mat.processing_status,
             "subject": mat.subject,
-            "content_length": len(mat.content or ""),
+            "content_length": mat.content_length or 0,
+            "cached": bool((mat.extraction_stats or {}).get('cache_hit')),
             "message": "Re-extraction completed"
         }), 200
         
@@ -1,49 +1,57 @@
 from flask import request, jsonify, current_app, make_response
 from . import api
 from models import CourseMaterial
+from chunking import PAGE_MARKER_RE
 import os
-
-# Conditional imports for Gemini
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
-    
-    if GEMINI_API_KEY and len(GEMINI_API_KEY) > 10:
-        try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            # Using the latest Gemini 2.5 Flash model
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            # Test the connection
-            print(f"✅ Gemini API configured successfully with model: gemini-2.5-flash")
-            GEMINI_CONFIGURED = True
-        except Exception as e:
-            print(f"❌ Gemini configuration failed: {str(e)}")
-            GEMINI_CONFIGURED = False
-            GEMINI_AVAILABLE = False
-    else:
-        print("⚠️ Gemini API key not set or invalid")
-        GEMINI_CONFIGURED = False
-        GEMINI_AVAILABLE = False
-except ImportError as e:
-    print(f"❌ google-generativeai not installed: {str(e)}")
-    GEMINI_AVAILABLE = False
-    GEMINI_CONFIGURED = False
-except Exception as e:
-    print(f"❌ Gemini import error: {str(e)}")
+import time
+import lazy_imports
+import passage_index
+import semantic_index
+
+# Gemini is imported and configured on the first question (see lazy_imports)
+genai = lazy_imports.lazy("google.generativeai")
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_AVAILABLE = lazy_imports.available("google.generativeai")
+GEMINI_CONFIGURED = GEMINI_AVAILABLE and bool(GEMINI_API_KEY and len(GEMINI_API_KEY) > 10)
+
+if not GEMINI_AVAILABLE:
+    print("❌ google-generativeai not installed")
+elif GEMINI_CONFIGURED:
+    # Using the latest Gemini 2.5 Flash model
+    print(f"✅ Gemini API key set, model gemini-2.5-flash loads on first use")
+else:
+    print("⚠️ Gemini API key not set or invalid")
     GEMINI_AVAILABLE = False
-    GEMINI_CONFIGURED = False
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
 
-from datetime import datetime
+def _qa_model():
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+
+model = lazy_imports.LazyObject(_qa_model)
+
+from wikipedia_enrichment import WikipediaEnricher, REQUESTS_AVAILABLE
 
-# In-memory chat history storage
-chat_histories = {}
+
+def _wikipedia_enricher():
+    config = current_app.config
+    return WikipediaEnricher(
+        base_url=config.get("WIKIPEDIA_API_URL", "https://en.wikipedia.org/api/rest_v1"),
+        budget=config.get("WIKIPEDIA_BUDGET_MS", 800) / 1000,
+        cache_size=config.get("WIKIPEDIA_CACHE_SIZE", 5000),
+        ttl=config.get("WIKIPEDIA_CACHE_TTL", 86400),
+        negative_ttl=config.get("WIKIPEDIA_NEGATIVE_TTL", 3600),
+        pool_size=config.get("WIKIPEDIA_POOL_SIZE", 8),
+    )
+
+
+# One cache and connection pool per process, built on first use (see wikipedia_enrichment)
+wikipedia = lazy_imports.LazyObject(_wikipedia_enricher)
+
+from chat_history import chat_history
+from conversation_memory import conversation_memory
+from context_assembler import context_assembler, Source
 
 def add_cors_headers(response):
     """Add CORS headers to response"""
@@ -53,20 +61,12 @@ def add_cors_headers(response):
     response.headers['Access-Control-Max-Age'] = '3600'
     return response
 
-def get_wikipedia_content(query, sentences=3):
-    """Fetch relevant Wikipedia content"""
-    if not REQUESTS_AVAILABLE:
+def get_wikipedia_content(question):
+    """(term, summary) from Wikipedia for the question's topic, cached and within the latency budget"""
+    if not REQUESTS_AVAILABLE or not current_app.config.get("WIKIPEDIA_ENABLED", True):
         return None
     try:
-        url = "https://en.wikipedia.org/api/rest_v1/page/summary/" + query.replace(" ", "_")
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            extract = data.get('extract', '')
-            if extract:
-                import re
-                sentences_list = re.split(r'(?<=[.!?])\s+', extract)
-                return ' '.join(sentences_list[:sentences])
+        return wikipedia.enrich(question, max_terms=current_app.config.get("WIKIPEDIA_MAX_TERMS", 2))
     except Exception as e:
         current_app.logger.warning(f"Wikipedia fetch failed: {str(e)}")
     return None
@@ -119,68 +119,171 @@ def extract_relevant_content(material_content, question, max_chars=2000):
     
     return relevant_text[:max_chars]
 
-def build_context(material, question, student_id):
-    """Build comprehensive context from multiple sources"""
+def semantic_hits(material, question, k=20):
+    """[(score, (start, end, page))] from the student's semantic index, or None without one"""
+    if not current_app.config.get("SEMANTIC_INDEX_ENABLED", True):
+        return None
+    key = ((material.extraction_stats or {}).get("semantic_index") or {}).get("content_key")
+    if not key:
+        return None
+    try:
+        results = semantic_index.search(
+            material.student_id, [question], k=k, material_id=material.id, expected_key=key,
+            embedder=current_app.config.get("SEMANTIC_EMBEDDER")
+        )
+    except Exception as e:
+        current_app.logger.warning(f"⚠️ Semantic search failed: {str(e)}")
+        return None
+    return [(score, span) for score, _, span in results[0]] if results is not None else None
+
+def retrieve_passages(material, question, max_chars=2000, candidates=20):
+    """
+    Best passages for the question, in document order and labelled with their
+    page, up to max_chars: BM25 hits from the material's passage index fused
+    (by rank) with cosine hits from the semantic index, or the semantic hits
+    alone when no keyword matches. None when the material has neither index
+    (use extract_relevant_content).
+    """
+    key = ((material.extraction_stats or {}).get("passage_index") or {}).get("content_key")
+    index = passage_index.load_index(material.id, expected_key=key) if key else None
+    semantic = semantic_hits(material, question, k=candidates)
+    if index is None and semantic is None:
+        return None
+
+    keyword = index.search(question, k=candidates) if index is not None else []
+    if keyword and semantic and current_app.config.get("SEMANTIC_FUSION", True):
+        ranked = semantic_index.fuse_rankings(keyword, semantic)
+    else:
+        ranked = keyword or semantic or []
+
+    picked, used = [], 0
+    for _, (start, end, page) in ranked:
+        if used + (end - start) > max_chars and picked:
+            continue
+        picked.append((start, end, page))
+        used += end - start
+    if not picked:
+        return ""
+
+    picked.sort()
+    texts = material.content_slices([(start, end) for start, end, _ in picked])
+    parts = []
+    for (_, _, page), text in zip(picked, texts):
+        text = PAGE_MARKER_RE.sub("", text).strip()
+        if text:
+            parts.append(f"[Page {page}] {text}" if page else text)
+    return "\n...\n".join(parts)[:max_chars]
+
+def relevant_material_text(material, question, max_chars=2000):
+    """Passages from the BM25 and semantic indexes, or the keyword scan for materials without them"""
+    passages = retrieve_passages(material, question, max_chars=max_chars)
+    if passages is not None:
+        return passages
+    return extract_relevant_content(material.content, question, max_chars=max_chars)
+
+def material_context(material, question):
+    """([context sections], has_valid_content) from the student's material"""
     contexts = []
     has_valid_content = False
-    
-    # 1. Student's material
-    if material and material.content:
-        if "placeholder" in material.content.lower() or len(material.content) < 100:
+    if material and material.text_length:
+        material_head = material.content_prefix(3000)
+        if "placeholder" in material_head.lower() or material.text_length < 100:
             current_app.logger.warning(f"Material {material.id} has placeholder/invalid content")
             contexts.append(f"=== Material Status ===\nMaterial '{material.title}' found but content extraction failed.")
         else:
-            relevant_content = extract_relevant_content(material.content, question, max_chars=3000)
+            relevant_content = relevant_material_text(material, question, max_chars=3000)
             if relevant_content:
                 contexts.append(f"=== From Your Study Material: {material.title} ===\n{relevant_content}")
                 has_valid_content = True
                 current_app.logger.info(f"Extracted {len(relevant_content)} chars of relevant content")
             else:
-                material_excerpt = material.content[:3000]
+                material_excerpt = material_head
                 contexts.append(f"=== From Your Study Material: {material.title} ===\n{material_excerpt}")
                 has_valid_content = True
                 current_app.logger.info(f"Using material excerpt: {len(material_excerpt)} chars")
     else:
         current_app.logger.warning("No material content available")
-    
+    return contexts, has_valid_content
+
+def build_context(material, question, student_id, material_id=None):
+    """
+    Build comprehensive context from multiple sources, gathered concurrently
+    under CONTEXT_DEADLINE_MS (see context_assembler); a source that misses
+    it is left out. Returns (context, has_valid_content, (summary,
+    recent_turns), timings per source).
+    """
+    results, timings = context_assembler.gather([
+        # The material rows belong to this request's session: runs here, meanwhile
+        Source("material", lambda: material_context(material, question), inline=True, default=([], False)),
+        Source("wikipedia", lambda: get_wikipedia_content(question)),
+        Source("history", lambda: get_chat_history(student_id, material_id), default=("", [])),
+    ])
+    contexts, has_valid_content = results["material"]
+    contexts = list(contexts)
+
     # 2. Wikipedia context
-    key_terms = [word for word in question.split() if len(word) > 4]
-    if key_terms and REQUESTS_AVAILABLE:
-        wiki_content = get_wikipedia_content(key_terms[0])
-        if wiki_content:
-            contexts.append(f"=== Wikipedia Reference ===\n{wiki_content}")
-            current_app.logger.info(f"Added Wikipedia context for '{key_terms[0]}'")
-    
+    wiki = results["wikipedia"]
+    if wiki:
+        term, wiki_content = wiki
+        contexts.append(f"=== Wikipedia Reference ===\n{wiki_content}")
+        current_app.logger.info(f"Added Wikipedia context for '{term}'")
+
     # 3. Educational context
     if material and material.subject:
         ncert_ref = f"Subject: {material.subject}\nEducational curriculum reference."
         contexts.append(f"=== Educational Context ===\n{ncert_ref}")
-    
+
     final_context = "\n\n".join(contexts) if contexts else ""
-    current_app.logger.info(f"Context: {len(final_context)} chars, valid_material={has_valid_content}")
-    return final_context, has_valid_content
+    dropped = [name for name, t in timings.items() if t.get("status") not in (None, "ok")]
+    current_app.logger.info(
+        f"Context: {len(final_context)} chars, valid_material={has_valid_content}, "
+        f"{timings['total']['ms']}ms" + (f", dropped {', '.join(dropped)}" if dropped else "")
+    )
+    return final_context, has_valid_content, results["history"], timings
 
 def get_chat_history(student_id, material_id=None):
-    """Retrieve chat history"""
-    key = f"{student_id}:{material_id or 'general'}"
-    return chat_histories.get(key, [])
+    """(summary of older turns, recent turns oldest first) for the prompt"""
+    try:
+        return conversation_memory.prompt_parts(student_id, material_id)
+    except Exception as e:
+        current_app.logger.warning(f"⚠️ Chat history unavailable: {str(e)}")
+        return "", []
 
 def save_chat_history(student_id, material_id, question, answer):
     """Save chat interaction"""
-    key = f"{student_id}:{material_id or 'general'}"
-    if key not in chat_histories:
-        chat_histories[key] = []
-    
-    chat_histories[key].append({
-        "question": question,
-        "answer": answer,
-        "timestamp": datetime.utcnow().isoformat()
-    })
-    
-    if len(chat_histories[key]) > 10:
-        chat_histories[key] = chat_histories[key][-10:]
+    try:
+        chat_history.append(student_id, material_id, question, answer)
+        conversation_memory.note_turn(student_id, material_id)
+    except Exception as e:
+        # The answer still goes out; only the history misses this turn
+        current_app.logger.warning(f"⚠️ Chat history not saved: {str(e)}")
+
+@conversation_memory.summarizer
+def summarize_conversation(previous_summary, turns, max_chars):
+    """Fold older turns into the running summary with Gemini (None = use the extractive one)"""
+    if not GEMINI_AVAILABLE or not GEMINI_CONFIGURED:
+        return None
+
+    transcript = "\n\n".join(f"Q: {t['question'][:500]}\nA: {t['answer'][:1500]}" for t in turns)
+    prompt = f"""You keep a running summary of a student's conversation with a study assistant.
+
+=== Summary So Far ===
+{previous_summary or "(nothing yet)"}
+
+=== New Turns ===
+{transcript}
+
+=== Instructions ===
+Rewrite the summary to include the new turns. Keep the topics covered, key facts and definitions
+given, and anything the student found confusing or asked to revisit. Plain text, no greeting,
+under {max_chars} characters.
+
+Updated summary:"""
 
-def generate_answer_with_gemini(question, context, chat_history):
+    response = model.generate_content(prompt)
+    return response.text if response and response.text else None
+
+def generate_answer_with_gemini(question, context, chat_history, summary=""):
     """Generate answer using Gemini"""
     if not GEMINI_AVAILABLE or not GEMINI_CONFIGURED:
         current_app.logger.warning(f"Gemini not available: available={GEMINI_AVAILABLE}, configured={GEMINI_CONFIGURED}")
@@ -189,12 +292,15 @@ def generate_answer_with_gemini(question, context, chat_history):
     try:
         current_app.logger.info("🤖 Calling Gemini API...")
         
+        # Summary (capped) + the last few turns (capped): the same size however long the chat is
         history_text = ""
+        if summary:
+            history_text += f"=== Earlier in This Conversation ===\n{summary}\n\n"
         if chat_history:
-            recent_history = chat_history[-3:]
-            history_text = "=== Recent Conversation ===\n"
-            for item in recent_history:
-                history_text += f"Q: {item['question']}\nA: {item['answer'][:200]}...\n\n"
+            history_text += "=== Recent Conversation ===\n"
+            for item in chat_history:
+                answer = item['answer'] if len(item['answer']) <= 800 else item['answer'][:800] + "..."
+                history_text += f"Q: {item['question'][:300]}\nA: {answer}\n\n"
         
         prompt = f"""You are an intelligent educational assistant helping students learn.
 
@@ -234,8 +340,8 @@ Generate a comprehensive, educational answer:"""
 
 def generate_fallback_answer(question, context, material):
     """Fallback when Gemini unavailable"""
-    if material and material.content and len(material.content) > 100:
-        relevant = extract_relevant_content(material.content, question, max_chars=1500)
+    if material and material.text_length > 100:
+        relevant = relevant_material_text(material, question, max_chars=1500)
         
         if relevant:
             return f"""**From your study material: {material.title}**
@@ -252,7 +358,7 @@ The excerpt above contains relevant information from your material."""
             return f"""**Material Found:** {material.title}
 
 Content preview:
-{material.content[:800]}...
+{material.content_prefix(800)}...
 
 ---
 *For intelligent search and AI-powered explanations, configure Gemini API.*"""
@@ -286,6 +392,8 @@ def ask_question():
     student_id = str(student_id)
 
     try:
+        started = time.perf_counter()
+
         # Find material
         material = None
         if material_id and material_id not in ['all', 'none', None]:
@@ -303,9 +411,13 @@ def ask_question():
             if material:
                 current_app.logger.info(f"📚 Using latest: {material.title}")
 
-        # Build context
-        context, has_valid_content = build_context(material, question, student_id)
-        chat_history = get_chat_history(student_id, material_id)
+        lookup_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        # Build context (material, Wikipedia and chat memory side by side)
+        context, has_valid_content, (summary, recent_turns), timings = build_context(
+            material, question, student_id, material_id
+        )
+        timings["material_lookup"] = {"ms": lookup_ms, "status": "ok"}
         
         current_app.logger.info(f"📊 Context: {len(context)} chars, Valid: {has_valid_content}")
         
@@ -329,7 +441,8 @@ I can provide general information using Wikipedia, but cannot reference your spe
                 "answer": answer,
                 "sources_used": ["Material (extraction failed)"],
                 "gemini_used": False,
-                "content_extraction_failed": True
+                "content_extraction_failed": True,
+                "timings": timings
             })
             return add_cors_headers(response)
         
@@ -337,9 +450,10 @@ I can provide general information using Wikipedia, but cannot reference your spe
         answer = None
         gemini_used = False
         
+        answer_started = time.perf_counter()
         if GEMINI_AVAILABLE and GEMINI_CONFIGURED:
             current_app.logger.info("🤖 Attempting Gemini...")
-            answer = generate_answer_with_gemini(question, context, chat_history)
+            answer = generate_answer_with_gemini(question, context, recent_turns, summary)
             if answer:
                 gemini_used = True
                 current_app.logger.info(f"✅ Gemini success")
@@ -349,6 +463,7 @@ I can provide general information using Wikipedia, but cannot reference your spe
         if not answer:
             current_app.logger.info("📝 Using fallback")
             answer = generate_fallback_answer(question, context, material)
+        timings["answer"] = {"ms": round((time.perf_counter() - answer_started) * 1000, 1), "status": "ok"}
         
         # Save history
         save_chat_history(student_id, material_id, question, answer)
@@ -357,7 +472,7 @@ I can provide general information using Wikipedia, but cannot reference your spe
         sources = []
         if material and has_valid_content:
             sources.append(f"Study Material: {material.title}")
-        if REQUESTS_AVAILABLE:
+        if "=== Wikipedia Reference ===" in context:
             sources.append("Wikipedia")
         if gemini_used:
             sources.append("Gemini AI")
@@ -368,7 +483,8 @@ I can provide general information using Wikipedia, but cannot reference your spe
             "sources_used": sources,
             "gemini_used": gemini_used,
             "material_found": material is not None,
-            "has_valid_content": has_valid_content
+            "has_valid_content": has_valid_content,
+            "timings": dict(timings, request={"ms": round((time.perf_counter() - started) * 1000, 1)})
         }
         
         if material:
@@ -406,7 +522,7 @@ def list_student_materials(student_id):
             "subject": m.subject or "",
             "file_name": m.file_name or "",
             "processing_status": m.processing_status or "completed",
-            "content_len": len(m.content or "")
+            "content_len": m.text_length
         } for m in mats]
         
         response = jsonify(materials)
@@ -424,10 +540,14 @@ def get_history(student_id):
     
     try:
         material_id = request.args.get('material_id', 'general')
-        key = f"{student_id}:{material_id}"
-        history = chat_histories.get(key, [])
-        response = jsonify({"history": history, "count": len(history)})
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        before = request.args.get('before')
+        history, next_cursor = chat_history.page(student_id, material_id, limit=limit, before=before)
+        response = jsonify({"history": history, "count": len(history), "next_cursor": next_cursor})
         return add_cors_headers(response)
+    except ValueError as e:
+        response = jsonify({"history": [], "error": "invalid cursor", "msg": str(e)})
+        return add_cors_headers(response), 400
     except Exception as e:
         current_app.logger.exception("get_history failed")
         response = jsonify({"history": [], "error": str(e)})
@@ -441,16 +561,22 @@ def clear_history(student_id):
     
     try:
         material_id = request.args.get('material_id', 'general')
-        key = f"{student_id}:{material_id}"
-        if key in chat_histories:
-            del chat_histories[key]
-        response = jsonify({"message": "History cleared", "success": True})
+        deleted = chat_history.clear(student_id, material_id)
+        conversation_memory.clear(student_id, material_id)
+        response = jsonify({"message": "History cleared", "success": True, "deleted": deleted})
         return add_cors_headers(response)
     except Exception as e:
         current_app.logger.exception("clear_history failed")
         response = jsonify({"message": "Failed to clear history", "error": str(e)})
         return add_cors_headers(response), 500
 
+@api.route('/debug/wikipedia', methods=['GET'])
+def wikipedia_metrics():
+    """Wikipedia enrichment cache hit ratio and fetch latency for this process"""
+    if not REQUESTS_AVAILABLE:
+        return jsonify({"requests_available": False}), 200
+    return jsonify(wikipedia.metrics()), 200
+
 @api.route('/gemini-status', methods=['GET', 'OPTIONS'])
 def gemini_status():
     """Check Gemini API status"""
@@ -4,20 +4,27 @@ from extensions import db
 from models import CourseMaterial, Quiz, QuizQuestion, QuizAttempt
 from datetime import datetime
 import json
+import random
+import artifact_cache
+import lazy_imports
+import os
 
-# Conditional imports for Gemini
-try:
-    import google.generativeai as genai
-    import os
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
-    if GEMINI_API_KEY and len(GEMINI_API_KEY) > 10:
-        genai.configure(api_key=GEMINI_API_KEY)
-        quiz_model = genai.GenerativeModel('gemini-2.5-flash')
-        GEMINI_AVAILABLE = True
-    else:
-        GEMINI_AVAILABLE = False
-except:
-    GEMINI_AVAILABLE = False
+# Shared question bank sizing (see draw_from_question_bank)
+QUESTION_BANK_MIN_FACTOR = 3
+QUESTION_BANK_MAX_SIZE = 200
+
+# Gemini, imported and configured on the first generated quiz (see lazy_imports)
+genai = lazy_imports.lazy("google.generativeai")
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+GEMINI_AVAILABLE = bool(GEMINI_API_KEY and len(GEMINI_API_KEY) > 10) and lazy_imports.available("google.generativeai")
+
+
+def _quiz_model():
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+
+quiz_model = lazy_imports.LazyObject(_quiz_model)
 
 def add_cors_headers(response):
     """Add CORS headers to response"""
@@ -88,6 +95,33 @@ Return ONLY the JSON array, no other text or markdown formatting."""
     return None
 
 
+def draw_from_question_bank(content_key, num_questions):
+    """
+    Random sample from the shared question bank, or None if the bank is too small.
+    The bank must hold a few times the requested count so repeated quizzes still vary;
+    until then new Gemini questions keep being generated and added to it.
+    """
+    bank = artifact_cache.get_artifact(content_key, "quiz_bank") or []
+    if len(bank) < num_questions * QUESTION_BANK_MIN_FACTOR:
+        return None
+    
+    current_app.logger.info(f"♻️ Drawing {num_questions} questions from shared bank of {len(bank)}")
+    return random.sample(bank, num_questions)
+
+
+def add_to_question_bank(content_key, questions):
+    """Merge newly generated questions into the shared bank (deduplicated by question text)"""
+    bank = list(artifact_cache.get_artifact(content_key, "quiz_bank") or [])
+    seen = {q.get('question') for q in bank}
+    
+    for q in questions:
+        if q.get('question') and q['question'] not in seen and isinstance(q.get('options'), list):
+            bank.append(q)
+            seen.add(q['question'])
+    
+    artifact_cache.put_artifact(content_key, "quiz_bank", bank[-QUESTION_BANK_MAX_SIZE:])
+
+
 def generate_fallback_quiz(material, num_questions):
     """Generate simple fallback quiz when Gemini unavailable"""
     questions = []
@@ -147,7 +181,7 @@ def generate_quiz():
             })
             return add_cors_headers(response), 404
         
-        if not material.content or len(material.content) < 100:
+        if material.text_length < 100:
             response = jsonify({
                 "error": "Material content not ready or too short",
                 "quiz_id": None,
@@ -159,10 +193,16 @@ def generate_quiz():
         questions_data = None
         gemini_used = False
         
-        if GEMINI_AVAILABLE:
-            questions_data = generate_quiz_with_gemini(material.content, num_questions, quiz_type)
+        # Serve from the question bank shared by everyone with the same material text
+        content_key = artifact_cache.material_content_key(material)
+        questions_data = draw_from_question_bank(content_key, num_questions)
+        shared_bank_used = questions_data is not None
+        
+        if not questions_data and GEMINI_AVAILABLE:
+            questions_data = generate_quiz_with_gemini(material.content_prefix(5000), num_questions, quiz_type)
             if questions_data:
                 gemini_used = True
+                add_to_question_bank(content_key, questions_data)
         
         if not questions_data:
             current_app.logger.info("📝 Using fallback quiz generation")
@@ -203,6 +243,7 @@ def generate_quiz():
             "time_per_question": quiz.time_per_question,
             "total_questions": len(quiz_questions),
             "gemini_used": gemini_used,
+            "shared_bank_used": shared_bank_used,
             "questions": [
                 {
                     "id": q.id,
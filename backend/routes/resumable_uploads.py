@@ -0,0 +1,328 @@
+"""
+Resumable upload protocol for large materials.
+
+    POST   /api/uploads                     init, returns upload_id + chunk_size
+    PUT    /api/uploads/<id>?offset=N       one chunk, X-Chunk-Sha256 header required
+    GET    /api/uploads/<id>                progress + missing offsets (to resume)
+    POST   /api/uploads/<id>/finalize       assemble, store blob, queue extraction
+    DELETE /api/uploads/<id>                abort
+
+Chunks are written in place into a preallocated part file, so they can arrive
+in any order and in parallel. Each request body stays at chunk_size, far below
+MAX_CONTENT_LENGTH, which is what lets whole files go past 50 MB. A chunk is
+spooled and checked (length and X-Chunk-Sha256) before it touches the part
+file, so a bad or cut-off resend never overwrites bytes already received.
+"""
+import os
+import math
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import request, jsonify, current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from . import api
+from extensions import db
+from models import UploadSession, UploadSessionChunk, User
+import blob_store
+from .materials import create_material_and_enqueue, upload_extension
+
+STREAM_READ_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # chunks above this spool to disk while being checked
+
+
+def part_path(upload_id):
+    return os.path.join(blob_store.TMP_ROOT, f"{upload_id}.upload")
+
+
+def total_chunks(sess):
+    return max(1, math.ceil(sess.total_size / sess.chunk_size))
+
+
+def upload_progress(sess):
+    received = db.session.query(
+        UploadSessionChunk.chunk_index, UploadSessionChunk.size
+    ).filter_by(upload_id=sess.id).all()
+
+    received_indexes = {idx for idx, _ in received}
+    missing = [i * sess.chunk_size for i in range(total_chunks(sess)) if i not in received_indexes]
+
+    return {
+        "upload_id": sess.id,
+        "status": sess.status,
+        "total_size": sess.total_size,
+        "chunk_size": sess.chunk_size,
+        "total_chunks": total_chunks(sess),
+        "received_chunks": len(received_indexes),
+        "received_bytes": sum(size for _, size in received),
+        "missing_offsets": missing,
+        "material_id": sess.material_id,
+        "expires_at": sess.expires_at.isoformat() if sess.expires_at else None
+    }
+
+
+def purge_expired_uploads():
+    """Drop abandoned sessions and their part files"""
+    expired = UploadSession.query.filter(
+        UploadSession.status == 'open',
+        UploadSession.expires_at < datetime.utcnow()
+    ).limit(100).all()
+
+    for sess in expired:
+        path = part_path(sess.id)
+        if os.path.exists(path):
+            os.remove(path)
+        UploadSessionChunk.query.filter_by(upload_id=sess.id).delete(synchronize_session=False)
+        sess.status = 'aborted'
+
+    if expired:
+        db.session.commit()
+        current_app.logger.info(f"🧹 Purged {len(expired)} expired upload session(s)")
+
+
+def release_claim(upload_id):
+    """Put a session that failed to finalize back to 'open'"""
+    db.session.rollback()
+    UploadSession.query.filter_by(id=upload_id, status='finalizing').update(
+        {"status": 'open'}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def get_open_session(upload_id):
+    sess = UploadSession.query.get(upload_id)
+    if sess is None:
+        return None, (jsonify({"error": "upload not found"}), 404)
+    if sess.status != 'open':
+        return None, (jsonify({"error": f"upload is {sess.status}"}), 409)
+    if sess.expires_at and sess.expires_at < datetime.utcnow():
+        return None, (jsonify({"error": "upload expired"}), 410)
+    return sess, None
+
+
+@api.route('/uploads', methods=['POST'])
+def init_upload():
+    try:
+        data = request.get_json(silent=True) or {}
+        student_id = data.get('student_id')
+        file_name = (data.get('file_name') or '').strip()
+        total_size = data.get('total_size')
+
+        if not student_id or not file_name or not isinstance(total_size, int) or total_size <= 0:
+            return jsonify({"error": "student_id, file_name and a positive integer total_size required"}), 400
+
+        max_size = current_app.config.get("RESUMABLE_MAX_FILE_SIZE")
+        if max_size and total_size > max_size:
+            return jsonify({"error": f"file too large (max {max_size} bytes)"}), 413
+
+        if User.query.get(student_id) is None:
+            return jsonify({"error": "student_id not found"}), 400
+
+        purge_expired_uploads()
+
+        ttl = current_app.config.get("RESUMABLE_SESSION_TTL_HOURS", 24)
+        sess = UploadSession(
+            student_id=str(student_id),
+            title=data.get('title') or file_name,
+            subject=(data.get('subject') or '').strip(),
+            file_name=file_name[:255],
+            file_type=(data.get('file_type') or upload_extension(file_name)).lower(),
+            total_size=total_size,
+            chunk_size=current_app.config.get("RESUMABLE_CHUNK_SIZE", 8 * 1024 * 1024),
+            sha256=(data.get('sha256') or '').lower() or None,
+            status='open',
+            expires_at=datetime.utcnow() + timedelta(hours=ttl)
+        )
+        db.session.add(sess)
+        db.session.flush()
+
+        # Preallocate so chunks can be written at their offsets in any order
+        os.makedirs(blob_store.TMP_ROOT, exist_ok=True)
+        with open(part_path(sess.id), "wb") as wf:
+            wf.truncate(total_size)
+
+        db.session.commit()
+        current_app.logger.info(f"📤 Upload session {sess.id}: {file_name} ({total_size} bytes)")
+
+        return jsonify(upload_progress(sess)), 201
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("DB error in init_upload")
+        return jsonify({"error": "db_error", "msg": str(e)}), 500
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("init_upload failed")
+        return jsonify({"error": "internal_error", "msg": str(e)}), 500
+
+
+@api.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    try:
+        sess, error = get_open_session(upload_id)
+        if error:
+            return error
+
+        offset = request.args.get('offset', type=int)
+        if offset is None or offset < 0 or offset >= sess.total_size or offset % sess.chunk_size:
+            return jsonify({"error": "offset must be a multiple of chunk_size inside the file",
+                            "chunk_size": sess.chunk_size}), 409
+
+        expected_len = min(sess.chunk_size, sess.total_size - offset)
+        if request.content_length != expected_len:
+            return jsonify({"error": f"chunk at offset {offset} must be {expected_len} bytes"}), 400
+
+        checksum = (request.headers.get('X-Chunk-Sha256') or '').lower()
+        if not checksum:
+            return jsonify({"error": "X-Chunk-Sha256 header required"}), 400
+
+        hasher = hashlib.sha256()
+        written = 0
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, dir=blob_store.TMP_ROOT) as spool:
+            while written < expected_len:
+                data = request.stream.read(min(STREAM_READ_SIZE, expected_len - written))
+                if not data:
+                    break
+                hasher.update(data)
+                spool.write(data)
+                written += len(data)
+
+            # Neither written nor recorded, so the client just sends this chunk again
+            if written != expected_len:
+                return jsonify({"error": "incomplete chunk", "received": written}), 400
+
+            if hasher.hexdigest() != checksum:
+                return jsonify({"error": "chunk checksum mismatch", "offset": offset}), 422
+
+            spool.seek(0)
+            with open(part_path(upload_id), "r+b") as wf:
+                wf.seek(offset)
+                shutil.copyfileobj(spool, wf, STREAM_READ_SIZE)
+
+        chunk_index = offset // sess.chunk_size
+        try:
+            db.session.add(UploadSessionChunk(
+                upload_id=upload_id, chunk_index=chunk_index, size=written, sha256=checksum
+            ))
+            db.session.commit()
+        except IntegrityError:
+            # Re-sent chunk (e.g. response lost on the way back): already on disk
+            db.session.rollback()
+            UploadSessionChunk.query.filter_by(upload_id=upload_id, chunk_index=chunk_index).update(
+                {"sha256": checksum, "size": written, "received_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+
+        return jsonify(upload_progress(sess)), 200
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("DB error in put_upload_chunk")
+        return jsonify({"error": "db_error", "msg": str(e)}), 500
+    except Exception as e:
+        current_app.logger.exception("put_upload_chunk failed")
+        return jsonify({"error": "internal_error", "msg": str(e)}), 500
+
+
+@api.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    sess = UploadSession.query.get(upload_id)
+    if sess is None:
+        return jsonify({"error": "upload not found"}), 404
+    return jsonify(upload_progress(sess)), 200
+
+
+@api.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    try:
+        sess, error = get_open_session(upload_id)
+        if error:
+            return error
+
+        progress = upload_progress(sess)
+        if progress["missing_offsets"]:
+            return jsonify({"error": "upload incomplete", **progress}), 409
+
+        # Claim the session so a double-clicked finalize cannot create two materials
+        claimed = UploadSession.query.filter_by(id=upload_id, status='open').update(
+            {"status": 'finalizing'}, synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            return jsonify({"error": "upload is already being finalized"}), 409
+
+        # Whatever fails from here on releases the claim, so finalize can be retried
+        if sess.content_hash and not os.path.exists(part_path(upload_id)) and blob_store.blob_exists(sess.content_hash):
+            # An earlier finalize already moved the part file into the blob store
+            content_hash, file_size = sess.content_hash, sess.total_size
+        else:
+            try:
+                content_hash, file_size, _, created = blob_store.store_file(
+                    part_path(upload_id), expected_sha256=sess.sha256
+                )
+                UploadSession.query.filter_by(id=upload_id).update(
+                    {"content_hash": content_hash}, synchronize_session=False
+                )
+                db.session.commit()
+            except ValueError as e:
+                release_claim(upload_id)
+                return jsonify({"error": "file checksum mismatch", "msg": str(e)}), 422
+            except Exception:
+                release_claim(upload_id)
+                raise
+
+            current_app.logger.info(
+                f"📁 {'Saved' if created else 'Deduplicated'} blob {content_hash[:12]} ({file_size} bytes) from upload {upload_id}"
+            )
+
+        try:
+            mat, job = create_material_and_enqueue(
+                sess.student_id, sess.title, sess.subject, sess.file_name,
+                sess.file_type, content_hash, file_size
+            )
+        except Exception:
+            release_claim(upload_id)
+            raise
+
+        sess = UploadSession.query.get(upload_id)
+        sess.status = 'finalized'
+        sess.material_id = mat.id
+        UploadSessionChunk.query.filter_by(upload_id=upload_id).delete(synchronize_session=False)
+        db.session.commit()
+
+        return jsonify({
+            "id": mat.id,
+            "job_id": job.id,
+            "upload_id": upload_id,
+            "status": mat.processing_status,
+            "subject": mat.subject,
+            "status_url": f"/api/material-status/{mat.id}",
+            "message": "Upload assembled, extraction queued"
+        }), 202
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("DB error in finalize_upload")
+        return jsonify({"error": "db_error", "msg": str(e)}), 500
+    except Exception as e:
+        current_app.logger.exception("finalize_upload failed")
+        return jsonify({"error": "internal_error", "msg": str(e)}), 500
+
+
+@api.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    sess, error = get_open_session(upload_id)
+    if error:
+        return error
+
+    path = part_path(upload_id)
+    if os.path.exists(path):
+        os.remove(path)
+    UploadSessionChunk.query.filter_by(upload_id=upload_id).delete(synchronize_session=False)
+    sess.status = 'aborted'
+    db.session.commit()
+
+    return jsonify({"message": "Upload aborted", "upload_id": upload_id}), 200
@@ -1,21 +1,27 @@
 from flask import request, jsonify, Blueprint, current_app
 from models import (
     CourseMaterial,
+    MaterialChunk,
     MaterialSummary,
     QuestionPaper,
     QuestionPattern
 )
 from extensions import db
-import google.generativeai as genai
+import artifact_cache
+import content_codec
+import lazy_imports
 import os
 import json
 from functools import wraps
 import time
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from deep_translator import GoogleTranslator
-from PIL import Image
 import io
 
+# Imported on first use (see lazy_imports): startup doesn't pay for them
+genai = lazy_imports.lazy("google.generativeai")
+deep_translator = lazy_imports.lazy("deep_translator")
+Image = lazy_imports.lazy("PIL.Image")
+
 # Create blueprint
 summary_bp = Blueprint('summary', __name__)
 
@@ -139,7 +145,7 @@ def smart_translate_text(text, target_language='en', source_language='auto'):
         
         # For short text, translate directly
         if len(text) <= 4500:
-            translator = GoogleTranslator(source=source_language, target=target_language)
+            translator = deep_translator.GoogleTranslator(source=source_language, target=target_language)
             return translator.translate(text)
         
         # For long text, split intelligently by paragraphs
@@ -150,7 +156,7 @@ def smart_translate_text(text, target_language='en', source_language='auto'):
         for para in paragraphs:
             # If adding this paragraph exceeds chunk size, translate current chunk
             if len(current_chunk) + len(para) > 4500 and current_chunk:
-                translator = GoogleTranslator(source=source_language, target=target_language)
+                translator = deep_translator.GoogleTranslator(source=source_language, target=target_language)
                 translated_paragraphs.append(translator.translate(current_chunk))
                 current_chunk = para
                 time.sleep(0.1)  # Rate limiting
@@ -159,7 +165,7 @@ def smart_translate_text(text, target_language='en', source_language='auto'):
         
         # Translate remaining chunk
         if current_chunk:
-            translator = GoogleTranslator(source=source_language, target=target_language)
+            translator = deep_translator.GoogleTranslator(source=source_language, target=target_language)
             translated_paragraphs.append(translator.translate(current_chunk))
         
         return '\n\n'.join(translated_paragraphs)
@@ -292,13 +298,28 @@ def get_materials():
     current_user_id = get_jwt_identity()
     materials = CourseMaterial.query.filter_by(student_id=current_user_id).all()
     
+    # Previews come from each material's first chunk, fetched in one query
+    first_chunks = {
+        material_id: content_codec.chunk_text(text, codec, text_z)
+        for material_id, text, codec, text_z in db.session.query(
+            MaterialChunk.material_id, MaterialChunk.text, MaterialChunk.codec, MaterialChunk.text_z
+        ).filter(
+            MaterialChunk.material_id.in_([m.id for m in materials]),
+            MaterialChunk.ordinal == 0
+        ).all()
+    } if materials else {}
+    
+    def preview(m):
+        head = first_chunks[m.id][:200] if m.id in first_chunks else m.content_prefix(200)
+        return head + "..." if m.text_length > 200 else head
+    
     return jsonify({
         "materials": [{
             "id": m.id,
             "title": m.title,
             "subject": m.subject,
-            "content_length": len(m.content) if m.content else 0,
-            "content": m.content[:200] + "..." if m.content and len(m.content) > 200 else (m.content or ""),
+            "content_length": m.text_length,
+            "content": preview(m),
             "processing_status": getattr(m, 'processing_status', 'completed'),
             "created_at": m.created_at.isoformat() if hasattr(m, 'created_at') and m.created_at else None
         } for m in materials]
@@ -341,7 +362,7 @@ def generate_summary():
     if not material:
         return jsonify({"error": "Material not found"}), 404
     
-    if not material.content or len(material.content) < 50:
+    if material.text_length < 50:
         return jsonify({"error": "Material has insufficient content"}), 400
     
     # Check for existing summary
@@ -360,14 +381,34 @@ def generate_summary():
             "message": "Using cached summary"
         })
     
-    # Generate summary
-    content = sanitize_text(material.content, 8000)
+    # Another student may already have paid for a summary of the same text
+    content_key = artifact_cache.material_content_key(material)
+    shared_text = artifact_cache.get_artifact(content_key, "summary", target_language)
+    
+    if shared_text:
+        summary = MaterialSummary(
+            material_id=material_id,
+            student_id=current_user_id,
+            summary_type=f"easy_{target_language}",
+            summary_text=shared_text
+        )
+        db.session.add(summary)
+        db.session.commit()
+        
+        return jsonify({
+            "summary": shared_text,
+            "summary_id": summary.id,
+            "language": target_language,
+            "language_name": SUPPORTED_LANGUAGES[target_language],
+            "message": "Using shared summary"
+        })
+    
+    # Generate summary; the prompt holds only the text, since the result is
+    # shared with every material that has the same text (title/subject differ)
+    content = sanitize_text(material.content_prefix(8000), 8000)
     
     prompt = f"""Create a clear, student-friendly summary of this study material.
 
-Title: {material.title}
-Subject: {material.subject}
-
 Guidelines:
 1. Use simple, easy-to-understand language
 2. Focus on key concepts and main ideas
@@ -410,6 +451,8 @@ Summary:"""
     db.session.add(summary)
     db.session.commit()
     
+    artifact_cache.put_artifact(content_key, "summary", summary_text, target_language)
+    
     return jsonify({
         "summary": summary_text,
         "summary_id": summary.id,
@@ -572,10 +615,10 @@ def generate_smart_questions():
     if not material:
         return jsonify({"error": "Material not found"}), 404
     
-    if not material.content or len(material.content) < 50:
+    if material.text_length < 50:
         return jsonify({"error": "Material has insufficient content"}), 400
     
-    content = sanitize_text(material.content, MAX_CONTENT_LENGTH)
+    content = sanitize_text(material.content_prefix(MAX_CONTENT_LENGTH), MAX_CONTENT_LENGTH)
     
     # Validate config
     if isinstance(config, str):
@@ -661,10 +704,10 @@ def generate_from_pattern():
     if not material:
         return jsonify({"error": "Material not found"}), 404
     
-    if not material.content or len(material.content) < 50:
+    if material.text_length < 50:
         return jsonify({"error": "Material has insufficient content"}), 400
     
-    content = sanitize_text(material.content, MAX_CONTENT_LENGTH)
+    content = sanitize_text(material.content_prefix(MAX_CONTENT_LENGTH), MAX_CONTENT_LENGTH)
     
     prompt = f"""Generate a question paper matching this detected pattern.
 
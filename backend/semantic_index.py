@@ -0,0 +1,572 @@
+# semantic_index.py
+"""
+Per-student vector index of material passages for QA retrieval.
+
+Each passage (the same page-aligned passages passage_index scores with BM25)
+is embedded into a unit-length float32 vector. A student's vectors live in a
+few write-once segments, uploads/indexes/semantic/<aa>/<student_id>/
+vectors-<segment>.npy, which are memory-mapped rather than read. A question
+is embedded the same way and scored against the rows of the material it is
+about with one matrix product per block of rows (cosine = dot product of
+unit vectors); top-k is an argpartition over the scores.
+
+Embedders, all local and CPU-only:
+    "hashed"                signed feature hashing of stemmed words and their
+                            character 4-grams ("photosynthetic" and
+                            "photosynthesis" share most features). No model,
+                            no download, ~10k passages/s.
+    <sentence-transformers> a local sentence-transformers model directory
+                            (optional dependency), for questions that share
+                            no words at all with the passage.
+
+manifest.json lists the segments and which rows belong to which material.
+An update writes only the material's rows, as a new segment, and then swaps
+the manifest, so readers holding the previous segments are not disturbed;
+the replaced rows just stop counting. Small newer segments are merged
+together as they pile up (each row is rewritten O(log n) times, not once per
+update), and everything is rewritten once dead rows outnumber live ones. A
+material's unchanged passages keep their vectors. Updates hold an flock on
+the student's directory, so worker processes don't overwrite each other.
+
+Nothing in here touches Flask.
+"""
+import os
+import json
+import math
+import bisect
+import time
+import zlib
+import uuid
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+import lazy_imports
+from chunking import split_into_chunks
+import passage_index
+
+np = lazy_imports.lazy("numpy")
+NUMPY_AVAILABLE = lazy_imports.available("numpy")
+sentence_transformers = lazy_imports.lazy("sentence_transformers")
+
+SEMANTIC_ROOT = os.path.join(passage_index.INDEX_ROOT, "semantic")
+INDEX_VERSION = 2
+LOCK_FILE = ".lock"
+
+HASH_DIM = 384
+NGRAM = 4
+NGRAM_WEIGHT = 0.25   # all of a word's n-grams together weigh this much against the word itself
+EMBED_BATCH = 1024    # passages hashed per bincount
+SEARCH_BLOCK = 32768  # rows per matrix product, bounds the scores buffer
+RRF_K = 60            # reciprocal rank fusion constant
+MIN_SIMILARITY = 0.05 # below this a hit is hash collisions, not shared vocabulary
+COMPACT_MIN_DEAD_ROWS = 4096  # fewer dead rows than this are not worth a full rewrite
+
+_locks = {}
+_locks_guard = threading.Lock()
+_cache_lock = threading.Lock()
+_loaded = OrderedDict()  # student_id -> (manifest mtime, StudentVectors)
+_embedders = {}
+
+
+# Embedders
+
+def _signed_hash(feature):
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % HASH_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+
+@lru_cache(maxsize=200000)
+def token_features(token):
+    """(indices, weights) a stemmed token adds to a vector"""
+    grams = [f"<{token}>"[i:i + NGRAM] for i in range(len(token) + 3 - NGRAM)] if len(token) >= NGRAM else []
+    feats = [(_signed_hash(f"w:{token}"), 1.0)]
+    feats += [(_signed_hash(f"g:{g}"), NGRAM_WEIGHT / len(grams)) for g in grams]
+    return [i for (i, _), _ in feats], [s * w for (_, s), w in feats]
+
+
+class HashedEmbedder:
+    name = "hashed-v1"
+    dim = HASH_DIM
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for first in range(0, len(texts), EMBED_BATCH):
+            batch = texts[first:first + EMBED_BATCH]
+            vocab, rows, token_ids, token_weights = {}, [], [], []
+            for row, text in enumerate(batch):
+                for token, tf in Counter(passage_index.tokenize(text)).items():
+                    rows.append(row)
+                    token_ids.append(vocab.setdefault(token, len(vocab)))
+                    token_weights.append(1 + math.log(tf))  # sublinear, a repeated word is not n times as relevant
+            if not rows:
+                continue
+
+            # Expand (passage, token) pairs into (passage, feature) pairs with array ops
+            feats = [token_features(t) for t in vocab]
+            lengths = np.asarray([len(f[0]) for f in feats], dtype=np.int64)
+            feat_idx = np.asarray([i for f in feats for i in f[0]], dtype=np.int64)
+            feat_w = np.asarray([w for f in feats for w in f[1]], dtype=np.float64)
+            offsets = np.cumsum(lengths) - lengths
+
+            token_ids = np.asarray(token_ids, dtype=np.int64)
+            n = lengths[token_ids]
+            within = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+            pos = np.repeat(offsets[token_ids], n) + within
+            flat = np.repeat(np.asarray(rows, dtype=np.int64), n) * self.dim + feat_idx[pos]
+            weights = np.repeat(np.asarray(token_weights), n) * feat_w[pos]
+            counts = np.bincount(flat, weights=weights, minlength=len(batch) * self.dim)
+            out[first:first + len(batch)] = counts.reshape(len(batch), self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceEmbedder:
+    def __init__(self, model_path):
+        self.model = sentence_transformers.SentenceTransformer(model_path, device="cpu")
+        self.name = f"st:{os.path.basename(os.path.normpath(model_path))}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def get_embedder(name="hashed"):
+    """The embedder for a configured name, created once per process"""
+    name = name or "hashed"
+    with _locks_guard:
+        if name not in _embedders:
+            _embedders[name] = HashedEmbedder() if name == "hashed" else SentenceEmbedder(name)
+        return _embedders[name]
+
+
+def embedder_available(name="hashed"):
+    if not NUMPY_AVAILABLE:
+        return False
+    return not name or name == "hashed" or lazy_imports.available("sentence_transformers")
+
+
+# Storage
+
+def student_dir(student_id):
+    shard = hashlib.sha1(str(student_id).encode("utf-8")).hexdigest()[:2]
+    return os.path.join(SEMANTIC_ROOT, shard, str(student_id))
+
+
+def _student_lock(student_id):
+    with _locks_guard:
+        return _locks.setdefault(str(student_id), threading.Lock())
+
+
+@contextmanager
+def _locked(student_id):
+    """
+    Exclusive hold on a student's index for a read-modify-write: a thread
+    lock within this process, and an flock on the directory's lock file
+    against other processes (extraction workers, index_materials.py).
+    """
+    directory = student_dir(student_id)
+    with _student_lock(student_id):
+        if fcntl is None:
+            yield directory
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class Segment:
+    """One write-once file pair: vectors (memory-mapped) + row metadata"""
+
+    def __init__(self, vectors, starts, ends, pages, hashes):
+        self.vectors = vectors
+        self.starts = starts
+        self.ends = ends
+        self.pages = pages
+        self.hashes = hashes
+
+    @classmethod
+    def load(cls, directory, segment_id):
+        vectors = np.load(os.path.join(directory, f"vectors-{segment_id}.npy"), mmap_mode="r")
+        with np.load(os.path.join(directory, f"rows-{segment_id}.npz"), allow_pickle=False) as rows:
+            return cls(vectors, rows["starts"], rows["ends"], rows["pages"], rows["hashes"])
+
+    @staticmethod
+    def write(directory, parts, dim):
+        """
+        Save parts, [(material_id, content_key, vectors, starts, ends, pages,
+        hashes)], as a new segment. Returns (segment_id, rows, {material_id:
+        manifest entry}).
+        """
+        segment_id = uuid.uuid4().hex[:12]
+        os.makedirs(directory, exist_ok=True)
+        total = sum(len(p[3]) for p in parts)
+
+        vectors = np.lib.format.open_memmap(
+            os.path.join(directory, f"vectors-{segment_id}.npy"), mode="w+", dtype=np.float32, shape=(total, dim)
+        )
+        offset = 0
+        placed = {}
+        for material_id, key, vecs, starts, *_ in parts:
+            for s in range(0, len(starts), SEARCH_BLOCK):  # copied a block at a time from the old mmap
+                vectors[offset + s:offset + min(s + SEARCH_BLOCK, len(starts))] = vecs[s:s + SEARCH_BLOCK]
+            placed[material_id] = {"content_key": key, "segment": segment_id,
+                                   "start": offset, "stop": offset + len(starts)}
+            offset += len(starts)
+        vectors.flush()
+        del vectors
+
+        cat = (lambda i, dtype: np.concatenate([p[i] for p in parts]).astype(dtype) if parts else np.zeros(0, dtype))
+        with open(os.path.join(directory, f"rows-{segment_id}.npz"), "wb") as f:
+            np.savez(f, starts=cat(3, np.int64), ends=cat(4, np.int64), pages=cat(5, np.int32), hashes=cat(6, np.uint64))
+        return segment_id, total, placed
+
+
+class StudentVectors:
+    """A student's current segments (oldest first) + which rows belong to which material"""
+
+    def __init__(self, directory, manifest, segments):
+        self.directory = directory
+        self.manifest = manifest
+        self.segments = segments
+
+    @property
+    def materials(self):
+        return self.manifest["materials"]
+
+    @property
+    def rows(self):
+        """Live rows; rows of replaced or removed materials stay in their segment until it is merged"""
+        return sum(m["stop"] - m["start"] for m in self.materials.values())
+
+    @property
+    def dead_rows(self):
+        return sum(self.manifest["segments"].values()) - self.rows
+
+    @classmethod
+    def empty(cls, directory, embedder):
+        manifest = {"version": INDEX_VERSION, "embedder": embedder.name, "dim": embedder.dim,
+                    "segments": {}, "materials": {}}
+        return cls(directory, manifest, {})
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == 1 and manifest.get("generation"):
+            # The one-matrix layout before segments: the same files, read as a single segment
+            gen = manifest.pop("generation")
+            segment = Segment.load(directory, gen)
+            manifest.update(version=INDEX_VERSION, segments={gen: len(segment.starts)},
+                            materials={m: dict(info, segment=gen) for m, info in manifest["materials"].items()})
+            return cls(directory, manifest, {gen: segment})
+        if manifest.get("version") != INDEX_VERSION:
+            return None
+        return cls(directory, manifest, {seg: Segment.load(directory, seg) for seg in manifest["segments"]})
+
+    def material_part(self, material_id):
+        info = self.materials[material_id]
+        seg = self.segments[info["segment"]]
+        rows = slice(info["start"], info["stop"])
+        return (material_id, info["content_key"], seg.vectors[rows],
+                seg.starts[rows], seg.ends[rows], seg.pages[rows], seg.hashes[rows])
+
+    def spans(self, material_ids=None):
+        """[(segment_id, start, stop, [(start, stop, material_id)])]: contiguous live rows per segment"""
+        position = {seg: i for i, seg in enumerate(self.manifest["segments"])}
+        owners = sorted(
+            (position[m["segment"]], m["start"], m["stop"], mid, m["segment"])
+            for mid, m in self.materials.items()
+            if (material_ids is None or mid in material_ids) and m["stop"] > m["start"]
+        )
+        spans = []
+        for _, start, stop, mid, seg in owners:
+            if spans and spans[-1][0] == seg and spans[-1][2] == start:
+                spans[-1][2] = stop
+                spans[-1][3].append((start, stop, mid))
+            else:
+                spans.append([seg, start, stop, [(start, stop, mid)]])
+        return [tuple(span) for span in spans]
+
+    def append(self, parts, drop=()):
+        """
+        Add parts as a new segment, replacing those materials and dropping the
+        ones in drop, then merge segments as needed. Returns the new current
+        state. Only the new rows are written, not the whole matrix.
+        """
+        materials = {m: info for m, info in self.materials.items() if m not in drop}
+        segments = dict(self.manifest["segments"])
+        if parts:
+            segment_id, total, placed = Segment.write(self.directory, parts, self.manifest["dim"])
+            materials.update(placed)
+            segments[segment_id] = total
+        current = self._commit(materials, segments)
+        return current._merge()
+
+    def _live_rows(self):
+        live = dict.fromkeys(self.manifest["segments"], 0)
+        for m in self.materials.values():
+            live[m["segment"]] += m["stop"] - m["start"]
+        return live
+
+    def _merge(self):
+        """
+        Keep the segment count logarithmic: merge the newest segments while
+        together they hold at least as many live rows as the one before them
+        (so each row is rewritten O(log n) times), and rewrite everything once
+        dead rows outnumber live ones.
+        """
+        order = list(self.manifest["segments"])
+        live = self._live_rows()
+        if self.dead_rows > max(COMPACT_MIN_DEAD_ROWS, self.rows):
+            tail = order
+        else:
+            i = len(order) - 1
+            total = live[order[i]] if order else 0
+            while i > 0 and total >= live[order[i - 1]]:
+                i -= 1
+                total += live[order[i]]
+            tail = order[i:] if len(order) - i > 1 else []
+        if not tail:
+            return self
+
+        position = {seg: i for i, seg in enumerate(order)}
+        moved = sorted((m for m, info in self.materials.items() if info["segment"] in tail),
+                       key=lambda m: (position[self.materials[m]["segment"]], self.materials[m]["start"]))
+        segment_id, total, placed = Segment.write(
+            self.directory, [self.material_part(m) for m in moved], self.manifest["dim"]
+        )
+        materials = {m: info for m, info in self.materials.items() if m not in placed}
+        materials.update(placed)
+        segments = {s: n for s, n in self.manifest["segments"].items() if s not in tail}
+        segments[segment_id] = total
+        return self._commit(materials, segments)
+
+    def _commit(self, materials, segments):
+        """Swap in a new manifest, then delete segment files it doesn't list (caller holds _locked)"""
+        used = {m["segment"] for m in materials.values()}
+        segments = {s: n for s, n in segments.items() if s in used}
+        manifest = dict(self.manifest, segments=segments, materials=materials)
+        tmp = os.path.join(self.directory, f"manifest.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.directory, "manifest.json"))
+
+        # Anything unlisted is unused: merged away, left by a crashed write or by
+        # an older index version. Open mmaps keep working after the unlink.
+        for name in os.listdir(self.directory):
+            stem, ext = os.path.splitext(name)
+            kind, _, segment_id = stem.partition("-")
+            if (kind, ext) in (("vectors", ".npy"), ("rows", ".npz")) and segment_id not in segments:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        return StudentVectors.load(self.directory)
+
+
+def load_student(student_id, cache_size=64):
+    """A student's current vectors (LRU per process, reloaded when the manifest changes), or None"""
+    if not NUMPY_AVAILABLE:
+        return None
+    directory = student_dir(student_id)
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, "manifest.json"))
+    except OSError:
+        return None
+
+    with _cache_lock:
+        entry = _loaded.get(student_id)
+        if entry and entry[0] == mtime:
+            _loaded.move_to_end(student_id)
+            return entry[1]
+
+    try:
+        loaded = StudentVectors.load(directory)
+    except Exception:
+        return None
+    if loaded is None:
+        return None
+    with _cache_lock:
+        _loaded[student_id] = (mtime, loaded)
+        _loaded.move_to_end(student_id)
+        while len(_loaded) > cache_size:
+            _loaded.popitem(last=False)
+    return loaded
+
+
+def _current_for_update(directory, embedder):
+    """Fresh (uncached) current state, or an empty one when missing or made by another embedder"""
+    try:
+        current = StudentVectors.load(directory)
+    except (OSError, ValueError):
+        current = None
+    if current is None or current.manifest.get("embedder") != embedder.name:
+        # Vectors of different embedders can't be compared: start over, the
+        # other materials come back through index_materials.py
+        empty = StudentVectors.empty(directory, embedder)
+        if current is not None:
+            empty.manifest["segments"] = dict(current.manifest.get("segments") or {})
+        return empty
+    return current
+
+
+def update_material(student_id, material_id, text, embedder="hashed"):
+    """
+    Embed a material's passages into its student's index, reusing vectors
+    of passages it already had. Returns a summary for extraction_stats.
+    """
+    started = time.time()
+    embedder = get_embedder(embedder)
+    student_id, material_id = str(student_id), str(material_id)
+    key = passage_index.content_key(text)
+
+    with _locked(student_id) as directory:
+        current = _current_for_update(directory, embedder)
+        info = current.materials.get(material_id)
+        if info and info["content_key"] == key:
+            n = info["stop"] - info["start"]
+            return {"content_key": key, "passages": n, "reused_passages": n, "embedder": embedder.name,
+                    "dim": embedder.dim, "build_ms": round((time.time() - started) * 1000, 2)}
+
+        passages = split_into_chunks(text or "", passage_index.PASSAGE_TARGET_CHARS, passage_index.PASSAGE_MAX_CHARS)
+        hashes = [passage_index.passage_hash(p["text"]) for p in passages]
+        vectors = np.zeros((len(passages), embedder.dim), dtype=np.float32)
+
+        old_rows = {}
+        if info:
+            _, _, old_vectors, _, _, _, old_hashes = current.material_part(material_id)
+            for row, h in enumerate(old_hashes.tolist()):
+                old_rows.setdefault(h, row)
+        fresh = []
+        for i, h in enumerate(hashes):
+            row = old_rows.get(h)
+            if row is None:
+                fresh.append(i)
+            else:
+                vectors[i] = old_vectors[row]
+        if fresh:
+            vectors[fresh] = embedder.embed([passages[i]["text"] for i in fresh])
+
+        current.append([(
+            material_id, key, vectors,
+            np.asarray([p["char_start"] for p in passages], dtype=np.int64),
+            np.asarray([p["char_end"] for p in passages], dtype=np.int64),
+            np.asarray([p["page_number"] or 0 for p in passages], dtype=np.int32),
+            np.asarray(hashes, dtype=np.uint64),
+        )])
+
+    return {"content_key": key, "passages": len(passages), "reused_passages": len(passages) - len(fresh),
+            "embedder": embedder.name, "dim": embedder.dim, "build_ms": round((time.time() - started) * 1000, 2)}
+
+
+def remove_material(student_id, material_id):
+    student_id, material_id = str(student_id), str(material_id)
+    if not os.path.isdir(student_dir(student_id)):
+        return
+    with _locked(student_id) as directory:
+        try:
+            current = StudentVectors.load(directory)
+        except (OSError, ValueError):
+            return
+        if current is None or material_id not in current.materials:
+            return
+        current.append([], drop={material_id})
+
+
+# Search
+
+def search(student_id, queries, k=10, material_id=None, expected_key=None, embedder="hashed"):
+    """
+    Cosine top-k for a batch of queries: [[(score, material_id, (start, end,
+    page or None))] per query], best first. Restricted to one material when
+    material_id is given. None when there is no usable index (missing, built
+    by another embedder, or for other content than expected_key).
+    """
+    index = load_student(str(student_id))
+    if index is None:
+        return None
+    embedder = get_embedder(embedder)
+    if index.manifest.get("embedder") != embedder.name:
+        return None
+
+    material_ids = None
+    if material_id is not None:
+        info = index.materials.get(str(material_id))
+        if info is None or (expected_key is not None and info["content_key"] != expected_key):
+            return None
+        material_ids = {str(material_id)}
+
+    # Live rows as spans of segments, numbered one after another
+    spans = index.spans(material_ids)
+    firsts, first = [], 0
+    for _, start, stop, _ in spans:
+        firsts.append(first)
+        first += stop - start
+    if not first:
+        return [[] for _ in queries]
+    q = embedder.embed(list(queries))  # (queries, dim)
+    k = min(k, first)
+
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for (segment_id, lo, hi, _), base in zip(spans, firsts):
+        vectors = index.segments[segment_id].vectors
+        for start in range(lo, hi, SEARCH_BLOCK):
+            stop = min(start + SEARCH_BLOCK, hi)
+            scores = q @ np.asarray(vectors[start:stop]).T  # (queries, rows)
+            if scores.shape[1] > k:
+                part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, part, axis=1)
+            else:
+                part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, part + base + start - lo], axis=1)
+        if best_scores.shape[1] > 4 * k:  # many small spans: keep the candidate arrays small
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+    results = []
+    for scores, rows in zip(best_scores, best_rows):
+        order = np.argsort(-scores)[:k]
+        hits = []
+        for i in order:
+            if scores[i] < MIN_SIMILARITY:
+                break
+            n = int(rows[i])
+            span = bisect.bisect_right(firsts, n) - 1
+            segment_id, lo, _, owners = spans[span]
+            row = lo + n - firsts[span]
+            owner = next(mid for a, b, mid in owners if a <= row < b)
+            seg = index.segments[segment_id]
+            hits.append((float(scores[i]), owner,
+                         (int(seg.starts[row]), int(seg.ends[row]), int(seg.pages[row]) or None)))
+        results.append(hits)
+    return results
+
+
+def fuse_rankings(*rankings, k=RRF_K):
+    """
+    Reciprocal rank fusion of ranked lists of [(score, item)]: scores on
+    different scales (BM25, cosine) are combined by rank only.
+    [(fused_score, item)] best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, (_, item) in enumerate(ranking or []):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(((score, item) for item, score in fused.items()), key=lambda x: -x[0])
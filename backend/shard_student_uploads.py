@@ -0,0 +1,64 @@
+# shard_student_uploads.py
+"""
+Move per-student upload directories from the flat uploads/<student_id>/
+layout into uploads/students/<aa>/<bb>/<student_id>/ (see
+blob_store.student_dir). Only directories named after a known user id are
+moved; everything else under uploads/ (blobs, indexes, caches, ...) is left
+where it is. Safe to re-run; files already in place are left alone and a
+name clash is reported rather than overwritten.
+
+    python shard_student_uploads.py [--dry-run]
+"""
+import os
+import argparse
+
+from app import create_app
+from extensions import db
+from models import User
+import blob_store
+
+
+def legacy_student_dirs(student_ids, upload_root=blob_store.UPLOAD_ROOT):
+    with os.scandir(upload_root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and entry.name in student_ids:
+                yield entry.name, entry.path
+
+
+def shard_student_uploads(dry_run=False):
+    student_ids = {row[0] for row in db.session.query(User.id).all()}
+    moved = clashes = students = 0
+    for student_id, legacy_dir in list(legacy_student_dirs(student_ids)):
+        target_dir = blob_store.student_dir(student_id)
+        students += 1
+        if not dry_run:
+            os.makedirs(target_dir, exist_ok=True)
+
+        for name in os.listdir(legacy_dir):
+            src = os.path.join(legacy_dir, name)
+            dst = os.path.join(target_dir, name)
+            if os.path.exists(dst):
+                clashes += 1
+                print(f"⚠️ {student_id}/{name} already exists in {target_dir}, left in place")
+                continue
+            if not dry_run:
+                os.replace(src, dst)  # same filesystem: a rename, no copy
+            moved += 1
+
+        if not dry_run and not os.listdir(legacy_dir):
+            os.rmdir(legacy_dir)
+        print(f"{'🔎' if dry_run else '✅'} {student_id}: {legacy_dir} -> {target_dir}")
+
+    return students, moved, clashes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would move")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        students, moved, clashes = shard_student_uploads(dry_run=args.dry_run)
+    print(f"{'Would move' if args.dry_run else 'Moved'} {moved} file(s) for {students} student(s)"
+          + (f", {clashes} clash(es) left in place" if clashes else ""))
@@ -0,0 +1,195 @@
+# subject_classifier.py
+"""
+Local subject classifier: multinomial naive Bayes over hashed word unigrams
+and bigrams, trained from the subjects already stored on CourseMaterial rows.
+
+Scoring one upload is a handful of NumPy ops over a (classes x features)
+log-probability matrix, so it runs in well under a millisecond; Gemini is
+only asked when the classifier is not confident enough (see detect_subject).
+
+Raw naive Bayes posteriors over a whole document are almost always above
+0.99, so confidence is the posterior of the log scores divided by the square
+root of the document's feature mass: same argmax, but spread out enough to
+threshold. train_subject_classifier.py picks that threshold on a held-out
+split (the lowest one that keeps a target accuracy) and saves it with the
+model; min_confidence() returns it.
+
+The model lives in uploads/models/subject_classifier.npz and is reloaded
+when that file changes, so `python train_subject_classifier.py` takes
+effect without a restart.
+"""
+import os
+import re
+import time
+import zlib
+import threading
+
+import lazy_imports
+
+np = lazy_imports.lazy("numpy")
+NUMPY_AVAILABLE = lazy_imports.available("numpy")
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "uploads", "models", "subject_classifier.npz")
+MODEL_VERSION = 2
+
+N_FEATURES = 2 ** 16
+ALPHA = 0.1           # additive smoothing
+SAMPLE_CHARS = 3000   # same text sample detect_subject uses
+TITLE_WEIGHT = 3      # title words count as this many body occurrences
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9+#]{1,}")
+STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has him his how its may new now "
+    "see two way who did get let say she too use that with have this will your from they been were "
+    "what when which their there than then them these would about into more some could other only "
+    "also each such page slide".split()
+)
+
+_lock = threading.Lock()
+_model = None
+_model_mtime = None
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def _hash(feature):
+    return zlib.crc32(feature.encode("utf-8")) % N_FEATURES
+
+
+def featurize(title, text):
+    """(feature indices, counts) for one document; counts are sublinear (log1p)"""
+    indices = []
+    for weight, tokens in ((TITLE_WEIGHT, tokenize(title)), (1, tokenize((text or "")[:SAMPLE_CHARS]))):
+        hashed = [_hash(t) for t in tokens]
+        hashed += [_hash(f"{a} {b}") for a, b in zip(tokens, tokens[1:])]
+        indices.extend(hashed * weight)
+
+    if not indices:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    idx, counts = np.unique(np.asarray(indices, dtype=np.int64), return_counts=True)
+    # log1p damps repeated terms so long documents don't saturate the posterior
+    return idx, np.log1p(counts).astype(np.float32)
+
+
+class SubjectClassifier:
+    def __init__(self, labels, log_prior, log_prob, min_confidence=None):
+        self.labels = list(labels)
+        self.log_prior = log_prior    # (classes,)
+        self.log_prob = log_prob      # (classes, N_FEATURES)
+        self.min_confidence = min_confidence  # calibrated on held-out data, if it was
+
+    @classmethod
+    def fit(cls, documents, labels):
+        """documents: [(title, text)], labels: [subject]"""
+        classes = sorted(set(labels))
+        class_index = {c: i for i, c in enumerate(classes)}
+
+        feature_counts = np.zeros((len(classes), N_FEATURES), dtype=np.float64)
+        doc_counts = np.zeros(len(classes), dtype=np.float64)
+
+        for (title, text), label in zip(documents, labels):
+            row = class_index[label]
+            idx, counts = featurize(title, text)
+            feature_counts[row, idx] += counts
+            doc_counts[row] += 1
+
+        smoothed = feature_counts + ALPHA
+        log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        log_prior = np.log(doc_counts / doc_counts.sum())
+
+        return cls(classes, log_prior.astype(np.float32), log_prob.astype(np.float32))
+
+    def predict_proba(self, title, text):
+        """Length-normalized class probabilities (see the module docstring)"""
+        idx, counts = featurize(title, text)
+        scores = self.log_prior + self.log_prob[:, idx] @ counts
+        scores = scores / np.sqrt(max(float(counts.sum()), 1.0))
+        scores = scores - scores.max()
+        probs = np.exp(scores)
+        return probs / probs.sum()
+
+    def predict(self, title, text):
+        """(label, confidence)"""
+        probs = self.predict_proba(title, text)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def save(self, path=None, **meta):
+        path = path or MODEL_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            version=np.int64(MODEL_VERSION),
+            n_features=np.int64(N_FEATURES),
+            labels=np.array(self.labels),
+            log_prior=self.log_prior,
+            log_prob=self.log_prob,
+            trained_at=np.float64(meta.get("trained_at", time.time())),
+            samples=np.int64(meta.get("samples", 0)),
+            min_confidence=np.float64(np.nan if self.min_confidence is None else self.min_confidence),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        with np.load(path or MODEL_PATH, allow_pickle=False) as data:
+            if int(data["version"]) != MODEL_VERSION or int(data["n_features"]) != N_FEATURES:
+                return None
+            threshold = float(data["min_confidence"])
+            return cls([str(l) for l in data["labels"]], data["log_prior"], data["log_prob"],
+                       None if np.isnan(threshold) else threshold)
+
+
+def get_classifier():
+    """The trained model, reloaded if the file changed; None if unavailable"""
+    global _model, _model_mtime
+    if not NUMPY_AVAILABLE:
+        return None
+
+    try:
+        mtime = os.path.getmtime(MODEL_PATH)
+    except OSError:
+        return None
+
+    with _lock:
+        if _model_mtime != mtime:
+            try:
+                _model = SubjectClassifier.load(MODEL_PATH)
+            except Exception:
+                _model = None
+            _model_mtime = mtime
+        return _model
+
+
+def calibrate(scored, target_accuracy):
+    """
+    Lowest confidence threshold at which predictions at or above it are still
+    target_accuracy correct; scored is [(confidence, correct)]. inf when even
+    the most confident ones miss the target (then everything goes to Gemini).
+    """
+    threshold, correct = float("inf"), 0
+    for n, (confidence, ok) in enumerate(sorted(scored, key=lambda s: -s[0]), start=1):
+        correct += bool(ok)
+        if correct / n >= target_accuracy:
+            threshold = confidence
+    return threshold
+
+
+def min_confidence(default):
+    """The trained model's calibrated threshold, else default"""
+    model = get_classifier()
+    if model is None or model.min_confidence is None:
+        return default
+    return model.min_confidence
+
+
+def predict(title, text):
+    """(label, confidence), or (None, 0.0) when no model is trained"""
+    model = get_classifier()
+    if model is None or len(model.labels) < 2:
+        return None, 0.0
+    return model.predict(title, text)
@@ -0,0 +1,164 @@
+# tabular_extraction.py
+"""
+Streaming text extraction for spreadsheets (xlsx) and CSV files.
+
+Rows are turned into compact ' | '-joined lines under a "--- Sheet N: name ---"
+marker, up to a row budget for the whole file. Workbooks are opened with
+openpyxl in read-only mode, which streams rows from the sheet XML instead of
+loading every cell; CSVs are read row by row with the csv module. Either way
+memory stays flat no matter how large the file is.
+
+Nothing in here touches Flask.
+"""
+import csv
+import codecs
+import datetime
+
+import lazy_imports
+
+openpyxl = lazy_imports.lazy("openpyxl")
+EXCEL_AVAILABLE = lazy_imports.available("openpyxl")
+
+DEFAULT_MAX_ROWS = 5000
+DEFAULT_MAX_CELL_CHARS = 200
+PROGRESS_EVERY = 500  # rows between progress callbacks
+SNIFF_BYTES = 64 * 1024
+CSV_ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+
+def format_cell(value, max_chars=DEFAULT_MAX_CELL_CHARS):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        value = value.date()
+    if isinstance(value, (datetime.date, datetime.time)):
+        text = value.isoformat()
+    else:
+        text = " ".join(str(value).split())  # newlines inside cells would break the row
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def format_row(values, max_cell_chars=DEFAULT_MAX_CELL_CHARS):
+    """' | '-joined cells with trailing empties dropped; '' for an empty row"""
+    cells = [format_cell(v, max_cell_chars) for v in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+class _RowBudget:
+    def __init__(self, max_rows, on_progress=None):
+        self.max_rows = max_rows
+        self.used = 0
+        self.chars = 0
+        self.on_progress = on_progress
+
+    @property
+    def exhausted(self):
+        return bool(self.max_rows) and self.used >= self.max_rows
+
+    def take(self, line):
+        self.used += 1
+        self.chars += len(line) + 1
+        if self.on_progress and self.used % PROGRESS_EVERY == 0:
+            self.on_progress(self.used, self.max_rows or None, self.chars)
+
+
+def _budget_note(skipped, max_rows):
+    return f"[... {skipped} more rows not extracted (row budget {max_rows}) ...]"
+
+
+def extract_xlsx_text(file_path, max_rows=DEFAULT_MAX_ROWS, max_cell_chars=DEFAULT_MAX_CELL_CHARS,
+                      on_progress=None):
+    """All sheets as compact text tables; on_progress(rows_done, row_budget, chars)"""
+    if not EXCEL_AVAILABLE:
+        raise RuntimeError("openpyxl not installed")
+
+    budget = _RowBudget(max_rows, on_progress)
+    parts = []
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for number, ws in enumerate(wb.worksheets, 1):
+            lines = [f"--- Sheet {number}: {ws.title} ---"]
+            rows_seen = 0
+
+            for values in ws.iter_rows(values_only=True):
+                if budget.exhausted:
+                    break
+                rows_seen += 1
+                line = format_row(values, max_cell_chars)
+                if line:
+                    lines.append(line)
+                    budget.take(line)
+
+            if budget.exhausted:
+                # read-only sheets know their size from the <dimension> element
+                total = ws.max_row or 0
+                if total > rows_seen:
+                    lines.append(_budget_note(total - rows_seen, max_rows))
+
+            if len(lines) > 1:
+                parts.append("\n".join(lines))
+            if budget.exhausted:
+                remaining = len(wb.worksheets) - number
+                if remaining:
+                    parts.append(f"[... {remaining} more sheet(s) not extracted (row budget {max_rows}) ...]")
+                break
+    finally:
+        wb.close()  # read-only workbooks keep the zip open until closed
+
+    if on_progress:
+        on_progress(budget.used, budget.used, budget.chars)
+    return "\n\n".join(parts)
+
+
+def _csv_encodings(file_path):
+    """(encoding, decoded head) for every CSV_ENCODINGS entry that decodes the sniffed head, in order"""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+    for encoding in CSV_ENCODINGS:
+        try:
+            # Incremental, so a multibyte character cut off at SNIFF_BYTES is not an error
+            yield encoding, codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+        except UnicodeDecodeError:
+            continue
+
+
+def extract_csv_text(file_path, max_rows=DEFAULT_MAX_ROWS, max_cell_chars=DEFAULT_MAX_CELL_CHARS,
+                     on_progress=None):
+    """A CSV (delimiter sniffed) as one compact text table; on_progress(rows_done, row_budget, chars)"""
+    for encoding, head in _csv_encodings(file_path):
+        try:
+            return _read_csv(file_path, encoding, head, max_rows, max_cell_chars, on_progress)
+        except UnicodeDecodeError:
+            # The head decoded but a later byte doesn't: start over with the next encoding
+            continue
+    return _read_csv(file_path, 'latin-1', "", max_rows, max_cell_chars, on_progress)
+
+
+def _read_csv(file_path, encoding, head, max_rows, max_cell_chars, on_progress):
+    budget = _RowBudget(max_rows, on_progress)
+    with open(file_path, 'r', encoding=encoding, newline='') as f:
+        try:
+            dialect = csv.Sniffer().sniff(head[:SNIFF_BYTES // 4], delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+
+        lines = ["--- Sheet 1: data ---"]
+        reader = csv.reader(f, dialect)
+        for values in reader:
+            if budget.exhausted:
+                # count what's left without formatting it; a record may span lines
+                skipped = 1 + sum(1 for _ in reader)
+                lines.append(_budget_note(skipped, max_rows))
+                break
+            line = format_row(values, max_cell_chars)
+            if line:
+                lines.append(line)
+                budget.take(line)
+
+    if on_progress:
+        on_progress(budget.used, budget.used, budget.chars)
+    return "\n".join(lines) if len(lines) > 1 else ""
@@ -0,0 +1,153 @@
+# text_normalization.py
+"""
+Clean-up of extracted text before it is stored and sent to Gemini.
+
+Extracted PDFs and decks repeat the same running header, footer and page
+number on every page, break words across lines with hyphens and carry runs
+of blank lines and padding spaces. None of that tells the model anything,
+but all of it is paid for in every prompt. normalize_text():
+
+  1. drops soft hyphens, zero-width characters and form feeds,
+  2. rejoins words hyphenated across a line break ("mito-\\nchondria"),
+  3. removes boilerplate: lines that show up in the first/last few lines of
+     most pages, found with a frequency index over those lines with digits
+     masked (so "Page 3 of 40" matches "Page 4 of 40"). A page-number line
+     only goes when its number matches its page marker, so an answer line
+     such as "42" at the end of a page stays,
+  4. collapses runs of spaces and blank lines.
+
+Page/slide markers are kept, so chunking still aligns with pages.
+Spreadsheets are left alone apart from step 1 and 4: a header row repeated
+on every sheet is data, not boilerplate. The caller keeps the raw text.
+
+Nothing in here touches Flask.
+"""
+import re
+from collections import Counter
+
+from chunking import PAGE_MARKER_RE
+
+NORMALIZER_VERSION = "2"
+
+EDGE_LINES = 3  # lines at the top and bottom of a page that may be header/footer
+MIN_PAGES = 3  # fewer pages than this and repetition means nothing
+MIN_PAGE_RATIO = 0.5  # a line on at least this share of pages is boilerplate
+MAX_BOILERPLATE_CHARS = 200
+
+_INVISIBLE_RE = re.compile("[\u00ad\u200b\u200c\u200d\u2060\ufeff]")
+_HYPHEN_BREAK_RE = re.compile(r"([^\W\d_]{2,})-[ \t]*\n[ \t]*([^\W\d_]+)(\S*)([ \t]*\n?)")
+_PAGE_NUMBER_RE = re.compile(
+    r"^[-–—\s]*(?:(?:page|slide|p\.)\s*)?\d{1,4}(?:\s*(?:/|of)\s*\d{1,4})?[-–—\s]*$", re.IGNORECASE
+)
+_SPACE_RUN_RE = re.compile(r"(?<=\S)[ \t\u00a0]{2,}")
+_BLANK_RUN_RE = re.compile(r"\n{3,}")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _boilerplate_key(line):
+    return " ".join(_DIGITS_RE.sub("#", line.lower()).split())
+
+
+def _dehyphenate(text):
+    """Rejoin a word split as 'word-' + line break + lowercase continuation"""
+    count = 0
+
+    def join(m):
+        nonlocal count
+        if not m.group(2)[0].islower():
+            return m.group(0)  # "Anglo-\nSaxon" or a dash before a capitalised word
+        count += 1
+        # The line break moves to the end of the rejoined token, punctuation included
+        # ("mito-\nchondria, the" -> "mitochondria,\nthe"); at the end of the text there is none
+        return m.group(1) + m.group(2) + m.group(3) + ("\n" if m.group(4) else "")
+
+    return _HYPHEN_BREAK_RE.sub(join, text), count
+
+
+def _split_pages(lines):
+    """[(marker_line or None, body_lines)]; text before the first marker gets None"""
+    pages = [(None, [])]
+    for line in lines:
+        if PAGE_MARKER_RE.fullmatch(line.strip()):
+            pages.append((line, []))
+        else:
+            pages[-1][1].append(line)
+    if not pages[0][1] and len(pages) > 1:
+        pages.pop(0)
+    return pages
+
+
+def _edge_indexes(body):
+    """Indexes of the first and last EDGE_LINES non-empty lines"""
+    filled = [i for i, line in enumerate(body) if line.strip()]
+    return set(filled[:EDGE_LINES]) | set(filled[-EDGE_LINES:])
+
+
+def _strip_boilerplate(pages, stats):
+    paged = [(marker, body) for marker, body in pages if marker and not marker.lstrip().startswith("--- Sheet")]
+
+    # Frequency index: on how many pages does each (digit-masked) edge line appear?
+    index = Counter()
+    for _, body in paged:
+        index.update({
+            _boilerplate_key(body[i]) for i in _edge_indexes(body)
+            if len(body[i].strip()) <= MAX_BOILERPLATE_CHARS
+        })
+
+    threshold = max(MIN_PAGES, int(len(paged) * MIN_PAGE_RATIO + 0.999))
+    repeated = {key for key, n in index.items() if n >= threshold} if len(paged) >= MIN_PAGES else set()
+    stats["boilerplate_patterns"] = sorted(repeated, key=lambda k: -index[k])[:10]
+
+    for marker, body in paged:
+        page_number = PAGE_MARKER_RE.search(marker).group(1)
+        numbers, boilerplate = set(), set()
+        for i in _edge_indexes(body):
+            line = body[i].strip()
+            if _PAGE_NUMBER_RE.match(line):
+                # Every page-numbered document has "#" in repeated, so only the page's own number counts
+                if page_number in _DIGITS_RE.findall(line):
+                    numbers.add(i)
+            elif _boilerplate_key(line) in repeated:
+                boilerplate.add(i)
+
+        # A short slide made only of "repeated" lines is content, not a footer
+        if boilerplate and all(i in numbers or i in boilerplate for i, line in enumerate(body) if line.strip()):
+            boilerplate = set()
+
+        drop = numbers | boilerplate
+        if drop:
+            stats["page_number_lines"] += len(numbers)
+            stats["boilerplate_lines"] += len(boilerplate)
+            body[:] = [line for i, line in enumerate(body) if i not in drop]
+
+
+def _collapse_whitespace(text):
+    lines = [_SPACE_RUN_RE.sub(" ", line).rstrip() for line in text.split("\n")]
+    return _BLANK_RUN_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def normalize_text(text):
+    """Returns (normalized_text, stats)"""
+    stats = {
+        "version": NORMALIZER_VERSION,
+        "chars_in": len(text or ""),
+        "dehyphenated": 0,
+        "boilerplate_lines": 0,
+        "page_number_lines": 0,
+    }
+    if not text:
+        stats["chars_out"] = 0
+        return text, stats
+
+    text = _INVISIBLE_RE.sub("", text.replace("\r\n", "\n").replace("\r", "\n").replace("\f", "\n"))
+    text, stats["dehyphenated"] = _dehyphenate(text)
+
+    pages = _split_pages(text.split("\n"))
+    _strip_boilerplate(pages, stats)
+    text = "\n".join(
+        "\n".join(([marker] if marker is not None else []) + body) for marker, body in pages
+    )
+
+    text = _collapse_whitespace(text)
+    stats["chars_out"] = len(text)
+    return text, stats
@@ -0,0 +1,166 @@
+# train_subject_classifier.py
+"""
+Retrain the local subject classifier from the subjects stored on
+CourseMaterial rows and print a held-out accuracy/latency report.
+
+    python train_subject_classifier.py [--holdout 0.2] [--min-per-class 3]
+                                       [--target-accuracy 0.95] [--dry-run]
+
+The confidence threshold below which Gemini decides is calibrated on the
+held-out split: the lowest one whose confident predictions still reach
+--target-accuracy (SUBJECT_CLASSIFIER_TARGET_ACCURACY). It is saved with the
+model, and the report shows the coverage/accuracy trade-off around it. The
+labels themselves come from earlier Gemini/keyword/classifier output, so
+accuracy here means agreement with them.
+
+Identical texts (same text_hash) count once, so a syllabus shared by a whole
+class neither dominates training nor leaks into the held-out set.
+"""
+import time
+import zlib
+import argparse
+from collections import Counter
+
+from app import create_app
+from extensions import db
+from models import CourseMaterial
+import subject_classifier
+from subject_classifier import SubjectClassifier
+
+IGNORED_SUBJECTS = {'', 'general studies', 'auto', 'detect', 'unknown'}
+
+
+def load_training_data(min_per_class=3):
+    """[(title, text)], [subject] for completed materials with a usable subject"""
+    rows = db.session.query(
+        CourseMaterial.id, CourseMaterial.subject, CourseMaterial.text_hash
+    ).filter(
+        CourseMaterial.processing_status == 'completed',
+        CourseMaterial.subject.isnot(None)
+    ).all()
+
+    seen = set()
+    picked = []
+    for mat_id, subject, text_hash in rows:
+        label = (subject or '').strip()
+        if label.lower() in IGNORED_SUBJECTS:
+            continue
+        key = text_hash or mat_id
+        if key in seen:
+            continue
+        seen.add(key)
+        picked.append((mat_id, label, key))
+
+    counts = Counter(label for _, label, _ in picked)
+    picked = [p for p in picked if counts[p[1]] >= min_per_class]
+
+    documents, labels, keys = [], [], []
+    for mat_id, label, key in picked:
+        mat = CourseMaterial.query.get(mat_id)
+        documents.append((mat.title or '', mat.content_prefix(subject_classifier.SAMPLE_CHARS)))
+        labels.append(label)
+        keys.append(key)
+        db.session.expunge(mat)
+
+    return documents, labels, keys
+
+
+def split_holdout(keys, holdout):
+    """Deterministic split on the dedupe key, so reruns evaluate the same documents"""
+    cut = int(holdout * 1000)
+    return [zlib.crc32(k.encode('utf-8')) % 1000 < cut for k in keys]
+
+
+def evaluate(model, documents, labels):
+    """Report plus [(confidence, correct)] for each held-out document"""
+    latencies, scored = [], []
+
+    for (title, text), label in zip(documents, labels):
+        started = time.perf_counter()
+        predicted, confidence = model.predict(title, text)
+        latencies.append((time.perf_counter() - started) * 1000)
+        scored.append((confidence, predicted == label))
+
+    latencies.sort()
+    n = len(labels)
+    return {
+        "samples": n,
+        "accuracy": sum(ok for _, ok in scored) / n if n else 0.0,
+        "latency_ms_mean": sum(latencies) / n if n else 0.0,
+        "latency_ms_p95": latencies[min(n - 1, int(n * 0.95))] if n else 0.0,
+    }, scored
+
+
+def at_threshold(scored, threshold):
+    """(share of uploads that skip Gemini, accuracy of those)"""
+    confident = [ok for confidence, ok in scored if confidence >= threshold]
+    if not confident:
+        return 0.0, 0.0
+    return len(confident) / len(scored), sum(confident) / len(confident)
+
+
+def print_report(report, scored, threshold, target_accuracy):
+    print(f"📊 Held-out samples:        {report['samples']}")
+    print(f"   Accuracy:                {report['accuracy']:.1%}")
+    print(f"   Latency mean / p95:      {report['latency_ms_mean']:.3f} / {report['latency_ms_p95']:.3f} ms")
+    if threshold == float("inf"):
+        print(f"   No threshold reaches {target_accuracy:.0%}: every upload will go to Gemini")
+    else:
+        print(f"   Calibrated threshold:    {threshold:.3f} (for {target_accuracy:.0%} accuracy when confident)")
+
+    print(f"   {'threshold':>10}{'skip Gemini':>14}{'accuracy':>10}")
+    confidences = sorted(c for c, _ in scored)
+    candidates = {confidences[int(q * (len(confidences) - 1))] for q in (0.1, 0.25, 0.5, 0.75, 0.9)}
+    if threshold != float("inf"):
+        candidates.add(threshold)
+    for candidate in sorted(candidates):
+        coverage, accuracy = at_threshold(scored, candidate)
+        marker = "  <-" if candidate == threshold else ""
+        print(f"   {candidate:>10.3f}{coverage:>14.1%}{accuracy:>10.1%}{marker}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--min-per-class", type=int, default=3)
+    parser.add_argument("--target-accuracy", type=float, default=None,
+                        help="accuracy the confidence threshold is calibrated for")
+    parser.add_argument("--dry-run", action="store_true", help="report only, don't replace the saved model")
+    args = parser.parse_args()
+
+    if not subject_classifier.NUMPY_AVAILABLE:
+        raise SystemExit("❌ numpy is required to train the subject classifier")
+
+    app = create_app()
+    with app.app_context():
+        target_accuracy = args.target_accuracy or app.config.get("SUBJECT_CLASSIFIER_TARGET_ACCURACY", 0.95)
+        threshold = None
+        documents, labels, keys = load_training_data(args.min_per_class)
+
+        classes = Counter(labels)
+        if len(classes) < 2:
+            raise SystemExit(f"❌ Need at least 2 subjects with {args.min_per_class}+ materials, found {len(classes)}")
+        print(f"📚 {len(labels)} material(s) across {len(classes)} subject(s)")
+        for subject, count in classes.most_common():
+            print(f"   {count:5d}  {subject}")
+
+        held_out = split_holdout(keys, args.holdout)
+        train_idx = [i for i, h in enumerate(held_out) if not h]
+        test_idx = [i for i, h in enumerate(held_out) if h]
+
+        if test_idx and len({labels[i] for i in train_idx}) >= 2:
+            started = time.perf_counter()
+            model = SubjectClassifier.fit([documents[i] for i in train_idx], [labels[i] for i in train_idx])
+            print(f"🧪 Trained on {len(train_idx)} in {(time.perf_counter() - started) * 1000:.0f} ms")
+            report, scored = evaluate(model, [documents[i] for i in test_idx], [labels[i] for i in test_idx])
+            threshold = subject_classifier.calibrate(scored, target_accuracy)
+            print_report(report, scored, threshold, target_accuracy)
+        else:
+            print("⚠️ Not enough data for a held-out evaluation; "
+                  "SUBJECT_CLASSIFIER_MIN_CONFIDENCE stays the threshold")
+
+        if not args.dry_run:
+            model = SubjectClassifier.fit(documents, labels)
+            model.min_confidence = threshold
+            model.save(trained_at=time.time(), samples=len(labels))
+            print(f"🎉 Saved model ({len(model.labels)} subjects) to {subject_classifier.MODEL_PATH}")
@@ -0,0 +1,233 @@
+# wikipedia_enrichment.py
+"""
+Cached, time-bounded Wikipedia summaries for QA context.
+
+The same popular terms come up in question after question, so summaries are
+kept in a per-process LRU with a TTL; terms Wikipedia has no article for
+(404, disambiguation pages) are cached too, for a shorter time, so they are
+not asked for again on every question either.
+
+Fetches go through one pooled requests.Session (kept-alive connections
+instead of a new TLS handshake per question) on a small thread pool, and a
+lookup waits at most its latency budget for them. A fetch that misses the
+budget keeps running and fills the cache for the next question; concurrent
+lookups of the same term share one fetch.
+
+metrics() reports hit ratio, fetch counts and fetch latency percentiles.
+base_url can point at a local stand-in (benchmark_enrichment.py --serve).
+
+Nothing in here touches Flask.
+"""
+import re
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import quote
+
+import lazy_imports
+
+requests = lazy_imports.lazy("requests")
+REQUESTS_AVAILABLE = lazy_imports.available("requests")
+
+DEFAULT_URL = "https://en.wikipedia.org/api/rest_v1"
+USER_AGENT = "SmartCampusAssistant/1.0 (study assistant; QA enrichment)"
+LATENCY_SAMPLES = 1000
+
+TERM_RE = re.compile(r"[A-Za-z][A-Za-z\-']+")
+QUESTION_STOPWORDS = frozenset(
+    "what which when where why how who whom whose does did is are was were the and for with from into "
+    "about this that these those there their explain describe define definition difference between "
+    "give list state write tell mean means meaning example examples importance role process please "
+    "could would should can will also some more most other important simple terms work works used uses "
+    "using main different types kinds steps help need needs".split()
+)
+
+_MISS = object()
+
+
+def candidate_terms(question, limit=2):
+    """Topic words of a question to look up, most specific (longest) first"""
+    seen, terms = set(), []
+    for word in TERM_RE.findall(question or ""):
+        key = word.lower().strip("-'")
+        if len(key) > 3 and key not in QUESTION_STOPWORDS and key not in seen:
+            seen.add(key)
+            terms.append(word.strip("-'"))
+    terms.sort(key=len, reverse=True)
+    return terms[:limit]
+
+
+class TTLCache:
+    """LRU with a TTL per entry; None values (negative results) get their own TTL"""
+
+    def __init__(self, max_entries=5000, ttl=86400, negative_ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """The cached value (None for a cached miss), or _MISS"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISS
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return _MISS
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class WikipediaEnricher:
+    def __init__(self, base_url=DEFAULT_URL, budget=0.8, cache_size=5000, ttl=86400, negative_ttl=3600,
+                 pool_size=8, sentences=3):
+        self.base_url = base_url.rstrip("/")
+        self.budget = budget
+        self.sentences = sentences
+        self.cache = TTLCache(cache_size, ttl, negative_ttl)
+        self.pool_size = pool_size
+        self._session = None
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="wikipedia")
+        self._lock = threading.Lock()
+        self._inflight = {}  # cache key -> Future
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.counts = {"lookups": 0, "hits": 0, "negative_hits": 0, "misses": 0, "fetches": 0,
+                       "fetch_errors": 0, "not_found": 0, "over_budget": 0, "shared_fetches": 0}
+
+    # HTTP
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=1, pool_maxsize=self.pool_size, max_retries=0
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers["User-Agent"] = USER_AGENT
+                    self._session = session
+        return self._session
+
+    def _fetch(self, term):
+        """Summary text for term, None when Wikipedia has no article for it (raises on HTTP trouble)"""
+        started = time.perf_counter()
+        try:
+            title = quote(term[:1].upper() + term[1:].replace(" ", "_"), safe="")
+            # Socket timeouts well past the budget: a late answer still lands in the cache
+            response = self.session.get(f"{self.base_url}/page/summary/{title}", timeout=(3, 5))
+            if response.status_code == 404:
+                self._count("not_found")
+                return None
+            response.raise_for_status()
+            data = response.json()
+            if data.get("type") == "disambiguation":
+                self._count("not_found")
+                return None
+            extract = (data.get("extract") or "").strip()
+            if not extract:
+                return None
+            return " ".join(re.split(r"(?<=[.!?])\s+", extract)[:self.sentences])
+        finally:
+            with self._lock:
+                self.counts["fetches"] += 1
+                self._latencies.append((time.perf_counter() - started) * 1000)
+
+    def _fetch_into_cache(self, key, term):
+        try:
+            value = self._fetch(term)
+            self.cache.put(key, value)
+            return value
+        except Exception:
+            self._count("fetch_errors")
+            raise  # errors are not cached: the next question tries again
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    # Lookups
+
+    def lookup(self, term, timeout=None):
+        """Summary for one term within timeout seconds (default: the budget), or None"""
+        key = term.lower()
+        self._count("lookups")
+        cached = self.cache.get(key)
+        if cached is not _MISS:
+            self._count("hits" if cached is not None else "negative_hits")
+            return cached
+
+        self._count("misses")
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = self._executor.submit(self._fetch_into_cache, key, term)
+            else:
+                self.counts["shared_fetches"] += 1
+        try:
+            return future.result(timeout=self.budget if timeout is None else max(timeout, 0))
+        except FutureTimeout:
+            self._count("over_budget")
+            return None
+        except Exception:
+            return None
+
+    def enrich(self, question, max_terms=2):
+        """(term, summary) for the first topic word of the question with an article, within the budget"""
+        if not REQUESTS_AVAILABLE:
+            return None
+        deadline = time.monotonic() + self.budget
+        for term in candidate_terms(question, max_terms):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count("over_budget")
+                break
+            summary = self.lookup(term, timeout=remaining)
+            if summary:
+                return term, summary
+        return None
+
+    # Metrics
+
+    def metrics(self):
+        with self._lock:
+            counts = dict(self.counts)
+            latencies = sorted(self._latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))], 1) if latencies else None
+
+        served = counts["hits"] + counts["negative_hits"]
+        return dict(
+            counts,
+            hit_ratio=round(served / counts["lookups"], 4) if counts["lookups"] else None,
+            cache_entries=len(self.cache),
+            cache_evictions=self.cache.evictions,
+            cache_expirations=self.cache.expirations,
+            fetch_ms={"p50": pct(50), "p95": pct(95), "p99": pct(99), "max": pct(100), "samples": len(latencies)},
+            budget_ms=round(self.budget * 1000),
+            base_url=self.base_url,
+        )
@@ -168,6 +168,41 @@ export default function UploadMaterial(): JSX.Element {
     });
   };
 
+  // Live extraction progress over Server-Sent Events instead of polling
+  const watchProgress = (materialId: string) => {
+    const source = new EventSource(
+      `${API_URL}/api/material-progress/${encodeURIComponent(materialId)}`
+    );
+
+    source.addEventListener('progress', (ev) => {
+      const data = JSON.parse((ev as MessageEvent).data);
+
+      if (data.stage === 'completed' || data.stage === 'failed') {
+        source.close();
+        setMessage(
+          data.stage === 'completed'
+            ? `✅ Extraction finished${data.subject ? ` — subject: ${data.subject}` : ''}`
+            : '❌ Extraction failed'
+        );
+        loadMaterials();
+        return;
+      }
+
+      if (data.stage === 'extracting' && data.total) {
+        const eta = data.eta_seconds != null ? `, ~${Math.ceil(data.eta_seconds)}s left` : '';
+        setMessage(`⏳ Extracting ${data.unit ?? 'pages'}: ${data.done}/${data.total}${eta}`);
+      } else if (data.stage === 'detecting_subject') {
+        setMessage('🔎 Detecting subject...');
+      } else if (data.stage === 'retrying') {
+        setMessage(`🔁 Extraction failed, retrying in ${data.retry_in_seconds}s...`);
+      } else {
+        setMessage(`⏳ ${String(data.stage).replace('_', ' ')}...`);
+      }
+    });
+
+    source.onerror = () => source.close();
+  };
+
   const handleUpload = async (e: React.FormEvent) => {
     e.preventDefault();
     
@@ -196,11 +231,16 @@ export default function UploadMaterial(): JSX.Element {
       
       if (resp.ok) {
         const detectedSubject = body.subject || subject || 'General';
-        setMessage(
-          `✅ Success! File uploaded and processed. ${
-            autoDetectSubject ? `Detected subject: ${detectedSubject}` : ''
-          }`
-        );
+        if (resp.status === 202) {
+          setMessage('✅ File uploaded! Text extraction is running in the background.');
+          if (body.id) watchProgress(body.id);
+        } else {
+          setMessage(
+            `✅ Success! File uploaded and processed. ${
+              autoDetectSubject ? `Detected subject: ${detectedSubject}` : ''
+            }`
+          );
+        }
         
         setTitle('');
         setSubject('');
@@ -333,7 +373,7 @@ export default function UploadMaterial(): JSX.Element {
             Drag and drop your file here, or click to select
           </p>
           <p className="text-xs text-gray-500 mb-4">
-            Supports: PDF, DOCX, PPTX, TXT • Max size: 100 MB
+            Supports: PDF, DOCX, PPTX, TXT, XLSX, CSV • Max size: 100 MB
           </p>
           
           <input
@@ -341,7 +381,7 @@ export default function UploadMaterial(): JSX.Element {
             type="file"
             onChange={handleFileSelect}
             className="hidden"
-            accept=".pdf,.doc,.docx,.ppt,.pptx,.txt"
+            accept=".pdf,.doc,.docx,.ppt,.pptx,.txt,.xlsx,.xlsm,.csv,.png,.jpg,.jpeg,.tif,.tiff"
           />
           
           <button